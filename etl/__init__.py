@@ -0,0 +1,9 @@
+"""
+Raw-to-production ETL for the spark-delta cluster.
+
+Reads the raw CSV tables (hive.raw_*) with explicit schemas, applies the field
+mappings documented in architecture/data.md as column expressions and upserts
+the result into the partitioned Delta tables delta.prod_*.
+
+    python3 -m etl.job --master 'local[*]' --raw-root raw --prod-root /tmp/prod
+"""
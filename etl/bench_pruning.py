@@ -0,0 +1,186 @@
+"""
+Benchmark file pruning of the production Delta tables for the dashboard charts.
+
+    python3 -m etl.bench_pruning --master 'local[*]' --prod-root /tmp/prod --report pruning.json
+
+Every production chart of superset/provisioning.yaml groups on a column; clicking
+a bar or slice filters the dashboard on one of its values. For each chart, the
+--values most frequent values of its group-by column are used as filters
+(`column = value`), and the files Spark reads for them are counted against the
+table's total. Filters on the hotels' country and city also reach reviews and
+reservations, the way Trino's dynamic filters do: as a hotel_id IN (...) filter
+of the matching hotels.
+
+Run it before and after a clustering change; --baseline prints the files read of
+an earlier --report next to the current ones.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional
+
+if __package__ in (None, ''):  # spark-submit etl/bench_pruning.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from etl.job import build_session, prod_path
+from etl.schemas import PROD_TABLES
+
+SPEC_PATH = Path("superset/provisioning.yaml")
+DEFAULT_VALUES = 5
+# Hotel columns whose filters reach the tables keyed by hotel_id
+HOTEL_FILTER_COLUMNS = ['country', 'city']
+
+
+def load_charts(path: Path = SPEC_PATH) -> List[Dict]:
+    """Production charts with the table key and the columns they group on."""
+    if yaml is None:
+        raise RuntimeError(f"PyYAML is required to read {path}")
+    with path.open() as f:
+        spec = yaml.safe_load(f) or {}
+    tables = {t.name: key for key, t in PROD_TABLES.items()}
+    charts = []
+    for chart in spec.get('charts', []):
+        table = tables.get(chart['dataset'])
+        params = chart.get('params') or {}
+        columns = list(params.get('groupby') or []) + [params[a] for a in ('x', 'y') if params.get(a)]
+        if table and columns:
+            charts.append({'name': chart['name'], 'table': table, 'columns': columns})
+    return charts
+
+
+def files_read(df) -> int:
+    """Run the query and sum the files its table scans read (after partition and data skipping)."""
+    execution = df._jdf.queryExecution()
+    df.collect()
+    leaves = execution.executedPlan().collectLeaves()
+    total = 0
+    for i in range(leaves.size()):
+        metrics = leaves.apply(i).metrics()
+        if metrics.contains('numFiles'):
+            total += metrics.apply('numFiles').value()
+    return total
+
+
+def top_values(df, column: str, limit: int) -> list:
+    from pyspark.sql import functions as F
+
+    rows = df.where(F.col(column).isNotNull()).groupBy(column).count() \
+        .orderBy(F.desc('count')).limit(limit).collect()
+    return [r[column] for r in rows]
+
+
+def filter_queries(spark, prod_root: str, charts: List[Dict], values: int) -> List[Dict]:
+    """The filters to measure: chart group-by values, plus hotel filters on the hotel_id tables."""
+    from pyspark.sql import functions as F
+
+    tables = {key: spark.read.format('delta').load(prod_path(prod_root, key))
+              for key in {c['table'] for c in charts} | {'hotels'}}
+    queries = []
+    for chart in charts:
+        df = tables[chart['table']]
+        for column in chart['columns']:
+            for value in top_values(df, column, values):
+                queries.append({'chart': chart['name'], 'table': chart['table'], 'filter': f"{column} = {value!r}",
+                                'df': df.where(F.col(column) == value).agg(F.count(F.lit(1)))})
+        if 'hotel_id' not in dict(PROD_TABLES[chart['table']].columns) or chart['table'] == 'hotels':
+            continue
+        hotels = tables['hotels']
+        for column in HOTEL_FILTER_COLUMNS:
+            for value in top_values(hotels, column, values):
+                ids = [r[0] for r in hotels.where(F.col(column) == value).select('hotel_id').collect()]
+                queries.append({'chart': chart['name'], 'table': chart['table'],
+                                'filter': f"hotels.{column} = {value!r}",
+                                'df': df.where(F.col('hotel_id').isin(ids)).agg(F.count(F.lit(1)))})
+    return queries
+
+
+def benchmark(spark, prod_root: str, charts: List[Dict], values: int = DEFAULT_VALUES) -> List[Dict]:
+    # Adaptive execution hides the scans behind query stages; the plain plan keeps their metrics
+    spark.conf.set('spark.sql.adaptive.enabled', 'false')
+    total_files = {key: len(spark.read.format('delta').load(prod_path(prod_root, key)).inputFiles())
+                   for key in {c['table'] for c in charts}}
+    results = []
+    for query in filter_queries(spark, prod_root, charts, values):
+        total = total_files[query['table']]
+        read = files_read(query['df'])
+        results.append({
+            'chart': query['chart'],
+            'table': PROD_TABLES[query['table']].name,
+            'filter': query['filter'],
+            'files_total': total,
+            'files_read': read,
+            'pruned': round(1 - read / total, 4) if total else 0.0,
+        })
+    return results
+
+
+def print_results(results: List[Dict], baseline: Optional[List[Dict]] = None):
+    before = {(r['chart'], r['filter']): r['files_read'] for r in baseline or []}
+    print(f"\n{'chart':<44} {'filter':<40} {'read':>6} {'total':>6} {'pruned':>7}" + ("  before" if before else ""))
+    for r in results:
+        previous = before.get((r['chart'], r['filter']))
+        print(f"{r['chart']:<44} {r['filter'][:40]:<40} {r['files_read']:>6} {r['files_total']:>6} "
+              f"{r['pruned']:>7.1%}" + (f"  {previous}" if previous is not None else ""))
+    by_chart = {}
+    for r in results:
+        by_chart.setdefault(r['chart'], []).append(r['pruned'])
+    print()
+    for chart, pruned in by_chart.items():
+        print(f"  {chart}: median {statistics.median(pruned):.1%} of files pruned over {len(pruned)} filters")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Files pruned per dashboard filter on the production Delta tables")
+    parser.add_argument('--master', default=os.environ.get('SPARK_URL', 'local[*]'),
+                        help="Spark master (default: SPARK_URL or local[*])")
+    parser.add_argument('--prod-root', default=f"s3a://{os.environ.get('S3_PROD_BUCKET', 'prod')}",
+                        help="root the prod_<schema>/<table> Delta tables are under")
+    parser.add_argument('--spec', type=Path, default=SPEC_PATH,
+                        help="Superset provisioning spec with the chart definitions")
+    parser.add_argument('--values', type=int, default=DEFAULT_VALUES,
+                        help="most frequent values per filter column to measure")
+    parser.add_argument('--report', type=Path, default=None,
+                        help="write results as JSON")
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help="earlier --report to compare the files read against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict]:
+    args = parse_args(argv)
+    charts = load_charts(args.spec)
+    if not charts:
+        print(f"❌ No production charts in {args.spec}")
+        sys.exit(1)
+    baseline = None
+    if args.baseline:
+        with args.baseline.open() as f:
+            baseline = json.load(f)
+
+    spark = build_session(args.master, app_name='prod-pruning-benchmark')
+    try:
+        print(f"🔎 Measuring file pruning of {len(charts)} charts under {args.prod_root}")
+        results = benchmark(spark, args.prod_root, charts, args.values)
+    finally:
+        spark.stop()
+    print_results(results, baseline)
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with args.report.open('w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"🧾 Benchmark report: {args.report}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Incremental upserts into the production Delta tables, and clustering of the
+files they write.
+"""
+
+import datetime
+from typing import Dict, Optional
+
+from pyspark.sql import DataFrame, SparkSession
+
+from etl.schemas import ProdTable
+
+# Above this many touched partitions a MERGE re-clusters the whole table in one OPTIMIZE
+MAX_CLUSTER_PARTITIONS = 200
+
+
+def merge_metrics(target) -> Dict[str, int]:
+    """Row counts of the last commit of a Delta table."""
+    metrics = target.history(1).select('operationMetrics').first()[0] or {}
+    return {
+        'inserted': int(metrics.get('numTargetRowsInserted', metrics.get('numOutputRows', 0))),
+        'updated': int(metrics.get('numTargetRowsUpdated', 0)),
+    }
+
+
+def sql_literal(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime.date):
+        return f"DATE'{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def partition_predicate(rows: DataFrame, table: ProdTable) -> Optional[str]:
+    """OPTIMIZE predicate selecting the partitions rows fall into; None for all of them
+    (unpartitioned table, or more than MAX_CLUSTER_PARTITIONS partitions).
+    """
+    if not table.partitioned_by:
+        return None
+    partitions = rows.select(*table.partitioned_by).distinct().limit(MAX_CLUSTER_PARTITIONS + 1).collect()
+    if len(partitions) > MAX_CLUSTER_PARTITIONS:
+        return None
+    if not partitions:
+        return 'false'
+    return ' OR '.join(
+        '(' + ' AND '.join(
+            f"{c} IS NULL" if p[c] is None else f"{c} = {sql_literal(p[c])}" for c in table.partitioned_by
+        ) + ')'
+        for p in partitions
+    )
+
+
+def cluster(spark: SparkSession, path: str, table: ProdTable, where: Optional[str] = None) -> Dict[str, int]:
+    """Rewrite the files of the table (of the partitions matching where) clustered on
+    table.clustered_by, so each file covers a narrow range of those columns.
+    zorder rewrites the selected partitions with OPTIMIZE ZORDER BY; hilbert tables are
+    liquid-clustered and OPTIMIZE only reclusters the files written since the last run.
+    """
+    from delta.tables import DeltaTable
+
+    if not table.clustered_by or where == 'false':
+        return {'removed': 0, 'added': 0}
+    optimize = DeltaTable.forPath(spark, path).optimize()
+    if table.clustering == 'hilbert':
+        result = optimize.executeCompaction()
+    elif table.clustering == 'zorder':
+        result = (optimize.where(where) if where else optimize).executeZOrderBy(*table.clustered_by)
+    else:
+        raise ValueError(f"{table.name}: unknown clustering {table.clustering!r}")
+    metrics = result.select('metrics').first()[0]
+    return {'removed': int(metrics['numFilesRemoved']), 'added': int(metrics['numFilesAdded'])}
+
+
+def create(spark: SparkSession, rows: DataFrame, path: str, table: ProdTable):
+    """First write of a table: partitioned, or declared CLUSTER BY for liquid clustering."""
+    from delta.tables import DeltaTable
+
+    if table.clustering == 'hilbert' and table.clustered_by:
+        if table.partitioned_by:
+            raise ValueError(f"{table.name}: hilbert (liquid) clustering does not support partitioned tables")
+        (
+            DeltaTable.createIfNotExists(spark).location(path)
+            .addColumns(rows.schema).clusterBy(*table.clustered_by).execute()
+        )
+        rows.write.format('delta').mode('append').save(path)
+    else:
+        rows.write.format('delta').partitionBy(*table.partitioned_by).mode('overwrite').save(path)
+
+
+def upsert(spark: SparkSession, rows: DataFrame, path: str, table: ProdTable) -> Dict:
+    """MERGE rows into the Delta table at path on its key, creating it partitioned on the
+    first run. Rows whose key and row_hash are already in the table are dropped first,
+    so unchanged data rewrites no files and only new or changed rows are merged.
+    The partitions the merge touched are then clustered again (see cluster); their
+    partition values are collected before the MERGE, which consumes the changes.
+    """
+    from delta.tables import DeltaTable
+
+    if not DeltaTable.isDeltaTable(spark, path):
+        create(spark, rows, path, table)
+        metrics = merge_metrics(DeltaTable.forPath(spark, path))
+        return {**metrics, 'clustered': cluster(spark, path, table)}
+
+    target = DeltaTable.forPath(spark, path)
+    changes = rows.join(target.toDF().select(table.key, 'row_hash'), [table.key, 'row_hash'], 'left_anti')
+    changes = changes.persist() if table.clustered_by else changes
+    try:
+        where = partition_predicate(changes, table) if table.clustered_by else None
+        (
+            target.alias('t')
+            .merge(changes.alias('s'), f"t.{table.key} = s.{table.key}")
+            .whenMatchedUpdateAll()
+            .whenNotMatchedInsertAll()
+            .execute()
+        )
+    finally:
+        changes.unpersist()
+    metrics = merge_metrics(target)
+    return {**metrics, 'clustered': cluster(spark, path, table, where)}
+
+
+def overwrite(spark: SparkSession, rows: DataFrame, path: str, table: ProdTable) -> int:
+    """Replace the contents of a derived table in one Delta commit; returns the rows written."""
+    from delta.tables import DeltaTable
+
+    (
+        rows.write.format('delta')
+        .partitionBy(*table.partitioned_by)
+        .mode('overwrite')
+        .option('overwriteSchema', 'true')
+        .save(path)
+    )
+    return merge_metrics(DeltaTable.forPath(spark, path))['inserted']
@@ -0,0 +1,181 @@
+"""
+Raw-to-production ETL job: hive.raw_* CSVs -> delta.prod_* tables.
+
+    python3 -m etl.job --master 'local[*]' --raw-root raw --prod-root /tmp/prod
+    spark-submit --master spark://spark-master:7077 etl/job.py
+
+`--ddl` writes sql/prod_trino_schemas.sql (the Trino DDL of the production tables)
+without starting Spark.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+if __package__ in (None, ''):  # spark-submit etl/job.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.schemas import RAW_TABLES, PROD_TABLES, raw_schema, prod_ddl
+
+PROD_DDL_OUTPUT = Path("sql/prod_trino_schemas.sql")
+TABLES = ['hotels', 'reviews', 'reservations']
+
+
+def build_session(master: str, app_name: str = 'raw-to-prod'):
+    """Spark session with Delta Lake, S3A (S3_ENDPOINT) and type handling like Trino's casts."""
+    from pyspark.sql import SparkSession
+
+    builder = (
+        SparkSession.builder
+        .master(master)
+        .appName(app_name)
+        .config('spark.sql.extensions', 'io.delta.sql.DeltaSparkSessionExtension')
+        .config('spark.sql.catalog.spark_catalog', 'org.apache.spark.sql.delta.catalog.DeltaCatalog')
+        # Unparsable values become NULL instead of failing the job
+        .config('spark.sql.ansi.enabled', 'false')
+        .config('spark.sql.legacy.timeParserPolicy', 'CORRECTED')
+    )
+    endpoint = os.environ.get('S3_ENDPOINT')
+    if endpoint:
+        builder = (
+            builder
+            .config('spark.hadoop.fs.s3a.endpoint', endpoint)
+            .config('spark.hadoop.fs.s3a.path.style.access', 'true')
+            .config('spark.hadoop.fs.s3a.connection.ssl.enabled', str(endpoint.startswith('https')).lower())
+            .config('spark.hadoop.fs.s3a.access.key', os.environ.get('AWS_ACCESS_KEY_ID', 'minioadmin'))
+            .config('spark.hadoop.fs.s3a.secret.key', os.environ.get('AWS_SECRET_ACCESS_KEY', 'minioadmin'))
+        )
+    try:  # pip-installed delta-spark: pull the matching jars (local runs)
+        from delta import configure_spark_with_delta_pip
+        builder = configure_spark_with_delta_pip(builder)
+    except ImportError:  # the spark-delta image ships the jars
+        pass
+    return builder.getOrCreate()
+
+
+def read_raw(spark, raw_root: str, table_key: str):
+    """Read a raw table's CSV objects with its explicit schema (no inference pass)."""
+    table = RAW_TABLES[table_key]
+    return spark.read.csv(
+        f"{raw_root.rstrip('/')}/{table.location}",
+        schema=raw_schema(table_key),
+        header=True,
+        sep=table.separator,
+        quote='"',
+        escape='"',
+        mode='PERMISSIVE',
+    )
+
+
+def prod_path(prod_root: str, table: str) -> str:
+    schema, name = PROD_TABLES[table].name.split('.', 1)
+    return f"{prod_root.rstrip('/')}/{schema}/{name}"
+
+
+def load_table(spark, table: str, rows, prod_root: str) -> Dict:
+    """Count rejects per rule, upsert the valid rows and report."""
+    from pyspark.sql import functions as F
+    from etl.delta import upsert
+
+    started = time.monotonic()
+    rows = rows.persist()
+    try:
+        counts = {r['_reject']: r['count'] for r in rows.groupBy('_reject').count().collect()}
+        valid = rows.where(F.col('_reject').isNull()).drop('_reject')
+        metrics = upsert(spark, valid, prod_path(prod_root, table), PROD_TABLES[table])
+    finally:
+        rows.unpersist()
+    rejected = {k: v for k, v in counts.items() if k is not None}
+    print(f"  ✓ {PROD_TABLES[table].name}: {counts.get(None, 0)} valid, {sum(rejected.values())} rejected, "
+          f"{metrics['inserted']} inserted, {metrics['updated']} updated ({time.monotonic() - started:.1f}s)")
+    if metrics['clustered']['removed']:
+        print(f"      clustered by {', '.join(PROD_TABLES[table].clustered_by)}: "
+              f"{metrics['clustered']['removed']} files -> {metrics['clustered']['added']}")
+    for rule, count in sorted(rejected.items()):
+        print(f"      {rule}: {count}")
+    return {'valid': counts.get(None, 0), 'rejected': rejected, **metrics}
+
+
+def resolve_hotels(spark, raw, prod_root: str) -> Dict[str, Dict]:
+    """Rebuild prod_hotels.hotel_index from the current hotels and report match rates per source."""
+    from etl.delta import overwrite
+    from etl.resolution import build_index, match_report
+
+    started = time.monotonic()
+    hotels = spark.read.format('delta').load(prod_path(prod_root, 'hotels'))
+    path = prod_path(prod_root, 'hotel_index')
+    written = overwrite(spark, build_index(raw, hotels), path, PROD_TABLES['hotel_index'])
+    report = match_report(spark.read.format('delta').load(path))
+    print(f"  ✓ {PROD_TABLES['hotel_index'].name}: {written} source names ({time.monotonic() - started:.1f}s)")
+    for source, entry in sorted(report.items()):
+        methods = ', '.join(f"{m} {v['records']}" for m, v in sorted(entry['methods'].items()))
+        print(f"      {source}: {entry['match_rate']:.1%} of {entry['records']} rows matched ({methods})")
+    return report
+
+
+def run(spark, raw_root: str, prod_root: str, tables: List[str]) -> Dict[str, Dict]:
+    """Build and upsert the requested tables. Reviews and reservations look hotel ids up in
+    the hotel index, rebuilt from the prod_hotels table after the hotels are loaded.
+    """
+    from etl import transforms
+
+    raw = {key: read_raw(spark, raw_root, key) for key in RAW_TABLES}
+    results = {}
+    if 'hotels' in tables:
+        hotels = transforms.build_hotels(raw)
+        results['hotels'] = load_table(spark, 'hotels', hotels, prod_root)
+    if not {'reviews', 'reservations'} & set(tables):
+        return results
+
+    results['hotel_index'] = resolve_hotels(spark, raw, prod_root)
+    index = spark.read.format('delta').load(prod_path(prod_root, 'hotel_index')).persist()
+    try:
+        if 'reviews' in tables:
+            results['reviews'] = load_table(spark, 'reviews', transforms.build_reviews(raw, index), prod_root)
+        if 'reservations' in tables:
+            results['reservations'] = load_table(
+                spark, 'reservations', transforms.build_reservations(raw, index), prod_root,
+            )
+    finally:
+        index.unpersist()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load the raw tables into the production Delta tables")
+    parser.add_argument('--master', default=os.environ.get('SPARK_URL', 'local[*]'),
+                        help="Spark master (default: SPARK_URL or local[*])")
+    parser.add_argument('--raw-root', default=f"s3a://{os.environ.get('S3_RAW_BUCKET', 'raw')}",
+                        help="root of the raw CSV layout (a local raw/ directory works too)")
+    parser.add_argument('--prod-root', default=f"s3a://{os.environ.get('S3_PROD_BUCKET', 'prod')}",
+                        help="root the prod_<schema>/<table> Delta tables are written under")
+    parser.add_argument('--tables', nargs='+', choices=TABLES, default=TABLES,
+                        help="production tables to load (hotels is needed first)")
+    parser.add_argument('--ddl', action='store_true',
+                        help=f"only write the Trino DDL of the production tables to {PROD_DDL_OUTPUT}")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.ddl:
+        PROD_DDL_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+        PROD_DDL_OUTPUT.write_text('\n'.join(prod_ddl(os.environ.get('S3_PROD_BUCKET', 'prod'))))
+        print(f"✅ Generated production DDL: {PROD_DDL_OUTPUT}")
+        return
+
+    started = time.monotonic()
+    spark = build_session(args.master)
+    try:
+        print(f"🚚 Loading {', '.join(args.tables)} from {args.raw_root} into {args.prod_root}")
+        run(spark, args.raw_root, args.prod_root, [t for t in TABLES if t in args.tables])
+    finally:
+        spark.stop()
+    print(f"✅ ETL finished in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
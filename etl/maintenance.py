@@ -0,0 +1,276 @@
+"""
+Maintenance of the production Delta tables: OPTIMIZE, VACUUM and checkpoints,
+each only when the table's current state calls for it.
+
+    python3 -m etl.maintenance --master 'local[*]' --prod-root /tmp/prod
+    spark-submit --master spark://spark-master:7077 etl/maintenance.py
+
+Every incremental load adds small files and a commit to each table. A table is
+inspected first: sizes of the files in its current snapshot, files in storage
+the snapshot no longer references, and commits since the last checkpoint. Then
+  * OPTIMIZE (bin-packing to --target-file-mb, or clustering for tables with a
+    clustering spec) runs when at least --min-small-files live files are below a
+    quarter of the target size,
+  * VACUUM with --retention-hours runs when at least --min-unreferenced-files
+    unreferenced files are older than the retention (only those would be
+    deleted): files the log removed by the deletion time of their remove action,
+    files it never referenced by modification time, as VACUUM itself decides,
+  * a checkpoint is written when --max-log-commits commits followed the last one.
+File counts before and after are printed per table.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+if __package__ in (None, ''):  # spark-submit etl/maintenance.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.job import build_session, prod_path
+from etl.schemas import PROD_TABLES, ProdTable
+
+DEFAULT_TARGET_FILE_MB = 128
+# Live files below this fraction of the target size count as small
+SMALL_FILE_FRACTION = 0.25
+DEFAULT_MIN_SMALL_FILES = 16
+# Delta's own default retention; shorter ones need the retention check disabled
+DEFAULT_RETENTION_HOURS = 168
+DEFAULT_MIN_UNREFERENCED_FILES = 32
+# Delta writes a checkpoint every 10 commits by default (delta.checkpointInterval)
+DEFAULT_MAX_LOG_COMMITS = 10
+
+COMMIT_RE = re.compile(r'^(\d{20})\.json$')
+CHECKPOINT_RE = re.compile(r'^(\d{20})\.checkpoint(\.\d+\.\d+)?\.parquet$')
+SIZE_BUCKETS_MB = [1, 8, 32, 128, 512]
+
+
+def hadoop_fs(spark, path: str):
+    jvm = spark.sparkContext._jvm
+    jpath = jvm.org.apache.hadoop.fs.Path(path)
+    return jpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration()), jpath
+
+
+def uri_path(spark, path: str) -> str:
+    """Decoded path component of a file URI, so listings and Delta paths compare equal."""
+    return spark.sparkContext._jvm.org.apache.hadoop.fs.Path(path).toUri().getPath()
+
+
+def list_files(spark, path: str) -> Dict[str, Tuple[int, float]]:
+    """Size and modification time (epoch seconds) of every data file under a table path,
+    recursively; _delta_log and hidden files excluded.
+    """
+    fs, jpath = hadoop_fs(spark, path)
+    root = jpath.toUri().getPath().rstrip('/') + '/'
+    files = {}
+    it = fs.listFiles(jpath, True)
+    while it.hasNext():
+        status = it.next()
+        file_path = status.getPath().toUri().getPath()
+        if any(part[:1] in '._' for part in file_path[len(root):].split('/')):
+            continue
+        files[file_path] = (status.getLen(), status.getModificationTime() / 1000)
+    return files
+
+
+def log_state(spark, path: str) -> Dict[str, Optional[int]]:
+    """Latest version, latest checkpoint and commits since it, from the _delta_log listing."""
+    fs, jpath = hadoop_fs(spark, path.rstrip('/') + '/_delta_log')
+    commits, checkpoints = [], []
+    for status in fs.listStatus(jpath):
+        name = status.getPath().getName()
+        if COMMIT_RE.match(name):
+            commits.append(int(COMMIT_RE.match(name).group(1)))
+        elif CHECKPOINT_RE.match(name):
+            checkpoints.append(int(CHECKPOINT_RE.match(name).group(1)))
+    checkpoint = max(checkpoints) if checkpoints else None
+    return {
+        'version': max(commits) if commits else None,
+        'checkpoint': checkpoint,
+        'commits_since_checkpoint': sum(1 for c in commits if checkpoint is None or c > checkpoint),
+    }
+
+
+def tombstones(spark, path: str) -> Dict[str, float]:
+    """Deletion time (epoch seconds) of every file a remove action of the log names, from the
+    latest checkpoint (which keeps the unexpired tombstones) and the commits after it.
+    """
+    log_path = path.rstrip('/') + '/_delta_log'
+    fs, jpath = hadoop_fs(spark, log_path)
+    names = [status.getPath().getName() for status in fs.listStatus(jpath)]
+    checkpoint = max((int(CHECKPOINT_RE.match(n).group(1)) for n in names if CHECKPOINT_RE.match(n)), default=-1)
+    schema = 'remove STRUCT<path: STRING, deletionTimestamp: BIGINT>'
+    commits = [f"{log_path}/{n}" for n in names if COMMIT_RE.match(n) and int(COMMIT_RE.match(n).group(1)) > checkpoint]
+    checkpoints = [f"{log_path}/{n}" for n in names
+                   if CHECKPOINT_RE.match(n) and int(CHECKPOINT_RE.match(n).group(1)) == checkpoint]
+    removes = []
+    if commits:
+        removes.append(spark.read.schema(schema).json(commits))
+    if checkpoints:
+        removes.append(spark.read.schema(schema).parquet(*checkpoints))
+    root = uri_path(spark, path).rstrip('/') + '/'
+    deleted = {}
+    for frame in removes:
+        for row in frame.where('remove IS NOT NULL').select('remove.*').collect():
+            # Paths are URL-encoded, relative to the table unless they carry a scheme
+            parsed = urlparse(row['path'])
+            file_path = unquote(parsed.path) if parsed.scheme else root + unquote(row['path'])
+            deleted[file_path] = max(deleted.get(file_path, 0), (row['deletionTimestamp'] or 0) / 1000)
+    return deleted
+
+
+def size_bucket(size: int) -> str:
+    for mb in SIZE_BUCKETS_MB:
+        if size < mb * 1024 * 1024:
+            return f"<{mb}MB"
+    return f">={SIZE_BUCKETS_MB[-1]}MB"
+
+
+def inspect(spark, path: str, target_bytes: int, retention_hours: float = DEFAULT_RETENTION_HOURS) -> Dict:
+    """File-size distribution of the current snapshot, unreferenced files and log length of one table.
+    One storage listing gives every size; the snapshot's file list comes from the log, no data is read.
+    Unreferenced files removed (or, if the log never named them, modified) within the retention
+    are counted apart: VACUUM keeps them.
+    """
+    stored = list_files(spark, path)
+    live = {uri_path(spark, f) for f in spark.read.format('delta').load(path).inputFiles()}
+    sizes = sorted(stored[f][0] for f in live if f in stored)
+    cutoff = time.time() - retention_hours * 3600
+    removed = tombstones(spark, path)
+    unreferenced = [removed.get(f, modified) for f, (_, modified) in stored.items() if f not in live]
+    histogram = {}
+    for size in sizes:
+        histogram[size_bucket(size)] = histogram.get(size_bucket(size), 0) + 1
+    return {
+        'files': len(live),
+        'bytes': sum(sizes),
+        'median_bytes': sizes[len(sizes) // 2] if sizes else 0,
+        'small_files': sum(1 for s in sizes if s < SMALL_FILE_FRACTION * target_bytes),
+        'histogram': histogram,
+        'unreferenced_files': len(unreferenced),
+        'expired_files': sum(1 for modified in unreferenced if modified < cutoff),
+        **log_state(spark, path),
+    }
+
+
+def describe(state: Dict) -> str:
+    histogram = ', '.join(f"{k} {v}" for k, v in state['histogram'].items())
+    return (f"{state['files']} files, {state['bytes'] / 1024 / 1024:.1f} MiB "
+            f"(median {state['median_bytes'] / 1024 / 1024:.2f} MiB; {histogram or 'empty'}), "
+            f"{state['small_files']} small, {state['unreferenced_files']} unreferenced "
+            f"({state['expired_files']} past retention), "
+            f"{state['commits_since_checkpoint']} commits since checkpoint")
+
+
+def maintain_table(spark, table: ProdTable, path: str, target_bytes: int, min_small_files: int, retention_hours: float,
+                   min_unreferenced_files: int, max_log_commits: int, dry_run: bool = False) -> Dict:
+    """Inspect one table and run the maintenance steps its thresholds call for."""
+    from delta.tables import DeltaTable
+    from etl.delta import cluster
+
+    started = time.monotonic()
+    before = inspect(spark, path, target_bytes, retention_hours)
+    print(f"  {table.name}: {describe(before)}")
+    steps = []
+    if before['small_files'] >= min_small_files:
+        steps.append('optimize')
+    if before['expired_files'] >= min_unreferenced_files:
+        steps.append('vacuum')
+    # OPTIMIZE adds a commit of its own
+    if before['commits_since_checkpoint'] + ('optimize' in steps) >= max_log_commits:
+        steps.append('checkpoint')
+    if not steps or dry_run:
+        print(f"    {'would run: ' + ', '.join(steps) if steps else 'nothing to do'}")
+        return {'before': before, 'after': before, 'steps': steps}
+
+    if 'optimize' in steps:
+        spark.conf.set('spark.databricks.delta.optimize.maxFileSize', str(target_bytes))
+        if table.clustered_by:
+            # Plain bin-packing would mix the clustered files again
+            metrics = cluster(spark, path, table)
+            print(f"    ✓ OPTIMIZE ({table.clustering} by {', '.join(table.clustered_by)}): "
+                  f"{metrics['removed']} files -> {metrics['added']}")
+        else:
+            metrics = DeltaTable.forPath(spark, path).optimize().executeCompaction().select('metrics').first()[0]
+            print(f"    ✓ OPTIMIZE: {metrics['numFilesRemoved']} files -> {metrics['numFilesAdded']}")
+    if 'vacuum' in steps:
+        DeltaTable.forPath(spark, path).vacuum(retention_hours)
+        print(f"    ✓ VACUUM: retention {retention_hours:g}h")
+    if 'checkpoint' in steps:
+        # Delta has no SQL command for this; DeltaLog.checkpoint() writes one for the latest version
+        try:
+            spark.sparkContext._jvm.org.apache.spark.sql.delta.DeltaLog \
+                .forTable(spark._jsparkSession, path).checkpoint()
+            print("    ✓ checkpoint")
+        except Exception as e:  # py4j errors carry the JVM stack trace
+            print(f"    ❌ checkpoint failed: {str(e).splitlines()[0]}")
+
+    after = inspect(spark, path, target_bytes, retention_hours)
+    print(f"    after: {describe(after)} ({time.monotonic() - started:.1f}s)")
+    return {'before': before, 'after': after, 'steps': steps}
+
+
+def is_delta_table(spark, path: str) -> bool:
+    from delta.tables import DeltaTable
+
+    return DeltaTable.isDeltaTable(spark, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OPTIMIZE, VACUUM and checkpoint the production Delta tables")
+    parser.add_argument('--master', default=os.environ.get('SPARK_URL', 'local[*]'),
+                        help="Spark master (default: SPARK_URL or local[*])")
+    parser.add_argument('--prod-root', default=f"s3a://{os.environ.get('S3_PROD_BUCKET', 'prod')}",
+                        help="root the prod_<schema>/<table> Delta tables are under")
+    parser.add_argument('--tables', nargs='+', choices=list(PROD_TABLES), default=list(PROD_TABLES),
+                        help="tables to maintain")
+    parser.add_argument('--target-file-mb', type=int, default=DEFAULT_TARGET_FILE_MB,
+                        help="OPTIMIZE target file size; files under a quarter of it count as small")
+    parser.add_argument('--min-small-files', type=int, default=DEFAULT_MIN_SMALL_FILES,
+                        help="small live files that trigger OPTIMIZE")
+    parser.add_argument('--retention-hours', type=float, default=DEFAULT_RETENTION_HOURS,
+                        help="VACUUM retention; files unreferenced for longer are deleted")
+    parser.add_argument('--min-unreferenced-files', type=int, default=DEFAULT_MIN_UNREFERENCED_FILES,
+                        help="unreferenced files older than the retention that trigger VACUUM")
+    parser.add_argument('--max-log-commits', type=int, default=DEFAULT_MAX_LOG_COMMITS,
+                        help="commits since the last checkpoint that trigger a new checkpoint")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only inspect the tables and print the steps that would run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> Dict[str, Dict]:
+    args = parse_args(argv)
+    spark = build_session(args.master, app_name='prod-maintenance')
+    if args.retention_hours < DEFAULT_RETENTION_HOURS:
+        # Delta refuses shorter retentions unless its safety check is off
+        print(f"⚠️  Retention below {DEFAULT_RETENTION_HOURS}h: readers of older versions may fail")
+        spark.conf.set('spark.databricks.delta.retentionDurationCheck.enabled', 'false')
+    results = {}
+    try:
+        print(f"🧹 Maintaining {', '.join(args.tables)} under {args.prod_root}")
+        for table in args.tables:
+            path = prod_path(args.prod_root, table)
+            if not is_delta_table(spark, path):
+                print(f"  {PROD_TABLES[table].name}: no Delta table at {path}, skipped")
+                continue
+            results[table] = maintain_table(
+                spark, PROD_TABLES[table], path,
+                target_bytes=args.target_file_mb * 1024 * 1024,
+                min_small_files=args.min_small_files,
+                retention_hours=args.retention_hours,
+                min_unreferenced_files=args.min_unreferenced_files,
+                max_log_commits=args.max_log_commits,
+                dry_run=args.dry_run,
+            )
+    finally:
+        spark.stop()
+    print("✅ Maintenance finished")
+    return results
+
+
+if __name__ == "__main__":
+    main()
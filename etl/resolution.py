@@ -0,0 +1,163 @@
+"""
+Hotel entity resolution: maps the hotel names of the review and reservation
+sources to prod_hotels.hotel_id without comparing every name with every hotel.
+
+Names are reduced to sorted token sets (etl.transforms.name_tokens). A source
+name resolves to the hotel with the same token set in the same city, or, failing
+that, to the hotel sharing the most tokens with it (Jaccard score) among the
+hotels of its block: the same city and at least one common token. Tokens that
+more than MAX_BLOCK_SIZE hotels of a block share ("hotel", "inn", ...) are not
+used for blocking, so every candidate join stays close to linear in the input.
+Sources without a city are blocked on tokens alone.
+
+The result is the small prod_hotels.hotel_index table (source, name_key,
+city_key) -> hotel_id, which the builders broadcast (etl.transforms.with_hotel_id).
+"""
+
+from typing import Dict, List
+
+from pyspark.sql import Column, DataFrame, Window, functions as F
+
+from etl.transforms import name_key, name_tokens, token_key
+
+MAX_BLOCK_SIZE = 50
+MIN_SCORE = 0.6
+
+# source -> (raw table, hotel name column, city column or None)
+SOURCES: Dict[str, tuple] = {
+    'reviews_detailed': ('raw_reviews.reviews_detailed', 'hotel_name', None),
+    'reviews_aggregated': ('raw_reviews.reviews_aggregated', 'name', None),
+    'reviews_by_city': ('raw_reviews.reviews_by_city', 'hotel_name', 'city'),
+    'reservations_external': ('raw_reservations.reservations_external', 'property_name', 'city'),
+    'reservations_detailed': ('raw_reservations.reservations_detailed', 'hotel', None),
+}
+
+
+def index_key(source: str, name, city=None) -> List[Column]:
+    """The (source, name_key, city_key) columns a builder joins the index on."""
+    return [
+        F.lit(source).alias('source'),
+        name_key(name).alias('name_key'),
+        (name_key(city) if city is not None else F.lit(None).cast('string')).alias('city_key'),
+    ]
+
+
+def source_names(raw: Dict[str, DataFrame]) -> DataFrame:
+    """Distinct names per source with the number of raw rows carrying them."""
+    names = None
+    for source, (table, name, city) in SOURCES.items():
+        rows = raw[table].select(*index_key(source, name, city), token_key(name).alias('token_key'))
+        names = rows if names is None else names.unionByName(rows)
+    return (
+        names.where(F.col('name_key').isNotNull() & (F.col('name_key') != ''))
+        .groupBy('source', 'name_key', 'city_key', 'token_key')
+        .agg(F.count(F.lit(1)).alias('records'))
+    )
+
+
+def hotel_entities(hotels: DataFrame) -> DataFrame:
+    return hotels.select(
+        'hotel_id',
+        name_key('city').alias('hotel_city_key'),
+        token_key('hotel_name').alias('hotel_token_key'),
+        F.size(name_tokens('hotel_name')).alias('hotel_tokens'),
+    )
+
+
+def unique_best(matches: DataFrame, method: str) -> DataFrame:
+    """Keep the best-scoring hotel per source name; names with tied best hotels stay unresolved."""
+    name = ['source', 'name_key', 'city_key']
+    best = Window.partitionBy(*name)
+    return (
+        matches
+        .withColumn('_best', F.max('score').over(best))
+        .where(F.col('score') == F.col('_best'))
+        .withColumn('_ties', F.count(F.lit(1)).over(best))
+        .where(F.col('_ties') == 1)
+        .select(*name, 'hotel_id', F.lit(method).alias('match_method'), 'score')
+    )
+
+
+def exact_matches(names: DataFrame, entities: DataFrame) -> DataFrame:
+    """Same token set, in the same city when the source has one."""
+    matches = names.join(
+        entities,
+        (names.token_key == entities.hotel_token_key)
+        & (names.city_key.isNull() | (names.city_key == entities.hotel_city_key)),
+    )
+    return unique_best(matches.withColumn('score', F.lit(1.0)), 'exact')
+
+
+def token_matches(names: DataFrame, entities: DataFrame) -> DataFrame:
+    """Best Jaccard score over the hotels sharing a blocking token with the name."""
+    hotel_tokens = entities.select(
+        'hotel_id', 'hotel_city_key', 'hotel_tokens',
+        F.explode(F.split('hotel_token_key', ' ')).alias('token'),
+    )
+    city_block = Window.partitionBy('hotel_city_key', 'token')
+    token_block = Window.partitionBy('token')
+    hotel_tokens = (
+        hotel_tokens
+        .withColumn('_city_block', F.count(F.lit(1)).over(city_block))
+        .withColumn('_token_block', F.count(F.lit(1)).over(token_block))
+    )
+    name_tokens_ = names.select(
+        'source', 'name_key', 'city_key',
+        F.size(F.split('token_key', ' ')).alias('tokens'),
+        F.explode(F.split('token_key', ' ')).alias('token'),
+    )
+    # Drop the oversized blocks before joining, so no join ever expands a common token
+    city_blocks = hotel_tokens.where(F.col('_city_block') <= MAX_BLOCK_SIZE)
+    token_blocks = hotel_tokens.where(F.col('_token_block') <= MAX_BLOCK_SIZE)
+    with_city = name_tokens_.where(F.col('city_key').isNotNull())
+    without_city = name_tokens_.where(F.col('city_key').isNull())
+    pairs = with_city.join(
+        city_blocks,
+        (with_city.token == city_blocks.token) & (with_city.city_key == city_blocks.hotel_city_key),
+    ).drop(city_blocks.token).unionByName(without_city.join(token_blocks, 'token'))
+    # Shared tokens count the blocking tokens only, so the score never overstates a match
+    scored = (
+        pairs.groupBy('source', 'name_key', 'city_key', 'hotel_id')
+        .agg(F.count(F.lit(1)).alias('shared'), F.first('tokens').alias('tokens'),
+             F.first('hotel_tokens').alias('hotel_tokens'))
+        .withColumn('score', F.col('shared') / (F.col('tokens') + F.col('hotel_tokens') - F.col('shared')))
+        .where(F.col('score') >= MIN_SCORE)
+    )
+    return unique_best(scored, 'token')
+
+
+def build_index(raw: Dict[str, DataFrame], hotels: DataFrame) -> DataFrame:
+    """prod_hotels.hotel_index rows: every source name, with its hotel_id when it resolves."""
+    names = source_names(raw)
+    entities = F.broadcast(hotel_entities(hotels))
+    key = ['source', 'name_key', 'city_key']
+
+    def same_name(left: DataFrame, right: DataFrame) -> List[Column]:
+        # city_key is NULL for sources without a city; eqNullSafe keeps those names joined
+        return [left[c].eqNullSafe(right[c]) for c in key]
+
+    exact = exact_matches(names, entities)
+    remaining = names.join(exact, same_name(names, exact), 'left_anti')
+    matches = exact.unionByName(token_matches(remaining, entities))
+    return names.join(matches, same_name(names, matches), 'left').select(
+        *[names[c] for c in key], 'hotel_id',
+        F.coalesce('match_method', F.lit('unmatched')).alias('match_method'),
+        'score', 'records',
+    )
+
+
+def match_report(index: DataFrame) -> Dict[str, Dict]:
+    """Per source: names and raw rows resolved, by method, and the share of rows matched."""
+    report = {}
+    rows = index.groupBy('source', 'match_method').agg(
+        F.count(F.lit(1)).alias('names'), F.sum('records').alias('records'),
+    ).collect()
+    for row in rows:
+        entry = report.setdefault(row['source'], {'names': 0, 'records': 0, 'methods': {}})
+        entry['names'] += row['names']
+        entry['records'] += row['records']
+        entry['methods'][row['match_method']] = {'names': row['names'], 'records': row['records']}
+    for entry in report.values():
+        unmatched = entry['methods'].get('unmatched', {}).get('records', 0)
+        entry['match_rate'] = round(1 - unmatched / entry['records'], 4) if entry['records'] else 0.0
+    return report
@@ -0,0 +1,210 @@
+"""
+Explicit schemas of the raw CSV tables read by the ETL and of the production
+Delta tables it writes. Raw columns are listed in header order, named as in
+sql/trino_schemas_generated.sql, and read as strings like the Hive CSV tables;
+types are applied by the mappings in etl.transforms.
+"""
+
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class RawTable(NamedTuple):
+    location: str  # prefix under the raw root, as in the table's external_location
+    columns: List[str]
+    separator: str = ','
+
+
+RAW_TABLES: Dict[str, RawTable] = {
+    'raw_hotels.hotels': RawTable('hotels/', [
+        'county_code', 'county_name', 'city_code', 'city_name', 'hotel_code', 'hotel_name',
+        'hotel_rating', 'address', 'attractions', 'description', 'fax_number', 'hotel_facilities',
+        'map', 'phone_number', 'pin_code', 'hotel_website_url',
+    ]),
+    'raw_reservations.reservations_external': RawTable('reservations/external/', [
+        'area', 'city', 'country', 'crawl_date', 'highlight_value', 'hotel_overview',
+        'hotel_star_rating', 'image_urls', 'in_your_room', 'is_value_plus', 'latitude', 'longitude',
+        'mmt_holidayiq_review_count', 'mmt_location_rating', 'mmt_review_count', 'mmt_review_rating',
+        'mmt_review_score', 'mmt_traveller_type_review_count', 'mmt_tripadvisor_count', 'pageurl',
+        'property_address', 'property_id', 'property_name', 'property_type', 'qts',
+        'query_time_stamp', 'room_types', 'site_review_count', 'site_review_rating', 'sitename',
+        'state', 'traveller_rating', 'uniq_id',
+    ]),
+    'raw_reservations.reservations_standard': RawTable('reservations/standard/', [
+        'booking_id', 'no_of_adults', 'no_of_children', 'no_of_weekend_nights', 'no_of_week_nights',
+        'type_of_meal_plan', 'required_car_parking_space', 'room_type_reserved', 'lead_time',
+        'arrival_year', 'arrival_month', 'arrival_date', 'market_segment_type', 'repeated_guest',
+        'no_of_previous_cancellations', 'no_of_previous_bookings_not_canceled', 'avg_price_per_room',
+        'no_of_special_requests', 'booking_status',
+    ]),
+    'raw_reservations.reservations_detailed': RawTable('reservations/detailed/', [
+        'hotel', 'is_canceled', 'lead_time', 'arrival_date_year', 'arrival_date_month',
+        'arrival_date_week_number', 'arrival_date_day_of_month', 'stays_in_weekend_nights',
+        'stays_in_week_nights', 'adults', 'children', 'babies', 'meal', 'country', 'market_segment',
+        'distribution_channel', 'is_repeated_guest', 'previous_cancellations',
+        'previous_bookings_not_canceled', 'reserved_room_type', 'assigned_room_type',
+        'booking_changes', 'deposit_type', 'agent', 'company', 'days_in_waiting_list',
+        'customer_type', 'adr', 'required_car_parking_spaces', 'total_of_special_requests',
+        'reservation_status', 'reservation_status_date',
+    ]),
+    'raw_reviews.reviews_aggregated': RawTable('reviews/aggregated/', [
+        'index', 'name', 'area', 'review_date', 'rating_attribute', 'rating_out_of_10', 'review_text',
+    ]),
+    'raw_reviews.reviews_by_city': RawTable('reviews/by_city/', [
+        'doc_id', 'hotel_name', 'hotel_url', 'street', 'city', 'state', 'country', 'zip', 'class',
+        'price', 'num_reviews', 'cleanliness', 'room', 'service', 'location', 'value', 'comfort',
+        'overall_rating', 'source',
+    ]),
+    'raw_reviews.reviews_detailed': RawTable('reviews/detailed/', [
+        'hotel_address', 'additional_number_of_scoring', 'review_date', 'average_score', 'hotel_name',
+        'reviewer_nationality', 'negative_review', 'review_total_negative_word_counts',
+        'total_number_of_reviews', 'positive_review', 'review_total_positive_word_counts',
+        'total_number_of_reviews_reviewer_has_given', 'reviewer_score', 'tags', 'days_since_review',
+        'lat', 'lng',
+    ]),
+}
+
+
+class ProdTable(NamedTuple):
+    name: str  # schema.table in the delta catalog
+    columns: List[Tuple[str, str]]  # (name, Trino type)
+    key: str
+    partitioned_by: List[str]
+    # Columns the files are clustered on within each partition (etl.delta.cluster), so the
+    # per-file min/max stats Delta keeps for the first 32 columns stay narrow on them
+    clustered_by: Tuple[str, ...] = ()
+    # 'zorder' (OPTIMIZE ZORDER BY) or 'hilbert' (liquid clustering, needs an unpartitioned table)
+    clustering: str = 'zorder'
+
+
+# Production tables of architecture/data.md. row_hash is the digest of all mapped
+# columns, used to merge only new or changed rows. Reviews and reservations are
+# clustered on the columns the dashboards filter on that their partitions do not
+# cover; hotel_id lets filters on the hotels' country and city prune them via the join.
+PROD_TABLES: Dict[str, ProdTable] = {
+    'hotels': ProdTable('prod_hotels.hotels', [
+        ('hotel_id', 'VARCHAR'),
+        ('hotel_name', 'VARCHAR'),
+        ('hotel_code', 'VARCHAR'),
+        ('rating', 'DOUBLE'),
+        ('address', 'VARCHAR'),
+        ('zip_code', 'VARCHAR'),
+        ('latitude', 'DOUBLE'),
+        ('longitude', 'DOUBLE'),
+        ('facilities', 'ARRAY(VARCHAR)'),
+        ('phone', 'VARCHAR'),
+        ('website', 'VARCHAR'),
+        ('row_hash', 'VARCHAR'),
+        ('country', 'VARCHAR'),
+        ('city', 'VARCHAR'),
+    ], 'hotel_id', ['country', 'city']),
+    # Source hotel names resolved to hotel_id by etl.resolution, rewritten on every run
+    'hotel_index': ProdTable('prod_hotels.hotel_index', [
+        ('name_key', 'VARCHAR'),
+        ('city_key', 'VARCHAR'),
+        ('hotel_id', 'VARCHAR'),
+        ('match_method', 'VARCHAR'),
+        ('score', 'DOUBLE'),
+        ('records', 'BIGINT'),
+        ('source', 'VARCHAR'),
+    ], 'name_key', ['source']),
+    'reviews': ProdTable('prod_reviews.reviews', [
+        ('review_id', 'VARCHAR'),
+        ('hotel_id', 'VARCHAR'),
+        ('hotel_name', 'VARCHAR'),
+        ('reviewer_nationality', 'VARCHAR'),
+        ('reviewer_type', 'VARCHAR'),
+        ('review_text', 'VARCHAR'),
+        ('positive_review', 'VARCHAR'),
+        ('negative_review', 'VARCHAR'),
+        ('overall_rating', 'DOUBLE'),
+        ('cleanliness_rating', 'DOUBLE'),
+        ('room_rating', 'DOUBLE'),
+        ('service_rating', 'DOUBLE'),
+        ('location_rating', 'DOUBLE'),
+        ('value_rating', 'DOUBLE'),
+        ('comfort_rating', 'DOUBLE'),
+        ('row_hash', 'VARCHAR'),
+        ('review_date', 'DATE'),
+    ], 'review_id', ['review_date'], ('reviewer_nationality', 'hotel_id')),
+    'reservations': ProdTable('prod_reservations.reservations', [
+        ('booking_id', 'VARCHAR'),
+        ('hotel_id', 'VARCHAR'),
+        ('num_adults', 'INTEGER'),
+        ('num_children', 'INTEGER'),
+        ('num_babies', 'INTEGER'),
+        ('arrival_date', 'DATE'),
+        ('num_weekend_nights', 'INTEGER'),
+        ('num_week_nights', 'INTEGER'),
+        ('room_type', 'VARCHAR'),
+        ('lead_time', 'INTEGER'),
+        ('market_segment', 'VARCHAR'),
+        ('avg_price_per_room', 'DOUBLE'),
+        ('meal_plan', 'VARCHAR'),
+        ('car_parking_required', 'BOOLEAN'),
+        ('num_special_requests', 'INTEGER'),
+        ('is_repeated_guest', 'BOOLEAN'),
+        ('previous_cancellations', 'INTEGER'),
+        ('booking_status', 'VARCHAR'),
+        ('is_canceled', 'BOOLEAN'),
+        ('row_hash', 'VARCHAR'),
+        ('arrival_year', 'INTEGER'),
+        ('arrival_month', 'INTEGER'),
+    ], 'booking_id', ['arrival_year', 'arrival_month'], ('market_segment', 'hotel_id')),
+}
+
+
+def raw_schema(table_key: str):
+    """Spark schema of a raw table: every column a string, in header order."""
+    from pyspark.sql.types import StructType, StructField, StringType
+
+    return StructType([StructField(c, StringType()) for c in RAW_TABLES[table_key].columns])
+
+
+def spark_type(trino_type: str):
+    from pyspark.sql import types as T
+
+    if trino_type.startswith('ARRAY(') and trino_type.endswith(')'):
+        return T.ArrayType(spark_type(trino_type[len('ARRAY('):-1]))
+    return {
+        'VARCHAR': T.StringType(),
+        'DOUBLE': T.DoubleType(),
+        'INTEGER': T.IntegerType(),
+        'BIGINT': T.LongType(),
+        'BOOLEAN': T.BooleanType(),
+        'DATE': T.DateType(),
+    }[trino_type]
+
+
+def prod_schema(table: str):
+    """Spark schema of a production table, in the column order of its Trino DDL."""
+    from pyspark.sql.types import StructType, StructField
+
+    return StructType([StructField(c, spark_type(t)) for c, t in PROD_TABLES[table].columns])
+
+
+def prod_ddl(prod_bucket: str = 'prod') -> List[str]:
+    """Trino DDL of the production schemas and tables (sql/prod_trino_schemas.sql)."""
+    lines = [
+        "-- " + "=" * 60,
+        "-- PRODUCTION DELTA LAKE SCHEMAS (written by the ETL in etl/)",
+        "-- Generated by: python3 -m etl.job --ddl",
+        "-- " + "=" * 60,
+        "",
+    ]
+    for table in PROD_TABLES.values():
+        schema, name = table.name.split('.', 1)
+        columns = ",\n    ".join(f"{c} {t}" for c, t in table.columns)
+        partitions = ", ".join(f"'{c}'" for c in table.partitioned_by)
+        lines.extend([
+            f"-- Schema: {schema}",
+            f"CREATE SCHEMA IF NOT EXISTS delta.{schema} WITH (location = 's3://{prod_bucket}/{schema}/');",
+            f"USE delta.{schema};",
+            "",
+            f"CREATE TABLE IF NOT EXISTS {name} (\n    {columns}\n)",
+            "WITH (",
+            f"    location = 's3://{prod_bucket}/{schema}/{name}',",
+            f"    partitioned_by = ARRAY[{partitions}]",
+            ");",
+            "",
+        ])
+    return lines
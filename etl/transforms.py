@@ -0,0 +1,310 @@
+"""
+Field mappings of architecture/data.md as Spark column expressions (no Python
+UDFs, so every step runs in the JVM). Each builder returns the production rows
+plus a `_reject` column naming the first data quality rule a row breaks.
+
+Casts follow the typed views of generate_trino_schemas.py: blanks and null
+tokens become NULL and values that do not parse become NULL (ANSI mode off).
+"""
+
+from functools import reduce
+from typing import Dict, List, Tuple
+
+from pyspark.sql import Column, DataFrame, Window, functions as F
+
+from etl.schemas import PROD_TABLES
+
+# Same tokens as generate_trino_schemas.NULL_TOKENS
+NULL_TOKENS = ['', 'na', 'n/a', 'nan', 'null', 'none', '-']
+TRUE_TOKENS = ['1', 'true', 't', 'yes', 'y']
+FALSE_TOKENS = ['0', 'false', 'f', 'no', 'n']
+
+# HotelRating of the makemytrip hotels is spelled out ("FourStar")
+STAR_RATINGS = {'onestar': 1.0, 'twostar': 2.0, 'threestar': 3.0, 'fourstar': 4.0, 'fivestar': 5.0}
+# Trip type tag of a detailed review, e.g. "[' Leisure trip ', ' Couple ', ...]"
+REVIEWER_TYPE_RE = (
+    r'(Solo traveler|Couple|Family with young children|Family with older children|'
+    r'Group|Travelers with friends)'
+)
+# Date layouts seen in the raw review files
+REVIEW_DATE_FORMATS = ['M/d/yyyy', 'yyyy-MM-dd', 'd MMM yyyy', 'MMMM d, yyyy']
+
+Rules = List[Tuple[str, Column]]
+
+
+def col(c) -> Column:
+    return F.col(c) if isinstance(c, str) else c
+
+
+def clean(c) -> Column:
+    """Trimmed string; NULL for blanks and null tokens."""
+    value = F.trim(col(c))
+    return F.when(F.lower(value).isin(NULL_TOKENS), F.lit(None).cast('string')).otherwise(value)
+
+
+def to_double(c) -> Column:
+    return clean(c).cast('double')
+
+
+def to_int(c) -> Column:
+    # "2.0" in float-typed exports still counts as 2
+    return clean(c).cast('double').cast('int')
+
+
+def to_flag(c) -> Column:
+    value = F.lower(clean(c))
+    return (
+        F.when(value.isin(TRUE_TOKENS), F.lit(True))
+        .when(value.isin(FALSE_TOKENS), F.lit(False))
+        .otherwise(value.cast('double') > 0)
+    )
+
+
+def to_date(c, formats: List[str]) -> Column:
+    value = clean(c)
+    return F.coalesce(*[F.to_date(value, fmt) for fmt in formats])
+
+
+def star_rating(c) -> Column:
+    stars = F.create_map(*[F.lit(x) for pair in STAR_RATINGS.items() for x in pair])
+    return F.coalesce(stars[F.regexp_replace(F.lower(clean(c)), r'\s+', '')], to_double(c))
+
+
+def name_key(c) -> Column:
+    """Lookup key of a hotel or city name: lower case, punctuation and spacing collapsed."""
+    return F.trim(F.regexp_replace(F.lower(clean(c)), r'[^\p{L}\p{N}]+', ' '))
+
+
+def name_tokens(c) -> Column:
+    """Distinct tokens of a name in sorted order, so word order and repeats do not matter."""
+    return F.array_sort(F.array_distinct(F.array_remove(F.split(name_key(c), ' '), '')))
+
+
+def token_key(c) -> Column:
+    """Space-joined name_tokens; NULL for names without tokens."""
+    return F.nullif(F.array_join(name_tokens(c), ' '), F.lit(''))
+
+
+def stable_id(*columns) -> Column:
+    """Deterministic UUID-formatted id from the digest of the given columns."""
+    digest = F.sha2(F.concat_ws('\u001f', *[F.coalesce(col(c).cast('string'), F.lit('')) for c in columns]), 256)
+    return F.concat_ws('-', *[F.substring(digest, start, length)
+                              for start, length in ((1, 8), (9, 4), (13, 4), (17, 4), (21, 12))])
+
+
+def hotel_id(name, city) -> Column:
+    """hotel_id: UUID based on name + location (token set of the name and the city)."""
+    return stable_id(token_key(name), name_key(city))
+
+
+def in_range(c, low: float, high: float) -> Column:
+    """Range rule that lets NULL through (optional measures)."""
+    return col(c).isNull() | col(c).between(low, high)
+
+
+def reject_reason(rules: Rules) -> Column:
+    """Name of the first rule a row breaks, or NULL. A rule evaluating to NULL fails."""
+    return reduce(
+        lambda rest, rule: F.when(~F.coalesce(rule[1], F.lit(False)), F.lit(rule[0])).otherwise(rest),
+        reversed(rules),
+        F.lit(None).cast('string'),
+    )
+
+
+def finish(df: DataFrame, table: str, rules: Rules) -> DataFrame:
+    """Production column order, row_hash over the mapped columns and the _reject column."""
+    columns = [c for c, _ in PROD_TABLES[table].columns if c != 'row_hash']
+    return df.select(
+        *columns,
+        F.sha2(F.to_json(F.struct(*columns)), 256).alias('row_hash'),
+        reject_reason(rules).alias('_reject'),
+    ).select(*[c for c, _ in PROD_TABLES[table].columns], '_reject')
+
+
+def latest_per_key(df: DataFrame, key: str, order: List[str]) -> DataFrame:
+    """One row per key (MERGE needs unique source keys); the order makes the pick deterministic."""
+    window = Window.partitionBy(key).orderBy(*[F.col(c).asc_nulls_last() for c in order])
+    return df.withColumn('_n', F.row_number().over(window)).where(F.col('_n') == 1).drop('_n')
+
+
+def hotel_lookup(index: DataFrame, source: str) -> DataFrame:
+    """Broadcastable (name_key, city_key) -> hotel_id of one source's resolved names."""
+    return F.broadcast(
+        index.where((F.col('source') == source) & F.col('hotel_id').isNotNull())
+        .select('name_key', 'city_key', 'hotel_id')
+    )
+
+
+def with_hotel_id(rows: DataFrame, index: DataFrame, source: str, name, city=None) -> DataFrame:
+    """rows plus the hotel_id their name (and city) resolves to in the index."""
+    keyed = rows.withColumn('_name_key', name_key(name)).withColumn(
+        '_city_key', name_key(city) if city is not None else F.lit(None).cast('string'),
+    )
+    resolved = hotel_lookup(index, source)
+    condition = [
+        keyed['_name_key'] == resolved['name_key'],
+        keyed['_city_key'].eqNullSafe(resolved['city_key']),
+    ]
+    return keyed.join(resolved, condition, 'left').drop('_name_key', '_city_key', 'name_key', 'city_key')
+
+
+def build_hotels(raw: Dict[str, DataFrame]) -> DataFrame:
+    """prod_hotels.hotels from the makemytrip hotels, with coordinates from the external sample."""
+    coordinates = (
+        raw['raw_reservations.reservations_external']
+        .select(
+            token_key('property_name').alias('token_key'),
+            name_key('city').alias('city_key'),
+            to_double('latitude').alias('latitude'),
+            to_double('longitude').alias('longitude'),
+        )
+        .where(F.col('latitude').isNotNull() & F.col('longitude').isNotNull())
+        .groupBy('token_key', 'city_key')
+        .agg(F.avg('latitude').alias('latitude'), F.avg('longitude').alias('longitude'))
+    )
+    hotels = raw['raw_hotels.hotels'].select(
+        hotel_id('hotel_name', 'city_name').alias('hotel_id'),
+        clean('hotel_name').alias('hotel_name'),
+        clean('hotel_code').alias('hotel_code'),
+        star_rating('hotel_rating').alias('rating'),
+        clean('address').alias('address'),
+        clean('pin_code').alias('zip_code'),
+        F.split(clean('hotel_facilities'), r'\s*,\s*').alias('facilities'),
+        clean('phone_number').alias('phone'),
+        clean('hotel_website_url').alias('website'),
+        clean('county_name').alias('country'),
+        clean('city_name').alias('city'),
+        token_key('hotel_name').alias('token_key'),
+        name_key('city_name').alias('city_key'),
+    )
+    hotels = hotels.join(F.broadcast(coordinates), ['token_key', 'city_key'], 'left')
+    hotels = latest_per_key(hotels, 'hotel_id', ['hotel_code', 'address'])
+    return finish(hotels, 'hotels', [
+        ('hotel_name_missing', F.col('hotel_name').isNotNull()),
+        ('city_missing', F.col('city').isNotNull()),
+        ('rating_out_of_range', in_range('rating', 0, 5)),
+    ])
+
+
+def build_reviews(raw: Dict[str, DataFrame], index: DataFrame) -> DataFrame:
+    """prod_reviews.reviews from the detailed reviews. Category ratings are hotel-level
+    averages from the by-city files and the text falls back to the aggregated reviews,
+    both matched on the resolved hotel_id (and date for the text).
+    """
+    detailed = raw['raw_reviews.reviews_detailed']
+    positive = F.when(F.lower(clean('positive_review')) == 'no positive', None).otherwise(clean('positive_review'))
+    negative = F.when(F.lower(clean('negative_review')) == 'no negative', None).otherwise(clean('negative_review'))
+    reviews = detailed.select(
+        stable_id(F.lit('detailed'), *detailed.columns).alias('review_id'),
+        clean('hotel_name').alias('hotel_name'),
+        clean('reviewer_nationality').alias('reviewer_nationality'),
+        F.nullif(F.regexp_extract(F.col('tags'), REVIEWER_TYPE_RE, 1), F.lit('')).alias('reviewer_type'),
+        to_date('review_date', REVIEW_DATE_FORMATS).alias('review_date'),
+        positive.alias('positive_review'),
+        negative.alias('negative_review'),
+        to_double('reviewer_score').alias('overall_rating'),
+    )
+    reviews = with_hotel_id(reviews, index, 'reviews_detailed', 'hotel_name')
+
+    texts = (
+        with_hotel_id(raw['raw_reviews.reviews_aggregated'], index, 'reviews_aggregated', 'name')
+        .select(
+            'hotel_id',
+            to_date('review_date', REVIEW_DATE_FORMATS).alias('review_date'),
+            clean('review_text').alias('text'),
+            to_int('index').alias('position'),
+        )
+        .where(F.col('hotel_id').isNotNull() & F.col('text').isNotNull())
+        .groupBy('hotel_id', 'review_date')
+        .agg(F.min_by('text', 'position').alias('aggregated_text'))
+    )
+    categories = ['cleanliness', 'room', 'service', 'location', 'value', 'comfort']
+    ratings = (
+        with_hotel_id(raw['raw_reviews.reviews_by_city'], index, 'reviews_by_city', 'hotel_name', 'city')
+        .select('hotel_id', *[to_double(c).alias(c) for c in categories])
+        .where(F.col('hotel_id').isNotNull())
+        .groupBy('hotel_id')
+        .agg(*[F.avg(c).alias(f"{c}_rating") for c in categories])
+    )
+
+    reviews = (
+        reviews
+        .join(texts, ['hotel_id', 'review_date'], 'left')
+        .join(ratings, ['hotel_id'], 'left')
+        .withColumn('review_text', F.coalesce(
+            F.col('aggregated_text'),
+            F.nullif(F.concat_ws('\n', 'positive_review', 'negative_review'), F.lit('')),
+        ))
+    )
+    reviews = latest_per_key(reviews, 'review_id', ['review_date'])
+    return finish(reviews, 'reviews', [
+        ('review_date_missing', F.col('review_date').isNotNull()),
+        ('overall_rating_out_of_range', in_range('overall_rating', 0, 10)),
+        ('rating_out_of_range', reduce(lambda a, b: a & b, [in_range(f"{c}_rating", 0, 10) for c in categories])),
+        ('review_text_missing', F.col('review_text').isNotNull() | F.col('negative_review').isNotNull()),
+    ])
+
+
+def build_reservations(raw: Dict[str, DataFrame], index: DataFrame) -> DataFrame:
+    """prod_reservations.reservations: the standard bookings and the detailed ones
+    (which have no booking id, so one is generated from the whole row).
+    """
+    standard = raw['raw_reservations.reservations_standard'].select(
+        clean('booking_id').alias('booking_id'),
+        F.lit(None).cast('string').alias('hotel_id'),
+        to_int('no_of_adults').alias('num_adults'),
+        to_int('no_of_children').alias('num_children'),
+        F.lit(None).cast('int').alias('num_babies'),
+        F.to_date(F.format_string('%04d-%02d-%02d', to_int('arrival_year'), to_int('arrival_month'),
+                                  to_int('arrival_date'))).alias('arrival_date'),
+        to_int('no_of_weekend_nights').alias('num_weekend_nights'),
+        to_int('no_of_week_nights').alias('num_week_nights'),
+        clean('room_type_reserved').alias('room_type'),
+        to_int('lead_time').alias('lead_time'),
+        clean('market_segment_type').alias('market_segment'),
+        to_double('avg_price_per_room').alias('avg_price_per_room'),
+        clean('type_of_meal_plan').alias('meal_plan'),
+        to_flag('required_car_parking_space').alias('car_parking_required'),
+        to_int('no_of_special_requests').alias('num_special_requests'),
+        to_flag('repeated_guest').alias('is_repeated_guest'),
+        to_int('no_of_previous_cancellations').alias('previous_cancellations'),
+        clean('booking_status').alias('booking_status'),
+        (F.lower(clean('booking_status')) == 'canceled').alias('is_canceled'),
+    )
+    detailed_raw = raw['raw_reservations.reservations_detailed']
+    detailed = with_hotel_id(detailed_raw, index, 'reservations_detailed', 'hotel').select(
+        stable_id(F.lit('detailed'), *detailed_raw.columns).alias('booking_id'),
+        'hotel_id',
+        to_int('adults').alias('num_adults'),
+        to_int('children').alias('num_children'),
+        to_int('babies').alias('num_babies'),
+        F.to_date(F.concat_ws('-', clean('arrival_date_year'), clean('arrival_date_month'),
+                              clean('arrival_date_day_of_month')), 'yyyy-MMMM-d').alias('arrival_date'),
+        to_int('stays_in_weekend_nights').alias('num_weekend_nights'),
+        to_int('stays_in_week_nights').alias('num_week_nights'),
+        clean('reserved_room_type').alias('room_type'),
+        to_int('lead_time').alias('lead_time'),
+        clean('market_segment').alias('market_segment'),
+        to_double('adr').alias('avg_price_per_room'),
+        clean('meal').alias('meal_plan'),
+        to_flag('required_car_parking_spaces').alias('car_parking_required'),
+        to_int('total_of_special_requests').alias('num_special_requests'),
+        to_flag('is_repeated_guest').alias('is_repeated_guest'),
+        to_int('previous_cancellations').alias('previous_cancellations'),
+        clean('reservation_status').alias('booking_status'),
+        to_flag('is_canceled').alias('is_canceled'),
+    )
+    reservations = (
+        standard.unionByName(detailed)
+        .withColumn('arrival_year', F.year('arrival_date'))
+        .withColumn('arrival_month', F.month('arrival_date'))
+    )
+    reservations = latest_per_key(reservations, 'booking_id', ['arrival_date'])
+    nights = F.coalesce(F.col('num_weekend_nights'), F.lit(0)) + F.coalesce(F.col('num_week_nights'), F.lit(0))
+    return finish(reservations, 'reservations', [
+        ('booking_id_missing', F.col('booking_id').isNotNull()),
+        ('arrival_date_missing', F.col('arrival_date').isNotNull()),
+        ('no_adults', F.col('num_adults') > 0),
+        ('no_nights', nights > 0),
+        ('price_not_positive', F.col('avg_price_per_room') > 0),
+    ])
@@ -0,0 +1,241 @@
+"""
+Benchmark compressed raw CSVs: bytes Trino reads and query time for the reviews tables
+stored plain, gzip and zstd.
+
+Each codec gets a copy of the table's files under s3://<raw bucket>/_bench/<codec>/<table>/,
+uploaded with the same streaming compressor as upload_raw_to_s3.py, and a table in
+hive.raw_bench built from the generator manifest. Every query runs --repeat times per codec;
+the median wall time and Trino's physical input bytes are reported.
+
+Requires boto3 (zstandard for zstd) and a running Trino. Run generate_trino_schemas.py first.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from generate_trino_schemas import (
+    MANIFEST_PATH,
+    RAW_COMPRESSION_SUFFIXES,
+    load_env,
+    scan_from_manifest,
+    schema_header_sql,
+    table_objects,
+    drop_objects_sql,
+    table_sql,
+)
+from run_trino_sql import (
+    DEFAULT_TRINO_URL,
+    DEFAULT_TRINO_USER,
+    ConnectionPool,
+    Statement,
+    TrinoClient,
+    TrinoError,
+    group_statements,
+)
+from upload_raw_to_s3 import (
+    DEFAULT_PART_SIZE,
+    DEFAULT_PART_JOBS,
+    LocalFile,
+    boto3,
+    zstandard,
+    s3_client,
+    list_remote_objects,
+    upload_file,
+)
+
+BENCH_SCHEMA = 'raw_bench'
+BENCH_PREFIX = '_bench'
+DEFAULT_TABLES = 'raw_reviews.'
+DEFAULT_REPEAT = 3
+
+# CSV is row-oriented, so both read every byte; the second also parses a column
+QUERIES = {
+    'count': "SELECT count(*) FROM {table}",
+    'distinct': "SELECT count(DISTINCT {column}) FROM {table}",
+}
+
+
+def load_bench_tables(prefix: str) -> Dict[str, Dict]:
+    """Manifest scans of the tables whose key starts with prefix."""
+    if not MANIFEST_PATH.exists():
+        print(f"❌ {MANIFEST_PATH} not found; run generate_trino_schemas.py first")
+        sys.exit(1)
+    with MANIFEST_PATH.open() as f:
+        manifest = json.load(f)
+    return {
+        key: scan_from_manifest(entry)
+        for key, entry in sorted(manifest.get('tables', {}).items())
+        if key.startswith(prefix)
+    }
+
+
+def stage_table(client, part_pool: ThreadPoolExecutor, bucket: str, remote: Dict, codec: str,
+                table_name: str, files: List[Path], part_size: int) -> int:
+    """Upload one table's files for a codec; returns the bytes stored in S3."""
+    cache: Dict[str, Dict] = {}
+    lock = threading.Lock()
+    stored = 0
+    for path in files:
+        local = LocalFile(path, f"{BENCH_PREFIX}/{codec}/{table_name}/{path.name}", cache, lock)
+        r = upload_file(client, part_pool, bucket, local, remote, part_size, False, codec)
+        if r['status'] == 'failed':
+            raise RuntimeError(f"{r['key']}: {r['error']}")
+        head = client.head_object(Bucket=bucket, Key=r['key'])
+        stored += head['ContentLength']
+    return stored
+
+
+def run_statements(client: TrinoClient, sql: str):
+    for statements in group_statements(sql).values():
+        for stmt in statements:
+            client.execute(stmt)
+
+
+def bench_ddl(scans: Dict[str, Dict], codecs: List[str], bucket: str) -> str:
+    lines = schema_header_sql(BENCH_SCHEMA)
+    for key, scan in scans.items():
+        table = key.split('.', 1)[1]
+        for codec in codecs:
+            name = f"{table}_{codec}"
+            lines.extend(table_sql(
+                scan, BENCH_SCHEMA, name, f"s3://{bucket}/{BENCH_PREFIX}/{codec}/{table}/",
+                replace=table_objects(scan, name), compression=codec,
+            ))
+    return '\n'.join(lines)
+
+
+def cleanup(trino: TrinoClient, s3, bucket: str, scans: Dict[str, Dict], codecs: List[str]):
+    lines = [f"USE hive.{BENCH_SCHEMA};"]
+    for key, scan in scans.items():
+        for codec in codecs:
+            lines.extend(drop_objects_sql(table_objects(scan, f"{key.split('.', 1)[1]}_{codec}")))
+    lines.append(f"DROP SCHEMA IF EXISTS hive.{BENCH_SCHEMA};")
+    run_statements(trino, '\n'.join(lines))
+    for key in list_remote_objects(s3, bucket):
+        if key.startswith(f"{BENCH_PREFIX}/"):
+            s3.delete_object(Bucket=bucket, Key=key)
+
+
+def benchmark(codecs: List[str], tables: str = DEFAULT_TABLES, repeat: int = DEFAULT_REPEAT,
+              url: str = DEFAULT_TRINO_URL, user: str = DEFAULT_TRINO_USER,
+              part_size: int = DEFAULT_PART_SIZE, keep: bool = False,
+              report: Optional[Path] = None) -> List[Dict]:
+    bucket = os.environ.get('S3_RAW_BUCKET', 'raw')
+    scans = load_bench_tables(tables)
+    if not scans:
+        print(f"❌ No tables matching '{tables}' in {MANIFEST_PATH}")
+        sys.exit(1)
+
+    s3 = s3_client(max_connections=DEFAULT_PART_JOBS + 1)
+    remote = list_remote_objects(s3, bucket)
+    stored: Dict[tuple, int] = {}
+    print(f"⬆️  Staging {len(scans)} tables x {len(codecs)} codecs under s3://{bucket}/{BENCH_PREFIX}/")
+    with ThreadPoolExecutor(max_workers=DEFAULT_PART_JOBS) as part_pool:
+        for key, scan in scans.items():
+            files = [f for layout in scan['layouts'] for f in layout['files']] or [scan['file']]
+            for codec in codecs:
+                stored[key, codec] = stage_table(
+                    s3, part_pool, bucket, remote, codec, key.split('.', 1)[1], files, part_size,
+                )
+
+    pool = ConnectionPool(url, size=1)
+    trino = TrinoClient(pool, user)
+    results = []
+    try:
+        run_statements(trino, bench_ddl(scans, codecs, bucket))
+        for key, scan in scans.items():
+            table = key.split('.', 1)[1]
+            for query_name, template in QUERIES.items():
+                for codec in codecs:
+                    sql = template.format(table=f"{table}_{codec}", column=scan['columns'][0])
+                    runs = [trino.execute(Statement(sql, 'hive', BENCH_SCHEMA, 0)) for _ in range(repeat)]
+                    results.append({
+                        'table': key,
+                        'query': query_name,
+                        'codec': codec,
+                        'stored_bytes': stored[key, codec],
+                        'physical_input_bytes': runs[-1]['physical_input_bytes'],
+                        'median_seconds': statistics.median(r['seconds'] for r in runs),
+                        'median_cpu_ms': statistics.median(r['cpu_ms'] or 0 for r in runs),
+                        'result': runs[-1]['first_row'],
+                    })
+    finally:
+        if not keep:
+            cleanup(trino, s3, bucket, scans, codecs)
+        pool.close()
+
+    print_results(results)
+    if report:
+        report.parent.mkdir(parents=True, exist_ok=True)
+        with report.open('w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"🧾 Benchmark report: {report}")
+    return results
+
+
+def print_results(results: List[Dict]):
+    mb = 1024 * 1024
+    print(f"\n{'table':<34} {'query':<9} {'codec':<5} {'stored MB':>10} {'read MB':>9} "
+          f"{'median s':>9} {'vs none':>8}  result")
+    baseline = {(r['table'], r['query']): r for r in results if r['codec'] == 'none'}
+    for r in results:
+        base = baseline.get((r['table'], r['query']))
+        speedup = f"{base['median_seconds'] / r['median_seconds']:.2f}x" if base and r['median_seconds'] else ""
+        read = r['physical_input_bytes'] / mb if r['physical_input_bytes'] is not None else float('nan')
+        mismatch = " ⚠️ differs" if base and base['result'] != r['result'] else ""
+        print(f"{r['table']:<34} {r['query']:<9} {r['codec']:<5} {r['stored_bytes'] / mb:>10.2f} {read:>9.2f} "
+              f"{r['median_seconds']:>9.3f} {speedup:>8}  {r['result']}{mismatch}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark gzip/zstd raw CSVs in Trino")
+    parser.add_argument('--codecs', default='none,gzip,zstd',
+                        help="comma-separated codecs to compare (none is the baseline)")
+    parser.add_argument('--tables', default=DEFAULT_TABLES,
+                        help="manifest table key prefix to benchmark (default: raw_reviews.)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="runs per query and codec")
+    parser.add_argument('--url', default=None,
+                        help=f"coordinator URL (default: TRINO_URL or {DEFAULT_TRINO_URL})")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the raw_bench tables and _bench/ objects")
+    parser.add_argument('--report', type=Path, default=None,
+                        help="write results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_env()
+    codecs = [c.strip() for c in args.codecs.split(',') if c.strip()]
+    unknown = [c for c in codecs if c not in RAW_COMPRESSION_SUFFIXES]
+    if unknown:
+        print(f"❌ Unknown codec(s): {', '.join(unknown)}")
+        sys.exit(1)
+    if boto3 is None:
+        print("❌ boto3 is required: pip install boto3")
+        sys.exit(1)
+    if 'zstd' in codecs and zstandard is None:
+        print("⚠️  zstandard not installed, skipping zstd")
+        codecs.remove('zstd')
+    try:
+        benchmark(
+            codecs,
+            tables=args.tables,
+            repeat=args.repeat,
+            url=args.url or os.environ.get('TRINO_URL', DEFAULT_TRINO_URL),
+            user=os.environ.get('TRINO_USER', DEFAULT_TRINO_USER),
+            keep=args.keep,
+            report=args.report,
+        )
+    except TrinoError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
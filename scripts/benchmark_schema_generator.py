@@ -0,0 +1,339 @@
+"""
+Benchmark generate_trino_schemas.py on synthetic raw/ trees.
+
+Each scenario builds a tree that stresses one dimension of the generator:
+  many_files  thousands of small CSVs, as per-file tables and one multi-file table
+  large_file  one multi-GB CSV (sampling reads every row)
+  wide        500-column headers
+  mixed_sep   ',', ';', tab, '|' and ', ' separators, also within one table
+  nested      reviews/by_city-style folders, a few levels deep
+
+collect_csv_files, detect_separator and get_csv_columns (over every file of the
+tree) and whole generate_sql runs (--full, then incremental against the manifest
+it wrote) are measured one at a time in a fresh process each: wall time, peak
+RSS and bytes read (rchar from /proc/self/io, Linux only). generate_sql runs
+with one job, so every read happens in the measured process.
+
+Trees are cached under --work-dir by their parameters. Results are compared with
+--baseline when it exists and --save-baseline replaces it; a metric above
+--tolerance times its baseline value is a regression (exit status 1).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import resource
+import statistics
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import generate_trino_schemas as gts
+
+BENCH_BASELINE = Path("sql/trino_schema_benchmark.json")
+BENCH_VERSION = 1
+DEFAULT_WORK_DIR = Path(os.environ.get('TMPDIR', '/tmp')) / 'trino-schema-bench'
+TREE_MARKER = '_tree.json'
+DEFAULT_TOLERANCE = 1.25
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_RSS_DELTA_MB = 8
+MIN_BYTES_DELTA = 1024 * 1024
+
+SCENARIOS = ['many_files', 'large_file', 'wide', 'mixed_sep', 'nested']
+FUNCTIONS = ['collect_csv_files', 'detect_separator', 'get_csv_columns', 'generate_sql', 'generate_sql_incremental']
+
+DEFAULT_PARAMS = {'files': 2000, 'large_file_mb': 2048, 'wide_columns': 500, 'rows': 200}
+QUICK_PARAMS = {'files': 200, 'large_file_mb': 32, 'wide_columns': 500, 'rows': 50}
+
+# Column kinds of the synthetic data, cycled over the header
+KINDS = ['id', 'name', 'int', 'decimal', 'date', 'bool', 'text', 'float']
+WORDS = ['hotel', 'grand', 'plaza', 'river', 'view', 'city', 'inn', 'park', 'royal', 'lake', 'suites', 'garden']
+
+
+def header(columns: int) -> List[str]:
+    return [f"{KINDS[i % len(KINDS)]}Column{i}" for i in range(columns)]
+
+
+def value(kind: str, rng: random.Random, row: int) -> str:
+    if kind == 'id':
+        return str(row)
+    if kind == 'name':
+        return ' '.join(rng.choice(WORDS).title() for _ in range(3))
+    if kind == 'int':
+        return str(rng.randint(0, 100000))
+    if kind == 'decimal':
+        return f"{rng.uniform(0, 1000):.2f}"
+    if kind == 'date':
+        return f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if kind == 'bool':
+        return rng.choice(['true', 'false'])
+    if kind == 'float':
+        return repr(rng.random() * 10 ** rng.randint(-3, 6))
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+
+
+def csv_text(columns: int, rows: int, separator: str = ',', seed: int = 0, start: int = 0,
+             with_header: bool = True) -> str:
+    rng = random.Random(seed)
+    names = header(columns)
+    joiner = ', ' if separator == ', ' else separator
+    delim = separator[0]
+    lines = [joiner.join(names)] if with_header else []
+    for row in range(start, start + rows):
+        fields = [value(KINDS[i % len(KINDS)], rng, row) for i in range(columns)]
+        lines.append(joiner.join(f'"{f}"' if delim in f else f for f in fields))
+    return '\n'.join(lines) + '\n'
+
+
+def write_csv(path: Path, columns: int, rows: int, separator: str = ',', seed: int = 0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(csv_text(columns, rows, separator, seed))
+
+
+def write_large_csv(path: Path, columns: int, size_bytes: int, seed: int = 0):
+    """One header, then blocks of generated rows repeated up to size_bytes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    blocks = [csv_text(columns, 2000, seed=seed + i, start=i * 2000, with_header=False) for i in range(8)]
+    with path.open('w') as f:
+        written = f.write(csv_text(columns, 0))
+        i = 0
+        while written < size_bytes:
+            written += f.write(blocks[i % len(blocks)])
+            i += 1
+
+
+def build_many_files(raw: Path, params: Dict):
+    half = params['files'] // 2
+    for i in range(half):
+        write_csv(raw / 'events' / 'by_day' / f"part-{i:05d}.csv", 12, params['rows'], seed=i)
+    for i in range(params['files'] - half):
+        write_csv(raw / f"lookup{i % 10}" / f"table_{i:05d}.csv", 6, params['rows'] // 4 or 1, seed=i)
+
+
+def build_large_file(raw: Path, params: Dict):
+    write_large_csv(raw / 'bookings' / 'bookings.csv', 20, params['large_file_mb'] * 1024 * 1024)
+
+
+def build_wide(raw: Path, params: Dict):
+    for i in range(4):
+        write_csv(raw / 'wide' / f"wide_{i}.csv", params['wide_columns'], params['rows'], seed=i)
+    for i in range(8):
+        write_csv(raw / 'wide' / 'by_region' / f"region_{i}.csv", params['wide_columns'], params['rows'], seed=i)
+
+
+def build_mixed_sep(raw: Path, params: Dict):
+    separators = {'comma': ',', 'semicolon': ';', 'tab': '\t', 'pipe': '|', 'comma_space': ', '}
+    for i, (name, separator) in enumerate(separators.items()):
+        write_csv(raw / 'mixed' / f"{name}.csv", 16, params['rows'], separator, seed=i)
+        # One table whose files disagree on the separator: drift, one layout each
+        for j in range(4):
+            write_csv(raw / 'mixed' / 'by_source' / f"{name}_{j}.csv", 16, params['rows'], separator, seed=j)
+
+
+def build_nested(raw: Path, params: Dict):
+    cities = [f"city_{i:03d}" for i in range(max(params['files'] // 20, 10))]
+    for i, city in enumerate(cities):
+        write_csv(raw / 'reviews' / 'by_city' / f"{city}.csv", 10, params['rows'], seed=i)
+    write_csv(raw / 'reviews' / 'detailed.csv', 17, params['rows'] * 10)
+    for i, region in enumerate(['emea', 'apac', 'amer']):
+        for year in range(2019, 2025):
+            write_csv(raw / 'reservations' / 'external' / region / str(year) / f"bookings_{year}.csv",
+                      14, params['rows'], seed=i * 100 + year)
+
+
+BUILDERS = {
+    'many_files': build_many_files,
+    'large_file': build_large_file,
+    'wide': build_wide,
+    'mixed_sep': build_mixed_sep,
+    'nested': build_nested,
+}
+
+
+def build_tree(work_dir: Path, scenario: str, params: Dict) -> Path:
+    """Root of the scenario's tree (raw data under RAW_DIR), built unless cached."""
+    key = hashlib.sha1(json.dumps({'scenario': scenario, **params}, sort_keys=True).encode()).hexdigest()[:12]
+    root = work_dir / f"{scenario}-{key}"
+    marker = root / TREE_MARKER
+    if marker.exists():
+        return root
+    raw = root / gts.RAW_DIR
+    print(f"  🏗️  Building {scenario} tree in {root} ...")
+    started = time.monotonic()
+    BUILDERS[scenario](raw, params)
+    files = [p for p in raw.rglob('*.csv')]
+    tree = {'scenario': scenario, 'params': params, 'files': len(files),
+            'bytes': sum(p.stat().st_size for p in files)}
+    marker.write_text(json.dumps(tree, indent=2) + '\n')
+    print(f"     {tree['files']} files, {tree['bytes'] / 1024 / 1024:.1f} MiB ({time.monotonic() - started:.1f}s)")
+    return root
+
+
+def bytes_read() -> Optional[int]:
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def run_function(root: str, function: str) -> Dict:
+    """Runs in a fresh process: measure one function on the tree at root."""
+    os.chdir(root)
+    files = sorted(p for tables in gts.collect_csv_files(gts.RAW_DIR).values() for p in tables)
+    separators = {p: gts.detect_separator(p) for p in files} if function == 'get_csv_columns' else {}
+    calls = {
+        'collect_csv_files': lambda: gts.collect_csv_files(gts.RAW_DIR),
+        'detect_separator': lambda: [gts.detect_separator(p) for p in files],
+        'get_csv_columns': lambda: [gts.get_csv_columns(p, *separators[p]) for p in files],
+        'generate_sql': lambda: gts.generate_sql(jobs=1, incremental=False),
+        'generate_sql_incremental': lambda: gts.generate_sql(jobs=1, incremental=True),
+    }
+    rss_before = max_rss_mb()
+    read_before = bytes_read()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        calls[function]()
+        seconds = time.perf_counter() - started
+    read_after = bytes_read()
+    return {
+        'seconds': seconds,
+        'peak_rss_mb': round(max_rss_mb(), 1),
+        'rss_growth_mb': round(max_rss_mb() - rss_before, 1),
+        'bytes_read': read_after - read_before if read_before is not None else None,
+        'files': len(files),
+    }
+
+
+def measure(root: Path, function: str, repeat: int) -> Dict:
+    """Median wall time and largest RSS / bytes read over `repeat` fresh processes."""
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(run_function, str(root), function).result())
+    reads = [r['bytes_read'] for r in runs if r['bytes_read'] is not None]
+    return {
+        'seconds': round(statistics.median(r['seconds'] for r in runs), 4),
+        'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+        'rss_growth_mb': max(r['rss_growth_mb'] for r in runs),
+        'bytes_read': max(reads) if reads else None,
+        'files': runs[0]['files'],
+    }
+
+
+def benchmark(scenarios: List[str], functions: List[str], params: Dict, work_dir: Path,
+              repeat: int = 1) -> Dict:
+    results = {'version': BENCH_VERSION, 'params': params, 'repeat': repeat, 'results': {}}
+    for scenario in scenarios:
+        root = build_tree(work_dir, scenario, params)
+        tree = json.loads((root / TREE_MARKER).read_text())
+        print(f"⏱️  {scenario}: {tree['files']} files, {tree['bytes'] / 1024 / 1024:.1f} MiB")
+        # The incremental run reads the manifest the full run leaves behind
+        ordered = [f for f in FUNCTIONS if f in functions]
+        if 'generate_sql_incremental' in ordered and 'generate_sql' not in ordered:
+            measure(root, 'generate_sql', 1)
+        for function in ordered:
+            result = {**measure(root, function, repeat), 'tree_bytes': tree['bytes']}
+            results['results'][f"{scenario}/{function}"] = result
+            read = f"{result['bytes_read'] / 1024 / 1024:.1f} MiB read" if result['bytes_read'] is not None else ""
+            print(f"     {function:<26} {result['seconds']:>9.3f}s  {result['peak_rss_mb']:>7.1f} MiB peak RSS  {read}")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Metrics above tolerance times their baseline value (and above the noise floor)."""
+    floors = {'seconds': MIN_SECONDS_DELTA, 'peak_rss_mb': MIN_RSS_DELTA_MB, 'bytes_read': MIN_BYTES_DELTA}
+    regressions = []
+    for key, result in results['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if base is None:
+            continue
+        for metric, floor in floors.items():
+            new, old = result.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * tolerance and new - old > floor:
+                regressions.append(f"{key} {metric}: {old} -> {new} ({new / old if old else float('inf'):.2f}x)")
+    return regressions
+
+
+def save_baseline(results: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    tmp_path.replace(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generate_trino_schemas.py on synthetic raw trees")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS,
+                        help="trees to benchmark")
+    parser.add_argument('--functions', nargs='+', choices=FUNCTIONS, default=FUNCTIONS,
+                        help="functions to measure on each tree")
+    parser.add_argument('--quick', action='store_true',
+                        help=f"small trees for a smoke run ({QUICK_PARAMS['files']} files, "
+                             f"{QUICK_PARAMS['large_file_mb']} MiB large file)")
+    parser.add_argument('--files', type=int, default=None,
+                        help=f"files in the many_files tree (default {DEFAULT_PARAMS['files']})")
+    parser.add_argument('--large-file-mb', type=int, default=None,
+                        help=f"size of the large_file CSV (default {DEFAULT_PARAMS['large_file_mb']})")
+    parser.add_argument('--wide-columns', type=int, default=None,
+                        help=f"columns of the wide tree (default {DEFAULT_PARAMS['wide_columns']})")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="fresh-process runs per function (median wall time)")
+    parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                        help="where the synthetic trees are built and cached")
+    parser.add_argument('--baseline', type=Path, default=BENCH_BASELINE,
+                        help="JSON results to compare against")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="write the results to --baseline instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="ratio to the baseline above which a metric is a regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    params = dict(QUICK_PARAMS if args.quick else DEFAULT_PARAMS)
+    for name in ('files', 'large_file_mb', 'wide_columns'):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    results = benchmark(args.scenarios, args.functions, params, args.work_dir.resolve(), args.repeat)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"🧾 Baseline: {args.baseline}")
+        sys.exit(0)
+    if not args.baseline.exists():
+        print(f"ℹ️  No baseline at {args.baseline} - run with --save-baseline to record one")
+        sys.exit(0)
+    with args.baseline.open() as f:
+        baseline = json.load(f)
+    if baseline.get('params') != params:
+        print(f"⚠️  Baseline was recorded with {baseline.get('params')}, not {params}; sizes differ")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"  ❌ {regression}")
+    print(f"{'❌' if regressions else '✅'} {len(regressions)} regressions against {args.baseline} "
+          f"(tolerance {args.tolerance:g}x)")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,277 @@
+"""
+Materialize small rollup tables behind the raw-data dashboard charts.
+Each rollup holds the chart group-bys of one raw table with additive measures
+(row count, sums and counts for averages) per source file, in a Delta schema.
+Refreshes are incremental: only files whose manifest fingerprint changed since
+the last run are deleted from the rollup and aggregated again.
+
+Run generate_trino_schemas.py and create the raw schemas first: tables, files,
+header layouts and the S3 object names are read from its manifest.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+from generate_trino_schemas import (
+    RAW_DIR,
+    MANIFEST_PATH,
+    RAW_COMPRESSION_SUFFIXES,
+    load_env,
+    get_s3_path,
+)
+from compact_raw_tables import source_value
+from run_trino_sql import DEFAULT_TRINO_URL, DEFAULT_TRINO_USER, run_sql_files
+
+ROLLUP_SQL_OUTPUT = Path("sql/trino_rollups.sql")
+ROLLUP_STATE_PATH = Path("sql/raw_rollup_state.json")
+ROLLUP_STATE_VERSION = 1
+ROLLUP_SCHEMA = 'rollup_raw'
+
+# Rollup per raw table: the columns the raw-data charts in superset/provisioning.yaml
+# group by, and the columns they average. Override with --rollup-spec (same shape).
+ROLLUP_SPECS = {
+    'hotels_makemytrip_summary': {
+        'source': 'raw_hotels.hotels',
+        'groupby': ['city_name', 'county_name', 'hotel_rating'],
+        'averages': [],
+    },
+    'reviews_by_city_summary': {
+        'source': 'raw_reviews.reviews_by_city',
+        'groupby': ['city', 'service', 'cleanliness'],
+        'averages': ['overall_rating'],
+    },
+    'reviews_detailed_summary': {
+        'source': 'raw_reviews.reviews_detailed',
+        'groupby': ['hotel_name', 'reviewer_nationality'],
+        'averages': [],
+    },
+    'reservations_detailed_summary': {
+        'source': 'raw_reservations.reservations_detailed',
+        'groupby': ['country', 'market_segment', 'is_canceled'],
+        'averages': [],
+    },
+}
+
+
+def load_rollup_specs(spec_path: Optional[Path] = None) -> Dict[str, Dict]:
+    if spec_path is None:
+        return dict(ROLLUP_SPECS)
+    with spec_path.open() as f:
+        return json.load(f)
+
+
+def sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def rollup_columns(spec: Dict) -> List[str]:
+    """Column definitions of a rollup table."""
+    columns = [f"{c} VARCHAR" for c in spec['groupby']]
+    for c in spec['averages']:
+        columns.extend([f"{c}_sum DOUBLE", f"{c}_count BIGINT"])
+    columns.extend(["row_count BIGINT", "source_file VARCHAR"])
+    return columns
+
+
+def rollup_definition(spec: Dict) -> str:
+    """Digest of what a rollup's rows depend on besides the data; a change rebuilds it."""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def source_objects(entry: Dict, s3_bucket: str, suffix: str) -> List[Dict]:
+    """Per header layout: the table to read and the S3 object paths of its files.
+    A compacted table has a single layout whose files are told apart by the value
+    of its source column instead of "$path".
+    """
+    layouts = entry.get('layouts') or [{'files': entry['files'], 'columns': entry['columns']}]
+    table = entry['table']
+    compaction = entry.get('compaction')
+    if compaction:
+        return [{
+            'table': table,
+            'columns': compaction['columns'],
+            'source_column': compaction['source_column'],
+            'objects': {source_value(p): str(p) for layout in layouts for p in layout['files']},
+        }]
+    result = []
+    for i, layout in enumerate(layouts):
+        files = [Path(p) for p in layout['files']]
+        result.append({
+            'table': table if len(layouts) <= 1 else f"{table}__layout{i}",
+            'columns': layout['columns'],
+            'objects': {
+                f"{get_s3_path(p, RAW_DIR, s3_bucket)}{p.name}{suffix}": str(p) for p in files
+            },
+        })
+    return result
+
+
+def insert_sql(name: str, spec: Dict, schema: str, layout: Dict, objects: List[str]) -> str:
+    """Aggregate the given objects of one layout table into the rollup."""
+    groups = [c if c in layout['columns'] else f"CAST(NULL AS VARCHAR) AS {c}" for c in spec['groupby']]
+    measures = []
+    for c in spec['averages']:
+        value = f"TRY_CAST({c} AS DOUBLE)" if c in layout['columns'] else "CAST(NULL AS DOUBLE)"
+        measures.extend([f"SUM({value})", f"COUNT({value})"])
+    source = layout.get('source_column', '"$path"')
+    select = ",\n    ".join(groups + measures + ["COUNT(*)", source])
+    group_by = ", ".join(str(i) for i in range(1, len(groups) + 1)) + f", {len(groups) + len(measures) + 2}"
+    paths = ", ".join(sql_string(o) for o in objects)
+    return f"""INSERT INTO {name}
+SELECT
+    {select}
+FROM hive.{schema}.{layout['table']}
+WHERE {source} IN ({paths})
+GROUP BY {group_by};"""
+
+
+def refresh_sql(name: str, spec: Dict, entry: Dict, previous: Optional[Dict], fingerprints: Dict[str, Dict],
+                s3_bucket: str, suffix: str) -> Tuple[List[str], Dict, bool]:
+    """SQL lines refreshing one rollup, and its new state. Only objects whose file
+    fingerprint changed (or that were added or removed) are re-aggregated.
+    """
+    schema = spec['source'].split('.', 1)[0]
+    layouts = source_objects(entry, s3_bucket, suffix)
+    current = {obj: fingerprints.get(path) for layout in layouts for obj, path in layout['objects'].items()}
+    definition = rollup_definition(spec)
+    rebuild = previous is None or previous.get('definition') != definition
+    known = {} if rebuild else previous['files']
+    changed = sorted(obj for obj, fp in current.items() if fp is None or known.get(obj) != fp)
+    removed = sorted(set(known) - set(current))
+
+    lines = [f"-- Rollup: {name} <- {spec['source']} ({len(changed)} changed, {len(removed)} removed files)"]
+    if rebuild:
+        lines.append(f"DROP TABLE IF EXISTS {name};")
+    # Managed table under the schema location, so DROP also removes its files
+    lines.append(f"CREATE TABLE IF NOT EXISTS {name} (\n    " + ",\n    ".join(rollup_columns(spec)) + "\n);")
+    stale = [obj for obj in changed if obj in known] + removed
+    if stale:
+        lines.append(f"DELETE FROM {name} WHERE source_file IN ({', '.join(sql_string(o) for o in stale)});")
+    for layout in layouts:
+        objects = [obj for obj in changed if obj in layout['objects']]
+        if objects:
+            lines.append(insert_sql(name, spec, schema, layout, objects))
+    lines.append("")
+    # Files without a fingerprint are re-aggregated on every run
+    new_state = {'definition': definition, 'files': {o: fp for o, fp in current.items() if fp is not None}}
+    return lines, new_state, bool(changed or removed or rebuild)
+
+
+def load_state(path: Path = ROLLUP_STATE_PATH) -> Dict:
+    empty = {'version': ROLLUP_STATE_VERSION, 'rollups': {}}
+    if not path.exists():
+        return empty
+    try:
+        with path.open() as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Ignoring unreadable rollup state {path}: {e}")
+        return empty
+    return state if state.get('version') == ROLLUP_STATE_VERSION else empty
+
+
+def save_state(state: Dict, path: Path = ROLLUP_STATE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.write('\n')
+    tmp_path.replace(path)
+
+
+def build_rollups(specs: Dict[str, Dict], full: bool = False, dry_run: bool = False,
+                  url: Optional[str] = None, user: Optional[str] = None, jobs: int = 1) -> bool:
+    """Write the refresh SQL for every rollup, run it and record the new state."""
+    load_env()
+    if not MANIFEST_PATH.exists():
+        print(f"❌ No schema manifest at {MANIFEST_PATH} - run generate_trino_schemas.py first")
+        return False
+    with MANIFEST_PATH.open() as f:
+        manifest = json.load(f)
+    options = manifest.get('options', {})
+    s3_bucket = options.get('s3_bucket', os.environ.get('S3_RAW_BUCKET', 'raw'))
+    suffix = RAW_COMPRESSION_SUFFIXES.get(options.get('compression', 'none'), '')
+    prod_bucket = os.environ.get('S3_PROD_BUCKET', 'prod')
+
+    previous = {} if full else load_state()['rollups']
+    state = {'version': ROLLUP_STATE_VERSION, 'rollups': {}}
+    lines = [
+        "-- " + "=" * 60,
+        "-- RAW DATA ROLLUPS (generated by build_raw_rollups.py)",
+        "-- " + "=" * 60,
+        "",
+        f"CREATE SCHEMA IF NOT EXISTS delta.{ROLLUP_SCHEMA} WITH (location = 's3://{prod_bucket}/{ROLLUP_SCHEMA}/');",
+        f"USE delta.{ROLLUP_SCHEMA};",
+        "",
+    ]
+    pending = 0
+    # A rollup whose source does not match the manifest would leave its charts without a table
+    invalid = []
+    for name, spec in sorted(specs.items()):
+        entry = manifest.get('tables', {}).get(spec['source'])
+        if entry is None:
+            print(f"  ❌ {name}: source {spec['source']} is not in the manifest")
+            invalid.append(name)
+            continue
+        missing = [c for c in spec['groupby'] + spec['averages']
+                   if not any(c in layout['columns'] for layout in entry.get('layouts') or [entry])]
+        if missing:
+            print(f"  ❌ {name}: {spec['source']} has no column {', '.join(missing)}")
+            invalid.append(name)
+            continue
+        entry = {**entry, 'table': spec['source'].split('.', 1)[1]}
+        rollup_lines, state['rollups'][name], changed = refresh_sql(
+            name, spec, entry, previous.get(name), manifest.get('files', {}), s3_bucket, suffix,
+        )
+        if changed:
+            lines.extend(rollup_lines)
+            pending += 1
+        else:
+            print(f"  {name}: unchanged")
+
+    ROLLUP_SQL_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with ROLLUP_SQL_OUTPUT.open('w') as f:
+        f.write('\n'.join(lines))
+    print(f"✅ Generated rollup SQL: {ROLLUP_SQL_OUTPUT} ({pending} of {len(specs)} rollups to refresh)")
+    if invalid:
+        print(f"❌ {len(invalid)} rollups do not match the manifest: {', '.join(invalid)}")
+    if dry_run or not pending:
+        return not invalid
+
+    ok = run_sql_files(
+        [ROLLUP_SQL_OUTPUT],
+        url=url or os.environ.get('TRINO_URL', DEFAULT_TRINO_URL),
+        user=user or os.environ.get('TRINO_USER', DEFAULT_TRINO_USER),
+        jobs=jobs,
+    )
+    # A failed run leaves the state alone: the same files are deleted and re-aggregated next time
+    if ok:
+        save_state(state)
+    return ok and not invalid
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build and incrementally refresh raw-data rollup tables")
+    parser.add_argument('--full', action='store_true',
+                        help="ignore the rollup state and rebuild every rollup")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only write the refresh SQL")
+    parser.add_argument('--rollup-spec', type=Path, default=None,
+                        help="JSON file replacing ROLLUP_SPECS")
+    parser.add_argument('--url', default=None,
+                        help=f"coordinator URL (default: TRINO_URL or {DEFAULT_TRINO_URL})")
+    parser.add_argument('--user', default=None,
+                        help=f"Trino user (default: TRINO_USER or {DEFAULT_TRINO_USER})")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ok = build_rollups(load_rollup_specs(args.rollup_spec), full=args.full, dry_run=args.dry_run,
+                       url=args.url, user=args.user)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,397 @@
+"""
+Compact multi-file raw tables into a few target-sized objects.
+
+Tables such as raw_reviews.reviews_by_city point at a prefix of many small
+per-city CSVs, and every file costs Trino a split, an S3 open and a header skip.
+This streams all files of such a table, in path order, into part files of about
+--target-bytes under raw/_compacted/<prefix>/ (CSV with a single header, or
+Parquet with --format parquet). Columns are the union of the table's header
+layouts plus a source column holding the file each row came from (the city for
+reviews_by_city), so nothing is lost. The original files stay where they are.
+
+A _compaction.json marker next to the parts records the fingerprints of the
+source files, as the manifest keeps them: size, mtime and header hash, or the
+S3 size and ETag when the manifest was generated with --s3. While they match,
+generate_trino_schemas.py defines the table over the compacted prefix; this
+script reruns it so the generated and delta DDL follow.
+
+Run generate_trino_schemas.py first: files, separators and header layouts are
+read from its manifest. --format parquet requires pyarrow.
+"""
+
+import os
+import abc
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional
+
+from generate_trino_schemas import (
+    RAW_DIR,
+    MANIFEST_PATH,
+    COMPACTION_MARKER,
+    compaction_marker_key,
+    file_fingerprint,
+    generate_sql,
+    load_env,
+    scan_from_manifest,
+    stale_compaction,
+    union_columns,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for --format parquet
+    pa = None
+
+DEFAULT_TARGET_BYTES = 128 * 1024 * 1024
+DEFAULT_MIN_FILES = 2
+
+# Name of the column recording each row's source file; reviews_by_city has one file per city
+SOURCE_COLUMNS = {'raw_reviews.reviews_by_city': 'source_city'}
+DEFAULT_SOURCE_COLUMN = 'source_file'
+
+# Part sizes are checked every this many rows; Parquet parts are written in batches of this many rows
+SIZE_CHECK_ROWS = 1000
+PARQUET_BATCH_ROWS = 64 * 1024
+PARQUET_COMPRESSION = 'zstd'
+
+
+def source_value(csv_file: Path) -> str:
+    """Value of the source column for rows of a file: its name without .csv ("beijing")."""
+    return Path(csv_file).stem
+
+
+def read_rows(csv_file: Path, layout: Dict, columns: List[str], strip_spaces: bool) -> Iterator[List[str]]:
+    """Data rows of one file, reordered to the compacted columns ('' where the layout has none)."""
+    delim = '\t' if layout['separator'] == '\t' else layout['separator'][0]
+    index = [layout['columns'].index(c) if c in layout['columns'] else None for c in columns]
+    with csv_file.open('r', encoding='utf-8', errors='ignore', newline='') as f:
+        reader = csv.reader(f, delimiter=delim)
+        next(reader, None)  # header
+        for row in reader:
+            if not row:
+                continue
+            if strip_spaces:
+                row = [v.strip() for v in row]
+            yield [row[i] if i is not None and i < len(row) else '' for i in index]
+
+
+class PartWriter(abc.ABC):
+    """Writes rows into part-NNNNN files of about target_bytes each.
+    Parts are written under dot-prefixed temporary names, which Hive ignores,
+    and renamed on close(). A part is opened by the first row written to it,
+    so a full last part is not followed by an empty one.
+    """
+
+    suffix = ''
+
+    def __init__(self, out_dir: Path, columns: List[str], target_bytes: int):
+        self.out_dir = out_dir
+        self.columns = columns
+        self.target_bytes = target_bytes
+        self.parts: List[Path] = []
+        self.tmp_paths: List[Path] = []
+        self.rows = 0
+        self.part_rows = 0
+        self.part_open = False
+
+    def write(self, row: List[str]):
+        if not self.part_open:
+            self._open_part()
+        self._write(row)
+        self.rows += 1
+        self.part_rows += 1
+        if self.part_rows % SIZE_CHECK_ROWS == 0 and self._size() >= self.target_bytes:
+            self._end_part()
+
+    def close(self) -> List[str]:
+        if self.part_open:
+            self._end_part()
+        for tmp_path, part in zip(self.tmp_paths, self.parts):
+            tmp_path.replace(part)
+        return [p.name for p in self.parts]
+
+    def abort(self):
+        try:
+            if self.part_open:
+                self._end_part()
+        except Exception:
+            pass
+        for tmp_path in self.tmp_paths:
+            tmp_path.unlink(missing_ok=True)
+
+    def _open_part(self):
+        name = f"part-{len(self.parts):05d}{self.suffix}"
+        self.parts.append(self.out_dir / name)
+        self.tmp_paths.append(self.out_dir / f".{name}.tmp")
+        self.part_rows = 0
+        self._open(self.tmp_paths[-1])
+        self.part_open = True
+
+    def _end_part(self):
+        self.part_open = False
+        self._close_part()
+
+    @abc.abstractmethod
+    def _open(self, path: Path):
+        """Start a part file at path."""
+
+    @abc.abstractmethod
+    def _write(self, row: List[str]):
+        """Add one row to the open part."""
+
+    @abc.abstractmethod
+    def _size(self) -> int:
+        """Approximate bytes of the open part so far."""
+
+    @abc.abstractmethod
+    def _close_part(self):
+        """Finish the open part."""
+
+
+class CsvPartWriter(PartWriter):
+    """Comma-separated parts, each with the header line (Trino skips one per file)."""
+
+    suffix = '.csv'
+
+    def _open(self, path: Path):
+        self.file = path.open('w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    def _write(self, row: List[str]):
+        self.writer.writerow(row)
+
+    def _size(self) -> int:
+        return self.file.tell()
+
+    def _close_part(self):
+        self.file.close()
+
+
+class ParquetPartWriter(PartWriter):
+    """String-typed Parquet parts; empty fields become NULL."""
+
+    suffix = '.parquet'
+
+    def _open(self, path: Path):
+        self.schema = pa.schema([(c, pa.string()) for c in self.columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression=PARQUET_COMPRESSION)
+        self.path = path
+        self.batch: List[List[str]] = []
+
+    def _write(self, row: List[str]):
+        self.batch.append(row)
+        if len(self.batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _size(self) -> int:
+        # Pending rows are estimated from their raw length
+        pending = sum(len(v) for row in self.batch for v in row)
+        return self.path.stat().st_size + pending
+
+    def _flush(self):
+        if self.batch:
+            columns = list(zip(*self.batch))
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array([v or None for v in values], pa.string()) for values in columns],
+                schema=self.schema,
+            ))
+            self.batch = []
+
+    def _close_part(self):
+        self._flush()
+        self.writer.close()
+
+
+def compacted_dir(csv_file: Path) -> Path:
+    return RAW_DIR / compaction_marker_key(csv_file)[:-len(COMPACTION_MARKER)]
+
+
+def up_to_date(marker_path: Path, fingerprints: Dict[str, Dict], settings: Dict) -> bool:
+    """The marker was written from files with these fingerprints, with the same settings
+    (the check generate_trino_schemas.py makes before using the copy).
+    """
+    if not marker_path.exists():
+        return False
+    try:
+        with marker_path.open() as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if any(marker.get(k) != v for k, v in settings.items()):
+        return False
+    return stale_compaction(marker, fingerprints) is None
+
+
+def compact_table(table_key: str, entry: Dict, fmt: str = 'csv', target_bytes: int = DEFAULT_TARGET_BYTES,
+                  force: bool = False, s3_fingerprints: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+    """Compact one manifest table; returns its stats, or None if the copy is current.
+    s3_fingerprints (the manifest's, from a --s3 run) are recorded instead of the local files'.
+    """
+    scan = scan_from_manifest(entry)
+    layouts = scan['layouts'] or [{'files': [scan['file']], 'separator': scan['separator'],
+                                   'columns': scan['columns']}]
+    files = sorted(f for layout in layouts for f in layout['files'])
+    layout_of = {f: layout for layout in layouts for f in layout['files']}
+    columns = union_columns(layouts)
+    source_column = SOURCE_COLUMNS.get(table_key, DEFAULT_SOURCE_COLUMN)
+    if source_column in columns:
+        raise ValueError(f"{table_key} already has a column named {source_column}")
+    columns.append(source_column)
+
+    out_dir = compacted_dir(files[0])
+    marker_path = out_dir / COMPACTION_MARKER
+    settings = {'format': fmt, 'target_bytes': target_bytes, 'source_column': source_column, 'columns': columns}
+    fingerprints = {
+        str(f): s3_fingerprints.get(str(f)) if s3_fingerprints is not None else file_fingerprint(f)
+        for f in files
+    }
+    if not force and up_to_date(marker_path, fingerprints, settings):
+        return None
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writer_class = ParquetPartWriter if fmt == 'parquet' else CsvPartWriter
+    writer = writer_class(out_dir, columns, target_bytes)
+    try:
+        for csv_file in files:
+            value = source_value(csv_file)
+            for row in read_rows(csv_file, layout_of[csv_file], columns[:-1], scan['strip_spaces']):
+                writer.write(row + [value])
+        parts = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    # Parts of an earlier run (other format or more parts) would be read as extra rows
+    for stale in out_dir.iterdir():
+        if stale.is_file() and stale.name not in parts and stale.name != COMPACTION_MARKER \
+                and not stale.name.startswith('.'):
+            stale.unlink()
+
+    marker = {
+        'table': table_key,
+        **settings,
+        'separator': ',',
+        'parts': parts,
+        'rows': writer.rows,
+        'sources': fingerprints,
+    }
+    tmp_path = marker_path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(marker, f, indent=2, sort_keys=True)
+        f.write('\n')
+    tmp_path.replace(marker_path)
+    return {
+        'files': len(files),
+        'source_bytes': sum(f.stat().st_size for f in files),
+        'parts': len(parts),
+        'part_bytes': sum((out_dir / p).stat().st_size for p in parts),
+        'rows': writer.rows,
+    }
+
+
+def regenerate_schemas(options: Dict, profile: bool = False):
+    """Rerun the schema generator with the manifest's options, so the DDL follows the copies.
+    profile re-profiles the compacted tables, which are rescanned; other tables keep theirs.
+    """
+    if options.get('source') == 's3':
+        print("  Manifest was generated with --s3: upload the compacted files, then run "
+              "generate_trino_schemas.py --s3 to update the DDL")
+        return
+    generate_sql(
+        head_rows=options['head_rows'],
+        sample_rows=options['sample_rows'],
+        max_scan_rows=options['max_scan_rows'],
+        infer_types=options['infer_types'],
+        jobs=int(os.environ.get('SCHEMA_SCAN_JOBS', '1')),
+        on_drift=options['on_drift'],
+        profile=profile,
+        compression=options['compression'],
+    )
+
+
+def compact_all(tables: Optional[List[str]] = None, fmt: str = 'csv', target_bytes: int = DEFAULT_TARGET_BYTES,
+                min_files: int = DEFAULT_MIN_FILES, force: bool = False, regenerate: bool = True) -> bool:
+    load_env()
+    if fmt == 'parquet' and pa is None:
+        print("❌ --format parquet requires pyarrow: pip install pyarrow")
+        return False
+    if not MANIFEST_PATH.exists():
+        print(f"❌ Manifest not found: {MANIFEST_PATH} (run generate_trino_schemas.py first)")
+        return False
+    with MANIFEST_PATH.open() as f:
+        manifest = json.load(f)
+
+    if tables:
+        unknown = [t for t in tables if t not in manifest['tables']]
+        if unknown:
+            print(f"❌ Not in the manifest: {', '.join(unknown)}")
+            return False
+        selected = tables
+    else:
+        selected = [k for k, v in sorted(manifest['tables'].items()) if len(v['files']) >= min_files]
+
+    # A --s3 manifest holds the S3 size and ETag of each file, which the generator compares then
+    s3_fingerprints = manifest['files'] if manifest['options'].get('source') == 's3' else None
+    print(f"🗜️  Compacting {len(selected)} table(s) into ~{target_bytes / 1024 / 1024:g} MiB {fmt} parts...")
+    ok = True
+    compacted = 0
+    profiled = False
+    for table_key in selected:
+        started = time.monotonic()
+        try:
+            stats = compact_table(table_key, manifest['tables'][table_key], fmt, target_bytes, force,
+                                  s3_fingerprints)
+        except Exception as e:
+            print(f"  ❌ {table_key}: {e}")
+            ok = False
+            continue
+        if stats is None:
+            print(f"  {table_key}: up to date")
+            continue
+        compacted += 1
+        profiled = profiled or bool(manifest['tables'][table_key].get('profile'))
+        print(f"  ✓ {table_key}: {stats['files']} files ({stats['source_bytes'] / 1024 / 1024:.1f} MiB) -> "
+              f"{stats['parts']} part(s) ({stats['part_bytes'] / 1024 / 1024:.1f} MiB), "
+              f"{stats['rows']} rows ({time.monotonic() - started:.1f}s)")
+
+    if compacted and regenerate:
+        print("")
+        regenerate_schemas(manifest['options'], profile=profiled)
+    print(f"\n✅ Compacted {compacted} table(s) under {RAW_DIR}/; upload them with make upload-raw-to-s3")
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compact multi-file raw tables into target-sized objects")
+    parser.add_argument('--tables', nargs='+', default=None,
+                        help="schema.table keys to compact (default: every table with --min-files files)")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv',
+                        help="part format: CSV with one header, or Parquet (requires pyarrow)")
+    parser.add_argument('--target-bytes', type=int, default=DEFAULT_TARGET_BYTES,
+                        help="approximate size of each part file")
+    parser.add_argument('--min-files', type=int, default=DEFAULT_MIN_FILES,
+                        help="only compact tables with at least this many files")
+    parser.add_argument('--force', action='store_true',
+                        help="rewrite copies that are already current")
+    parser.add_argument('--no-generate', action='store_true',
+                        help="do not rerun generate_trino_schemas.py afterwards")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(0 if compact_all(
+        tables=args.tables,
+        fmt=args.format,
+        target_bytes=args.target_bytes,
+        min_files=args.min_files,
+        force=args.force,
+        regenerate=not args.no_generate,
+    ) else 1)
@@ -0,0 +1,603 @@
+"""
+Convert raw CSV files to Parquet using the schemas inferred by generate_trino_schemas.py.
+Each CSV is streamed in bounded blocks and written as fixed-size Parquet row groups,
+so memory stays constant regardless of file size. Tables with a partition spec are
+rewritten into Hive-style key=value/ prefixes in the same pass. Also generates
+matching format = 'PARQUET' tables pointing at a parallel S3 prefix.
+
+Requires pyarrow (pip install pyarrow). Run generate_trino_schemas.py first:
+separators, header layouts and column types are read from its manifest.
+"""
+
+import os
+import sys
+import json
+import re
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+from urllib.parse import quote
+
+from generate_trino_schemas import (
+    RAW_DIR,
+    MANIFEST_PATH,
+    NULL_TOKENS,
+    DATE_FORMATS,
+    FLOAT_RE,
+    INT64_MAX,
+    INT_RE,
+    TIMESTAMP_RE,
+    InferredColumn,
+    load_env,
+    load_partition_specs,
+    scan_from_manifest,
+    union_columns,
+    union_typed_columns,
+    sql_file_header,
+    schema_header_sql,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # checked before running so the module stays importable
+    pa = None
+
+# Parquet copies live under this prefix of the raw bucket, mirroring the CSV layout
+PARQUET_PREFIX = os.environ.get('S3_RAW_PARQUET_PREFIX', '_parquet')
+PARQUET_SQL_OUTPUT = Path("sql/trino_schemas_parquet.sql")
+PARQUET_TABLE_SUFFIX = "_parquet"
+
+DEFAULT_BLOCK_BYTES = 16 * 1024 * 1024
+DEFAULT_ROW_GROUP_ROWS = 128 * 1024
+PARQUET_COMPRESSION = 'zstd'
+
+# Partitioned writes: total rows buffered across partitions and open files per source
+DEFAULT_MAX_BUFFERED_ROWS = 4 * DEFAULT_ROW_GROUP_ROWS
+DEFAULT_MAX_OPEN_WRITERS = 64
+
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+# Characters Hive escapes as %XX in partition directory names
+HIVE_PATH_SAFE = "".join(
+    c for c in map(chr, range(0x20, 0x7f)) if c not in '"#%\'*/:=?\\{[]^'
+)
+
+TRUE_TOKENS = ['true', 't', 'yes']
+FALSE_TOKENS = ['false', 'f', 'no']
+DECIMAL_TYPE_RE = re.compile(r'^DECIMAL\((\d+),(\d+)\)$')
+# The DATE_FORMATS entry without a format: ISO dates, which Trino casts to TIMESTAMP
+ISO_DATE_RE = next(regex for regex, fmt in DATE_FORMATS if fmt is None)
+
+
+def arrow_type(trino_type: str):
+    """Arrow type for an inferred Trino type."""
+    m = DECIMAL_TYPE_RE.match(trino_type)
+    if m:
+        return pa.decimal128(int(m.group(1)), int(m.group(2)))
+    return {
+        'BIGINT': pa.int64(),
+        'DOUBLE': pa.float64(),
+        'BOOLEAN': pa.bool_(),
+        'DATE': pa.date32(),
+        # TIMESTAMP_RE allows up to 6 fractional digits, which microseconds hold exactly
+        'TIMESTAMP': pa.timestamp('us'),
+    }.get(trino_type, pa.string())
+
+
+def null_where(mask, values):
+    """values with entries where mask is false replaced by NULL."""
+    return pc.if_else(mask, values, pa.scalar(None, values.type))
+
+
+def int64_in_range(values):
+    """Mask of integer strings within the int64 range, compared as digit strings
+    (sign and leading zeros removed) against the range bounds.
+    """
+    digits = pc.replace_substring_regex(values, r'^[+-]?0*', '')
+    length = pc.utf8_length(digits)
+    limit = pc.if_else(pc.starts_with(values, '-'), str(INT64_MAX + 1), str(INT64_MAX))
+    in_range = pc.or_(
+        pc.less(length, len(str(INT64_MAX))),
+        pc.and_(pc.equal(length, len(str(INT64_MAX))), pc.less_equal(digits, limit)),
+    )
+    return pc.and_(pc.match_substring_regex(values, INT_RE.pattern), in_range)
+
+
+def convert_column(values, column: InferredColumn, strip_spaces: bool = False):
+    """Cast a string column to its inferred type, NULL for values that do not fit.
+    Mirrors the TRY_CAST semantics of the typed views, but vectorized per batch.
+    """
+    if column.type == 'VARCHAR':
+        return pc.utf8_trim_whitespace(values) if strip_spaces else values
+
+    values = pc.utf8_trim_whitespace(values)
+    lowered = pc.utf8_lower(values)
+    values = null_where(pc.invert(pc.is_in(lowered, value_set=pa.array(sorted(NULL_TOKENS)))), values)
+    target = arrow_type(column.type)
+
+    if column.type == 'BOOLEAN':
+        is_true = pc.is_in(lowered, value_set=pa.array(TRUE_TOKENS))
+        is_false = pc.is_in(lowered, value_set=pa.array(FALSE_TOKENS))
+        return pc.if_else(
+            is_true, pa.scalar(True),
+            pc.if_else(is_false, pa.scalar(False), pa.scalar(None, pa.bool_())),
+        )
+    if column.type == 'BIGINT':
+        return pc.cast(null_where(int64_in_range(values), pc.replace_substring_regex(values, r'^\+', '')), target)
+    if column.type.startswith('DECIMAL'):
+        precision, scale = target.precision, target.scale
+        pattern = rf'^[+-]?\d{{0,{precision - scale}}}(\.\d{{0,{scale}}})?$'
+        valid = pc.and_(pc.match_substring_regex(values, pattern), pc.match_substring_regex(values, r'\d'))
+        return pc.cast(null_where(valid, values), target)
+    if column.type == 'DOUBLE':
+        valid = pc.match_substring_regex(values, FLOAT_RE.pattern)
+        return pc.cast(null_where(valid, values), target)
+    if column.type == 'DATE':
+        parsed = pc.strptime(values, format=column.date_format or '%Y-%m-%d', unit='s', error_is_null=True)
+        return pc.cast(parsed, target)
+    if column.type == 'TIMESTAMP':
+        # merge_column_kinds infers TIMESTAMP for ISO dates mixed with datetimes; dates cast to midnight
+        valid = pc.or_(pc.match_substring_regex(values, TIMESTAMP_RE.pattern),
+                       pc.match_substring_regex(values, ISO_DATE_RE.pattern))
+        return pc.cast(null_where(valid, values), target)
+    return values
+
+
+def parquet_dir(csv_file: Path, raw_dir: Path) -> Path:
+    rel_path = csv_file.relative_to(raw_dir)
+    return raw_dir / PARQUET_PREFIX / rel_path.parent
+
+
+def marker_path(csv_file: Path, raw_dir: Path) -> Path:
+    """Record of the Parquet files written for one CSV; '_' keeps it hidden from Hive."""
+    return parquet_dir(csv_file, raw_dir) / f"_{csv_file.stem}.files.json"
+
+
+def parquet_s3_location(csv_file: Path, raw_dir: Path, s3_bucket: str) -> str:
+    rel_path = csv_file.relative_to(raw_dir)
+    parts = [PARQUET_PREFIX] + list(rel_path.parts[:-1])
+    return f"s3://{s3_bucket}/{'/'.join(parts)}/"
+
+
+def hive_partition_value(value) -> str:
+    """Partition directory value escaped the way Hive does."""
+    if value is None:
+        return HIVE_DEFAULT_PARTITION
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    value = str(value)
+    if value == '':
+        return HIVE_DEFAULT_PARTITION
+    return quote(value, safe=HIVE_PATH_SAFE)
+
+
+class PartitionedParquetWriter:
+    """Routes rows to Parquet files under Hive key=value/ directories.
+    Rows are buffered per partition and written as row groups of row_group_rows.
+    When more than max_buffered_rows are pending in total, the largest buffer is
+    written early, and at most max_open_writers files stay open; a partition
+    whose file was closed continues in a new part file (<stem>-<n>.parquet).
+    Files are written under dot-prefixed temporary names, which Hive ignores,
+    and renamed on close(). Without partition columns this is a single file.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        stem: str,
+        schema,
+        partition_by: List[str],
+        row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+        max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+        max_open_writers: int = DEFAULT_MAX_OPEN_WRITERS,
+    ):
+        self.out_dir = out_dir
+        self.stem = stem
+        self.partition_by = partition_by
+        self.data_schema = pa.schema([f for f in schema if f.name not in partition_by])
+        self.row_group_rows = row_group_rows
+        self.max_buffered_rows = max(max_buffered_rows, row_group_rows)
+        self.max_open_writers = max_open_writers
+        self.pending: Dict[Tuple, List] = {}
+        self.pending_rows: Dict[Tuple, int] = {}
+        self.buffered_rows = 0
+        self.writers = OrderedDict()
+        self.parts: Dict[Tuple, int] = {}
+        self.files: List[Tuple[Path, Path]] = []
+        self.row_groups = 0
+
+    def write(self, table):
+        data = table.select(self.data_schema.names)
+        if not self.partition_by:
+            self._append((), data)
+            return
+        order = pc.sort_indices(table, sort_keys=[(k, 'ascending') for k in self.partition_by])
+        table = table.take(order)
+        data = data.take(order)
+        keys = list(zip(*(table.column(k).to_pylist() for k in self.partition_by)))
+        start = 0
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                self._append(keys[start], data.slice(start, i - start))
+                start = i
+
+    def close(self) -> List[Path]:
+        for key in list(self.pending):
+            self._flush(key, final=True)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+        finals = []
+        for tmp_path, final_path in self.files:
+            tmp_path.replace(final_path)
+            finals.append(final_path)
+        return finals
+
+    def abort(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+        for tmp_path, _ in self.files:
+            tmp_path.unlink(missing_ok=True)
+
+    def _append(self, key: Tuple, table):
+        self.pending.setdefault(key, []).append(table)
+        self.pending_rows[key] = self.pending_rows.get(key, 0) + table.num_rows
+        self.buffered_rows += table.num_rows
+        if self.pending_rows[key] >= self.row_group_rows:
+            self._flush(key, final=False)
+        while self.buffered_rows > self.max_buffered_rows:
+            largest = max(self.pending_rows, key=self.pending_rows.get)
+            self._flush(largest, final=True)
+
+    def _flush(self, key: Tuple, final: bool):
+        table = pa.concat_tables(self.pending.pop(key))
+        rows = self.pending_rows.pop(key)
+        full = rows if final else (rows // self.row_group_rows) * self.row_group_rows
+        if full:
+            self._writer(key).write_table(table.slice(0, full), row_group_size=self.row_group_rows)
+            self.row_groups += -(-full // self.row_group_rows)
+        self.buffered_rows -= full
+        if full < rows:
+            self.pending[key] = [table.slice(full)]
+            self.pending_rows[key] = rows - full
+
+    def _writer(self, key: Tuple):
+        if key in self.writers:
+            self.writers.move_to_end(key)
+            return self.writers[key]
+        if len(self.writers) >= self.max_open_writers:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+        part = self.parts.get(key, 0)
+        self.parts[key] = part + 1
+        directory = self.out_dir.joinpath(*(
+            f"{k}={hive_partition_value(v)}" for k, v in zip(self.partition_by, key)
+        ))
+        directory.mkdir(parents=True, exist_ok=True)
+        name = self.stem if part == 0 else f"{self.stem}-{part}"
+        tmp_path = directory / f".{name}.parquet.tmp"
+        self.files.append((tmp_path, directory / f"{name}.parquet"))
+        writer = pq.ParquetWriter(tmp_path, self.data_schema, compression=PARQUET_COMPRESSION)
+        self.writers[key] = writer
+        return writer
+
+
+def convert_csv_file(
+    csv_file: Path,
+    out_dir: Path,
+    marker: Path,
+    separator: str,
+    file_columns: List[str],
+    target_columns: List[InferredColumn],
+    partition_by: Optional[List[str]] = None,
+    strip_spaces: bool = False,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+    max_open_writers: int = DEFAULT_MAX_OPEN_WRITERS,
+) -> Dict:
+    """Stream one CSV into Parquet with the target schema, partitioned if requested.
+    Memory is bounded by one block plus max_buffered_rows rows.
+    Columns missing from this file's header are written as NULL.
+    Files from a previous conversion of the same CSV (listed in the marker)
+    are replaced.
+    """
+    partition_by = partition_by or []
+    schema = pa.schema([(c.name, arrow_type(c.type)) for c in target_columns])
+    skipped = [0]
+
+    def skip_invalid_row(row):
+        skipped[0] += 1
+        return 'skip'
+
+    reader = pa_csv.open_csv(
+        csv_file,
+        read_options=pa_csv.ReadOptions(
+            block_size=block_bytes,
+            column_names=file_columns,
+            skip_rows=1,
+        ),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=separator,
+            newlines_in_values=True,
+            invalid_row_handler=skip_invalid_row,
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: pa.string() for c in file_columns},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+
+    sink = PartitionedParquetWriter(
+        out_dir, csv_file.stem, schema, partition_by,
+        row_group_rows=row_group_rows,
+        max_buffered_rows=max_buffered_rows,
+        max_open_writers=max_open_writers,
+    )
+    rows = 0
+    try:
+        for batch in reader:
+            arrays = []
+            for column in target_columns:
+                if column.name in file_columns:
+                    arrays.append(convert_column(batch.column(column.name), column, strip_spaces))
+                else:
+                    arrays.append(pa.nulls(batch.num_rows, arrow_type(column.type)))
+            sink.write(pa.Table.from_arrays(arrays, schema=schema))
+            rows += batch.num_rows
+        files = sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+
+    relative = sorted(str(f.relative_to(out_dir)) for f in files)
+    if marker.exists():
+        with marker.open() as f:
+            previous = json.load(f)
+        for stale in set(previous.get('files', [])) - set(relative):
+            stale_path = out_dir / stale
+            stale_path.unlink(missing_ok=True)
+            # Drop partition directories left empty
+            for parent in stale_path.parents:
+                if parent == out_dir or not parent.is_relative_to(out_dir) or any(parent.iterdir()):
+                    break
+                parent.rmdir()
+    with marker.open('w') as f:
+        json.dump({'source': str(csv_file), 'partition_by': partition_by, 'files': relative}, f, indent=2)
+
+    return {
+        'rows': rows,
+        'row_groups': sink.row_groups,
+        'files': len(relative),
+        'partitions': len(sink.parts),
+        'skipped_rows': skipped[0],
+    }
+
+
+def convert_task(task: Dict) -> Dict:
+    """Worker entry point; errors are returned instead of raised."""
+    try:
+        stats = convert_csv_file(**task['args'])
+        return {**task, 'stats': stats, 'error': None}
+    except Exception as e:
+        return {**task, 'stats': None, 'error': str(e)}
+
+
+def table_columns(entry: Dict) -> List[InferredColumn]:
+    """Target Parquet columns for a manifest table: union of layouts with inferred types."""
+    scan = scan_from_manifest(entry)
+    if len(scan['layouts']) > 1:
+        return union_typed_columns(scan, union_columns(scan['layouts']))
+    if scan['typed_columns']:
+        return scan['typed_columns']
+    return [InferredColumn(c, 'VARCHAR') for c in scan['columns']]
+
+
+def generate_parquet_table(
+    table: str,
+    columns: List[InferredColumn],
+    s3_location: str,
+    partition_by: Optional[List[str]] = None,
+) -> str:
+    """Parquet table DDL; Hive requires partition columns last."""
+    partition_by = partition_by or []
+    ordered = [c for c in columns if c.name not in partition_by]
+    ordered += [c for p in partition_by for c in columns if c.name == p]
+    col_defs = ",\n    ".join(f"{c.name} {c.type}" for c in ordered)
+    partition_param = ""
+    if partition_by:
+        keys = ", ".join(f"'{p}'" for p in partition_by)
+        partition_param = f",\n    partitioned_by = ARRAY[{keys}]"
+    return f"""CREATE TABLE IF NOT EXISTS {table}{PARQUET_TABLE_SUFFIX} (
+    {col_defs}
+)
+WITH (
+    external_location = '{s3_location}',
+    format = 'PARQUET'{partition_param}
+);"""
+
+
+def table_partitions(table_key: str, columns: List[InferredColumn], specs: Dict[str, List[str]]) -> List[str]:
+    """Partition columns for a table, or [] if its spec names unknown columns."""
+    partition_by = specs.get(table_key, [])
+    names = {c.name for c in columns}
+    missing = [p for p in partition_by if p not in names]
+    if missing:
+        print(f"  ⚠️  {table_key}: partition columns not found ({', '.join(missing)}), writing unpartitioned")
+        return []
+    if partition_by and len(partition_by) == len(columns):
+        print(f"  ⚠️  {table_key}: cannot partition by every column, writing unpartitioned")
+        return []
+    return partition_by
+
+
+def build_tasks(
+    manifest: Dict,
+    raw_dir: Path,
+    partitions: Dict[str, List[str]],
+    block_bytes: int,
+    row_group_rows: int,
+    force: bool,
+) -> Tuple[List[Dict], int]:
+    """One conversion task per source CSV whose Parquet output is missing or stale."""
+    tasks = []
+    up_to_date = 0
+    for table_key in sorted(manifest['tables']):
+        entry = manifest['tables'][table_key]
+        scan = scan_from_manifest(entry)
+        target = table_columns(entry)
+        partition_by = partitions.get(table_key, [])
+        for layout in scan['layouts']:
+            for csv_file in layout['files']:
+                marker = marker_path(csv_file, raw_dir)
+                if not force and marker.exists() and marker.stat().st_mtime_ns >= csv_file.stat().st_mtime_ns:
+                    with marker.open() as f:
+                        if json.load(f).get('partition_by') == partition_by:
+                            up_to_date += 1
+                            continue
+                tasks.append({
+                    'table': table_key,
+                    'args': {
+                        'csv_file': csv_file,
+                        'out_dir': parquet_dir(csv_file, raw_dir),
+                        'marker': marker,
+                        'separator': layout['separator'],
+                        'file_columns': layout['columns'],
+                        'target_columns': target,
+                        'partition_by': partition_by,
+                        'strip_spaces': scan['strip_spaces'],
+                        'block_bytes': block_bytes,
+                        'row_group_rows': row_group_rows,
+                    },
+                })
+    return tasks, up_to_date
+
+
+def generate_parquet_sql(
+    manifest: Dict,
+    raw_dir: Path,
+    s3_bucket: str,
+    partitions: Dict[str, List[str]],
+) -> List[str]:
+    sql_output = sql_file_header("AUTO-GENERATED TRINO PARQUET TABLES FOR RAW DATA")
+    by_schema: Dict[str, List[str]] = {}
+    for table_key in sorted(manifest['tables']):
+        by_schema.setdefault(table_key.split('.', 1)[0], []).append(table_key)
+
+    for schema in sorted(by_schema):
+        sql_output.extend(schema_header_sql(schema))
+        for table_key in by_schema[schema]:
+            entry = manifest['tables'][table_key]
+            table_name = table_key.split('.', 1)[1]
+            columns = table_columns(entry)
+            partition_by = partitions.get(table_key, [])
+            s3_location = parquet_s3_location(Path(entry['source']), raw_dir, s3_bucket)
+            sql_output.append(f"-- Table: {table_name}{PARQUET_TABLE_SUFFIX}")
+            sql_output.append(f"-- Source: {entry['source']}")
+            if partition_by:
+                sql_output.append(f"-- Partitioned by: {', '.join(partition_by)}")
+            sql_output.append(generate_parquet_table(table_name, columns, s3_location, partition_by))
+            if partition_by:
+                sql_output.append(
+                    f"CALL system.sync_partition_metadata('{schema}', '{table_name}{PARQUET_TABLE_SUFFIX}', 'FULL');"
+                )
+            sql_output.append("")
+        sql_output.append("")
+    return sql_output
+
+
+def convert_all(
+    jobs: int = 1,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    force: bool = False,
+    partition_spec: Optional[Path] = None,
+    partition: bool = True,
+):
+    load_env()
+    s3_bucket = os.environ.get('S3_RAW_BUCKET', 'raw')
+
+    if not MANIFEST_PATH.exists():
+        print(f"❌ Manifest not found: {MANIFEST_PATH} (run generate_trino_schemas.py first)")
+        sys.exit(1)
+    with MANIFEST_PATH.open() as f:
+        manifest = json.load(f)
+
+    specs = load_partition_specs(partition_spec) if partition else {}
+
+    print("📦 Converting CSV files to Parquet...")
+    partitions = {
+        table_key: table_partitions(table_key, table_columns(entry), specs)
+        for table_key, entry in sorted(manifest['tables'].items())
+    }
+    tasks, up_to_date = build_tasks(manifest, RAW_DIR, partitions, block_bytes, row_group_rows, force)
+    if up_to_date:
+        print(f"  {up_to_date} file(s) already converted")
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            results = list(pool.map(convert_task, tasks))
+    else:
+        results = [convert_task(t) for t in tasks]
+
+    failed = 0
+    for result in results:
+        args = result['args']
+        print(f"  Converted: {args['csv_file']} -> {args['out_dir']}")
+        if result['error'] is not None:
+            failed += 1
+            print(f"    ⚠️  Error: {result['error']}")
+            continue
+        stats = result['stats']
+        print(f"    Rows: {stats['rows']}, row groups: {stats['row_groups']}, files: {stats['files']}, "
+              f"partitions: {stats['partitions']}, skipped rows: {stats['skipped_rows']}")
+
+    sql_output = generate_parquet_sql(manifest, RAW_DIR, s3_bucket, partitions)
+    PARQUET_SQL_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with PARQUET_SQL_OUTPUT.open('w') as f:
+        f.write('\n'.join(sql_output))
+
+    print(f"\n✅ Generated Parquet SQL schema: {PARQUET_SQL_OUTPUT}")
+    print(f"📋 Converted files: {len(results) - failed}, failed: {failed}")
+    if failed:
+        sys.exit(1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert raw CSV files to Parquet")
+    parser.add_argument('--jobs', '-j', type=int, default=int(os.environ.get('SCHEMA_SCAN_JOBS', '1')),
+                        help="number of files converted in parallel")
+    parser.add_argument('--block-bytes', type=int, default=DEFAULT_BLOCK_BYTES,
+                        help="CSV bytes read per block")
+    parser.add_argument('--row-group-rows', type=int, default=DEFAULT_ROW_GROUP_ROWS,
+                        help="rows per Parquet row group")
+    parser.add_argument('--force', action='store_true',
+                        help="convert files even if their Parquet copy is newer")
+    parser.add_argument('--partition-spec', type=Path, default=None,
+                        help="JSON file mapping schema.table to partition columns")
+    parser.add_argument('--no-partition', action='store_true',
+                        help="write every table unpartitioned")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if pa is None:
+        print("❌ pyarrow is required: pip install pyarrow")
+        sys.exit(1)
+    args = parse_args()
+    convert_all(
+        jobs=args.jobs,
+        block_bytes=args.block_bytes,
+        row_group_rows=args.row_group_rows,
+        force=args.force,
+        partition_spec=args.partition_spec,
+        partition=not args.no_partition,
+    )
@@ -27,7 +27,8 @@ execute_sql() {
         exit 1
     fi
     
-    docker exec -i trino trino --file=/dev/stdin < "$sql_file"
+    # HTTP statement protocol: schemas run concurrently, transient errors are retried
+    python3 "$SCRIPT_DIR/run_trino_sql.py" "$sql_file"
     
     if [ $? -eq 0 ]; then
         echo "✓ $description completed successfully"
@@ -37,29 +38,30 @@ execute_sql() {
     fi
 }
 
-echo "Waiting for Trino to be ready..."
-sleep 5
-
-max_attempts=30
-attempt=0
-while [ $attempt -lt $max_attempts ]; do
-    if docker exec trino trino --execute "SELECT 1" > /dev/null 2>&1; then
-        echo "✓ Trino is ready"
-        break
-    fi
-    attempt=$((attempt + 1))
-    echo "Waiting for Trino... ($attempt/$max_attempts)"
-    sleep 2
-done
-
-if [ $attempt -eq $max_attempts ]; then
+# Trino /v1/info reports starting=false and the metastore answers thrift calls
+if ! python3 "$SCRIPT_DIR/readiness.py" trino metastore; then
     echo "Error: Trino did not become ready in time"
     exit 1
 fi
 
-execute_sql "$SQL_DIR/trino_schemas.sql" "Creating raw data schemas"
+if [ "${1:-}" = "--delta" ]; then
+    # Only new/changed raw tables from the last incremental generate-schemas run
+    delta_file="$SQL_DIR/trino_schemas_delta.sql"
+    if [ -f "$delta_file" ] && grep -qE '^(CREATE|DROP) ' "$delta_file"; then
+        execute_sql "$delta_file" "Applying raw schema changes"
+        # Applied: the next generate-schemas run starts a new delta instead of appending
+        rm -f "$delta_file"
+    else
+        echo "No raw schema changes to apply"
+    fi
+elif [ "${1:-}" = "--analyze" ]; then
+    # Table/column statistics from the last generate-schemas --profile run
+    execute_sql "$SQL_DIR/trino_schemas_analyze.sql" "Collecting raw table statistics"
+else
+    execute_sql "$SQL_DIR/trino_schemas.sql" "Creating raw data schemas"
 
-execute_sql "$SQL_DIR/prod_trino_schemas.sql" "Creating production schemas"
+    execute_sql "$SQL_DIR/prod_trino_schemas.sql" "Creating production schemas"
+fi
 
 echo ""
 echo "=========================================="
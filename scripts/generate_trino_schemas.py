@@ -3,17 +3,109 @@ Generate Trino SQL schemas from CSV files automatically.
 Detects separators, column names, and generates proper CREATE TABLE statements.
 
 Placed in services/scripts/ and reads .env for configuration (no external deps).
+With --s3 it discovers the raw CSVs in the S3_RAW_BUCKET bucket instead of the
+local raw/ checkout, reading only the first block of each object (needs boto3).
 """
 
 import os
 import csv
 import re
-from pathlib import Path
-from typing import List, Tuple, Dict
+import sys
+import random
+import argparse
+import itertools
+import json
+import math
+import hashlib
+import io
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path, PurePosixPath
+from typing import List, Tuple, Dict, Iterable, NamedTuple, Optional, Union
 
 # Base paths (relative to repository root where script is run)
 RAW_DIR = Path(os.environ.get('S3_RAW_BUCKET', 'raw'))
 SQL_OUTPUT = Path("sql/trino_schemas_generated.sql")
+DELTA_OUTPUT = Path("sql/trino_schemas_delta.sql")
+# Same test as create_trino_schemas.sh --delta for a file with something to apply
+DELTA_STATEMENT_RE = re.compile(r'^(CREATE|DROP) ', re.MULTILINE)
+MANIFEST_PATH = Path("sql/trino_schemas_manifest.json")
+MANIFEST_VERSION = 1
+
+# Bytes hashed from the start of each file for the manifest fingerprint
+HEADER_BLOCK_BYTES = 64 * 1024
+
+# S3 discovery (--s3): bytes fetched from the start of each object with a Range
+# GET (grown until it holds a whole header line), and prefix levels listed with
+# a delimiter before the prefixes found are listed concurrently
+DEFAULT_S3_RANGE_BYTES = 64 * 1024
+S3_LIST_DEPTH = 2
+# Minimum threads for S3 listing and range requests (I/O bound, unlike local scans)
+S3_JOBS = 16
+
+# Compacted copies of multi-file tables (compact_raw_tables.py) mirror the raw
+# layout under this prefix; '_' keeps them out of the scan, and the marker file
+# in each compacted folder makes the table point at the copy while it is current
+COMPACTED_PREFIX = '_compacted'
+COMPACTION_MARKER = '_compaction.json'
+
+# Hive partition columns per table (see architecture/data.md), applied when
+# raw data is rewritten into key=value/ prefixes by convert_raw_to_parquet.py.
+# Override with a JSON file of the same shape via --partition-spec.
+PARTITION_SPECS = {
+    'raw_hotels.hotels': ['county_name', 'city_name'],
+    'raw_reservations.reservations_standard': ['arrival_year', 'arrival_month'],
+    'raw_reservations.reservations_standard_2': ['year', 'month'],
+    'raw_reservations.reservations_detailed': ['arrival_date_year', 'arrival_date_month'],
+    'raw_reviews.reviews_detailed': ['review_date'],
+    'raw_reviews.reviews_aggregated': ['review_date'],
+}
+
+# Object suffix of raw CSVs compressed on upload (upload_raw_to_s3.py --compression);
+# Trino picks the codec from the file extension, "$path" filters must include it
+RAW_COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Type inference sampling defaults (rows kept in memory per file)
+DEFAULT_HEAD_ROWS = 1000
+DEFAULT_SAMPLE_ROWS = 10000
+SAMPLE_SEED = 42
+
+# Column profiling (--profile)
+PROFILE_OUTPUT = Path("sql/trino_column_profile.json")
+ANALYZE_OUTPUT = Path("sql/trino_schemas_analyze.sql")
+HLL_PRECISION = 12
+# Columns with longer average values (free text) are left out of ANALYZE
+ANALYZE_MAX_AVG_LENGTH = 64
+NUMERIC_START = set('0123456789+-.')
+
+# Values treated as NULL during type inference
+NULL_TOKENS = {'', 'na', 'n/a', 'nan', 'null', 'none', '-'}
+BOOLEAN_TOKENS = {'true', 'false', 'yes', 'no', 't', 'f'}
+
+INT_RE = re.compile(r'^[+-]?\d+$')
+FIXED_RE = re.compile(r'^[+-]?(\d*)\.(\d+)$')
+FLOAT_RE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?$')
+
+# (regex, Trino date_parse format or None for ISO CAST)
+DATE_FORMATS = [
+    (re.compile(r'^\d{4}-\d{2}-\d{2}$'), None),
+    (re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$'), '%m/%d/%Y'),
+    (re.compile(r'^\d{1,2}\.\d{1,2}\.\d{4}$'), '%d.%m.%Y'),
+]
+
+INT64_MAX = 2 ** 63 - 1
+DECIMAL_PRECISION = 18
+
+# Header and review text fields can be very long
+csv.field_size_limit(sys.maxsize)
+
+
+class InferredColumn(NamedTuple):
+    name: str
+    type: str
+    date_format: Optional[str] = None
 
 
 def load_env(env_paths=(".env", "services/.env")):
@@ -39,22 +131,29 @@ def load_env(env_paths=(".env", "services/.env")):
     return False
 
 
+def read_header_line(f) -> str:
+    """Return the first non-empty line among the first few lines of an open file."""
+    for _ in range(5):
+        line = f.readline()
+        if not line:
+            break
+        if line.strip():
+            return line
+    return ''
+
+
 def detect_separator(file_path: Path) -> Tuple[str, bool]:
     """Detect CSV separator by analyzing first non-empty line.
     Returns (separator_char, strip_spaces_flag).
     strip_spaces_flag indicates header fields are separated by comma+space patterns.
     """
     with file_path.open('r', encoding='utf-8', errors='ignore') as f:
-        # read a few lines to find a non-empty header
-        first_line = ''
-        for _ in range(5):
-            line = f.readline()
-            if not line:
-                break
-            if line.strip():
-                first_line = line
-                break
+        first_line = read_header_line(f)
+    return detect_separator_from_line(first_line)
 
+
+def detect_separator_from_line(first_line: str) -> Tuple[str, bool]:
+    """Separator detection on an already-read header line (see detect_separator)."""
     if not first_line:
         return ',', False
 
@@ -103,6 +202,11 @@ def get_csv_columns(file_path: Path, separator: str, strip_spaces: bool) -> List
         reader = csv.reader(f, delimiter=delim)
         header = next(reader)
 
+    return parse_header(header, strip_spaces)
+
+
+def parse_header(header: List[str], strip_spaces: bool) -> List[str]:
+    """Clean raw header fields into column names."""
     if strip_spaces:
         header = [h.strip() for h in header]
 
@@ -110,16 +214,311 @@ def get_csv_columns(file_path: Path, separator: str, strip_spaces: bool) -> List
     return columns
 
 
-def path_to_schema_table(file_path: Path, raw_dir: Path) -> Tuple[str, str]:
+def sample_csv_rows(
+    file_path: Path,
+    separator: str,
+    strip_spaces: bool,
+    head_rows: int = DEFAULT_HEAD_ROWS,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    max_scan_rows: int = 0,
+    seed: int = SAMPLE_SEED,
+) -> List[List[str]]:
+    """Stream CSV data rows once and return a bounded sample.
+    Keeps the first head_rows rows plus a reservoir sample of sample_rows rows
+    from the remainder, so memory does not depend on file size.
+    max_scan_rows > 0 stops reading after that many data rows.
+    """
+    delim = '\t' if separator == '\t' else separator[0]
+    with file_path.open('r', encoding='utf-8', errors='ignore', newline='') as f:
+        reader = csv.reader(f, delimiter=delim)
+        next(reader, None)  # header
+        return sample_reader_rows(
+            reader, strip_spaces,
+            head_rows=head_rows,
+            sample_rows=sample_rows,
+            max_scan_rows=max_scan_rows,
+            seed=seed,
+        )
+
+
+def sample_reader_rows(
+    reader: Iterable[List[str]],
+    strip_spaces: bool,
+    head_rows: int = DEFAULT_HEAD_ROWS,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    max_scan_rows: int = 0,
+    seed: int = SAMPLE_SEED,
+    profiler: Optional['TableProfiler'] = None,
+) -> List[List[str]]:
+    """Sampling core of sample_csv_rows over a reader positioned after the header.
+    A profiler, if given, sees every scanned row, not just the sample.
+    """
+    rng = random.Random(seed)
+    head: List[List[str]] = []
+    reservoir: List[List[str]] = []
+    seen_tail = 0
+
+    for n, row in enumerate(reader):
+        if max_scan_rows and n >= max_scan_rows:
+            break
+        if strip_spaces:
+            row = [v.strip() for v in row]
+        if profiler is not None:
+            profiler.add_row(row)
+        if n < head_rows:
+            head.append(row)
+            continue
+        if sample_rows <= 0:
+            if profiler is None:
+                break
+            continue
+        seen_tail += 1
+        if len(reservoir) < sample_rows:
+            reservoir.append(row)
+        else:
+            j = rng.randrange(seen_tail)
+            if j < sample_rows:
+                reservoir[j] = row
+
+    return head + reservoir
+
+
+def infer_value_type(value: str) -> Tuple[str, Optional[str], int, int]:
+    """Classify a single non-null value.
+    Returns (kind, date_format, integer_digits, scale) where kind is one of
+    BOOLEAN, BIGINT, DECIMAL, DOUBLE, DATE, TIMESTAMP, VARCHAR.
+    """
+    low = value.lower()
+    if low in BOOLEAN_TOKENS:
+        return 'BOOLEAN', None, 0, 0
+    if INT_RE.match(value):
+        digits = value.lstrip('+-')
+        if len(digits) > 1 and digits.startswith('0'):
+            # Codes such as zip or phone numbers lose leading zeros as numbers
+            return 'VARCHAR', None, 0, 0
+        if int(digits) > INT64_MAX:
+            return 'DOUBLE', None, 0, 0
+        return 'BIGINT', None, len(digits.lstrip('0')) or 1, 0
+    m = FIXED_RE.match(value)
+    if m:
+        return 'DECIMAL', None, len(m.group(1).lstrip('0')) or 1, len(m.group(2))
+    if FLOAT_RE.match(value):
+        return 'DOUBLE', None, 0, 0
+    for regex, fmt in DATE_FORMATS:
+        if regex.match(value):
+            return 'DATE', fmt, 0, 0
+    if TIMESTAMP_RE.match(value):
+        return 'TIMESTAMP', None, 0, 0
+    return 'VARCHAR', None, 0, 0
+
+
+def merge_column_kinds(kinds: Iterable[Tuple[str, Optional[str], int, int]]) -> Tuple[str, Optional[str]]:
+    """Reduce per-value classifications to a single Trino type."""
+    seen = set()
+    date_formats = set()
+    scales = set()
+    int_digits = 0
+    scale = 0
+    for kind, fmt, digits, sc in kinds:
+        seen.add(kind)
+        if kind == 'DATE':
+            date_formats.add(fmt)
+        if kind == 'DECIMAL':
+            scales.add(sc)
+        int_digits = max(int_digits, digits)
+        scale = max(scale, sc)
+
+    if not seen:
+        return 'VARCHAR', None
+    if len(seen) == 1:
+        kind = seen.pop()
+        if kind == 'DATE':
+            if len(date_formats) == 1:
+                return 'DATE', date_formats.pop()
+            return 'VARCHAR', None
+        if kind == 'DECIMAL':
+            # Fixed scale across the sample; leave headroom for unsampled magnitudes
+            if len(scales) == 1 and int_digits + scale <= DECIMAL_PRECISION:
+                return f'DECIMAL({DECIMAL_PRECISION},{scale})', None
+            return 'DOUBLE', None
+        return kind, None
+    if seen <= {'BIGINT', 'DECIMAL', 'DOUBLE'}:
+        return 'DOUBLE', None
+    if seen <= {'DATE', 'TIMESTAMP'} and date_formats == {None}:
+        return 'TIMESTAMP', None
+    return 'VARCHAR', None
+
+
+def infer_column_types(columns: List[str], rows: List[List[str]]) -> List[InferredColumn]:
+    """Infer a Trino type for each column from sampled rows (VARCHAR fallback)."""
+    result = []
+    for idx, col in enumerate(columns):
+        kinds = []
+        for row in rows:
+            if idx >= len(row):
+                continue
+            value = row[idx].strip()
+            if value.lower() in NULL_TOKENS:
+                continue
+            kinds.append(infer_value_type(value))
+            if kinds[-1][0] == 'VARCHAR':
+                break
+        col_type, date_format = merge_column_kinds(kinds)
+        result.append(InferredColumn(col, col_type, date_format))
+    return result
+
+
+class HyperLogLog:
+    """Approximate distinct counter with 2**precision registers (~1.6% error at 12)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        x = int.from_bytes(hashlib.blake2b(value.encode('utf-8', 'ignore'), digest_size=8).digest(), 'big')
+        idx = x >> (64 - self.precision)
+        rest = (x << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(65 - rest.bit_length(), 65 - self.precision)
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def pick_bound(fn, a, b):
+    """min/max of two optional values."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return fn(a, b)
+
+
+class TableProfiler:
+    """Per-column null count, approximate distinct count, min/max and average length,
+    accumulated row by row during the sampling pass.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        n = len(columns)
+        self.rows = 0
+        self.nulls = [0] * n
+        self.total_length = [0] * n
+        self.distinct = [HyperLogLog() for _ in range(n)]
+        self.min_str: List[Optional[str]] = [None] * n
+        self.max_str: List[Optional[str]] = [None] * n
+        self.min_num: List[Optional[float]] = [None] * n
+        self.max_num: List[Optional[float]] = [None] * n
+
+    def add_row(self, row: List[str]):
+        self.rows += 1
+        for i in range(len(self.columns)):
+            if i >= len(row):
+                self.nulls[i] += 1
+                continue
+            value = row[i].strip()
+            if value.lower() in NULL_TOKENS:
+                self.nulls[i] += 1
+                continue
+            self.total_length[i] += len(value)
+            self.distinct[i].add(value)
+            if self.min_str[i] is None or value < self.min_str[i]:
+                self.min_str[i] = value
+            if self.max_str[i] is None or value > self.max_str[i]:
+                self.max_str[i] = value
+            if value[0] in NUMERIC_START:
+                try:
+                    number = float(value)
+                except ValueError:
+                    continue
+                if self.min_num[i] is None or number < self.min_num[i]:
+                    self.min_num[i] = number
+                if self.max_num[i] is None or number > self.max_num[i]:
+                    self.max_num[i] = number
+
+    def merge(self, other: 'TableProfiler'):
+        """Fold in another file's profile, matching columns by name."""
+        rows_before = self.rows
+        self.rows += other.rows
+        for j, col in enumerate(other.columns):
+            if col not in self.columns:
+                self._add_column(col, nulls=rows_before)
+            i = self.columns.index(col)
+            self.nulls[i] += other.nulls[j]
+            self.total_length[i] += other.total_length[j]
+            self.distinct[i].merge(other.distinct[j])
+            self.min_str[i] = pick_bound(min, self.min_str[i], other.min_str[j])
+            self.max_str[i] = pick_bound(max, self.max_str[i], other.max_str[j])
+            self.min_num[i] = pick_bound(min, self.min_num[i], other.min_num[j])
+            self.max_num[i] = pick_bound(max, self.max_num[i], other.max_num[j])
+        for i, col in enumerate(self.columns):
+            if col not in other.columns:
+                self.nulls[i] += other.rows
+
+    def _add_column(self, col: str, nulls: int):
+        self.columns.append(col)
+        self.nulls.append(nulls)
+        self.total_length.append(0)
+        self.distinct.append(HyperLogLog())
+        for field in (self.min_str, self.max_str, self.min_num, self.max_num):
+            field.append(None)
+
+    def result(self, typed_columns: Optional[List[InferredColumn]] = None) -> Dict:
+        """JSON-serializable profile; min/max follow the inferred column type."""
+        types = {c.name: c for c in typed_columns or []}
+        columns = {}
+        for i, col in enumerate(self.columns):
+            inferred = types.get(col, InferredColumn(col, 'VARCHAR'))
+            non_null = self.rows - self.nulls[i]
+            if inferred.type == 'BIGINT' and self.min_num[i] is not None:
+                low, high = int(self.min_num[i]), int(self.max_num[i])
+            elif inferred.type in ('DOUBLE', 'BIGINT') or inferred.type.startswith('DECIMAL'):
+                low, high = self.min_num[i], self.max_num[i]
+            elif inferred.type == 'BOOLEAN' or inferred.date_format:
+                low, high = None, None
+            else:
+                low, high = self.min_str[i], self.max_str[i]
+            columns[col] = {
+                'type': inferred.type,
+                'null_count': self.nulls[i],
+                'null_fraction': round(self.nulls[i] / self.rows, 6) if self.rows else 0.0,
+                'distinct_count': min(self.distinct[i].count(), non_null),
+                'min': low,
+                'max': high,
+                'avg_length': round(self.total_length[i] / non_null, 2) if non_null else 0.0,
+            }
+        return {'rows': self.rows, 'columns': columns}
+
+
+def relative_parts(file_path: Union[Path, str], raw_dir: Optional[Path]) -> List[str]:
+    """Path components below raw_dir; without raw_dir, file_path is an object key."""
+    if raw_dir is None:
+        return list(PurePosixPath(file_path).parts)
+    return list(Path(file_path).relative_to(raw_dir).parts)
+
+
+def path_to_schema_table(file_path: Union[Path, str], raw_dir: Optional[Path] = None) -> Tuple[str, str]:
     """
     Generic conversion from file path to schema and table.
     Rule: schema = raw_<top-level-folder>
     If CSV is directly under that folder (raw/hotels/file.csv) -> table = filename stem
     If CSV is in a nested folder (raw/reviews/by_city/file.csv) -> table = "<top>-<parent>" e.g. reviews_by_city
-    All names returned in snake_case.
+    All names returned in snake_case. With raw_dir=None, file_path is an S3 object
+    key relative to the bucket (reviews/by_city/file.csv).
     """
-    rel_path = file_path.relative_to(raw_dir)
-    parts = list(rel_path.parts)
+    parts = relative_parts(file_path, raw_dir)
     if not parts:
         raise ValueError("Invalid path relative to raw dir")
 
@@ -138,9 +537,9 @@ def path_to_schema_table(file_path: Path, raw_dir: Path) -> Tuple[str, str]:
     return schema, table
 
 
-def get_s3_path(file_path: Path, raw_dir: Path, s3_bucket: str) -> str:
-    rel_path = file_path.relative_to(raw_dir)
-    parts = list(rel_path.parts[:-1])
+def get_s3_path(file_path: Union[Path, str], raw_dir: Optional[Path], s3_bucket: str) -> str:
+    """external_location of a file's prefix; raw_dir=None takes an object key."""
+    parts = relative_parts(file_path, raw_dir)[:-1]
     s3_path = f"s3://{s3_bucket}/{'/'.join(parts)}/"
     return s3_path
 
@@ -171,72 +570,810 @@ WITH (
     return sql
 
 
+def generate_parquet_create_table(table: str, columns: List[str], s3_location: str) -> str:
+    """Table over compacted Parquet parts, which store every column as a string like the CSVs."""
+    col_defs = ",\n    ".join(f"{col} VARCHAR" for col in columns)
+    return f"""CREATE TABLE IF NOT EXISTS {table} (
+    {col_defs}
+)
+WITH (
+    external_location = '{s3_location}',
+    format = 'PARQUET'
+);"""
+
+
+def typed_column_expr(column: InferredColumn) -> str:
+    """SQL expression casting a raw VARCHAR column to its inferred type."""
+    name = column.name
+    if column.type == 'VARCHAR':
+        return name
+    if column.type == 'BOOLEAN':
+        return (f"CASE lower(trim({name})) WHEN 'true' THEN true WHEN 't' THEN true WHEN 'yes' THEN true "
+                f"WHEN 'false' THEN false WHEN 'f' THEN false WHEN 'no' THEN false END AS {name}")
+    if column.type == 'DATE' and column.date_format:
+        return f"CAST(try(date_parse(trim({name}), '{column.date_format}')) AS DATE) AS {name}"
+    return f"TRY_CAST(trim({name}) AS {column.type}) AS {name}"
+
+
+def generate_typed_view(table: str, columns: List[InferredColumn]) -> str:
+    """Typed view over a CSV table.
+    The Hive CSV serde only supports VARCHAR columns, so inferred types are
+    applied in a view (<table>_typed) instead of the table itself.
+    """
+    col_exprs = ",\n    ".join(typed_column_expr(c) for c in columns)
+    sql = f"""CREATE OR REPLACE VIEW {table}_typed AS
+SELECT
+    {col_exprs}
+FROM {table};"""
+    return sql
+
+
 def collect_csv_files(raw_dir: Path) -> Dict[str, List[Path]]:
     schemas = {}
     for csv_file in raw_dir.rglob("*.csv"):
+        # _compacted/, _bench/ copies and hidden temp files are not tables of their own
+        if any(p[0] in '._' for p in csv_file.relative_to(raw_dir).parts):
+            continue
         schema, table = path_to_schema_table(csv_file, raw_dir)
         schemas.setdefault(schema, []).append(csv_file)
     return schemas
 
 
-def generate_sql():
+def s3_client(jobs: int):
+    """boto3 client for the raw bucket, configured like upload_raw_to_s3.py."""
+    try:
+        from upload_raw_to_s3 import s3_client as upload_client
+    except ImportError as e:  # boto3 missing
+        print(f"❌ --s3 requires boto3: pip install boto3 ({e})")
+        sys.exit(1)
+    return upload_client(max_connections=max(jobs, 10))
+
+
+def list_s3_prefix(client, bucket: str, prefix: str, delimiter: bool) -> Tuple[List[Dict], List[str]]:
+    """All pages of one listing: (objects, common prefixes)."""
+    objects, prefixes = [], []
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = '/'
+    for page in client.get_paginator('list_objects_v2').paginate(**params):
+        objects.extend(page.get('Contents', []))
+        prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+    return objects, prefixes
+
+
+def hidden_prefix(prefix: str) -> bool:
+    """'_bench/', '.tmp/': benchmark copies and temp files, which Hive skips too."""
+    return prefix.rstrip('/').rsplit('/', 1)[-1][:1] in ('_', '.')
+
+
+def list_s3_objects(client, bucket: str, jobs: int = 8, depth: int = S3_LIST_DEPTH) -> List[Dict]:
+    """Every object in the bucket outside hidden prefixes. The top `depth` prefix
+    levels are listed with a delimiter to find the table folders, which are then
+    paginated concurrently.
+    """
+    objects: List[Dict] = []
+    prefixes = ['']
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        for _ in range(depth):
+            next_prefixes = []
+            for found, sub in pool.map(lambda p: list_s3_prefix(client, bucket, p, True), prefixes):
+                objects.extend(found)
+                next_prefixes.extend(p for p in sub if not hidden_prefix(p))
+            prefixes = next_prefixes
+            if not prefixes:
+                break
+        for found, _ in pool.map(lambda p: list_s3_prefix(client, bucket, p, False), prefixes):
+            objects.extend(found)
+    return objects
+
+
+def collect_s3_objects(
+    client,
+    bucket: str,
+    compression: str = 'none',
+    jobs: int = 8,
+) -> Tuple[Dict[str, List[Path]], Dict[str, Dict]]:
+    """collect_csv_files for the raw bucket.
+    Objects are returned as their local mirror paths (RAW_DIR/<key without the
+    codec suffix>), so the manifest and "$path" filters look the same as after a
+    local scan. Also returns listing fingerprints (size, ETag) keyed like
+    file_fingerprint, so unchanged objects need no GET. Keys under '_' or '.'
+    prefixes (benchmark copies, temp files) are skipped.
+    """
+    suffix = '.csv' + RAW_COMPRESSION_SUFFIXES[compression]
+    schemas: Dict[str, List[Path]] = {}
+    fingerprints: Dict[str, Dict] = {}
+    for obj in list_s3_objects(client, bucket, jobs):
+        key = obj['Key']
+        parts = PurePosixPath(key).parts
+        if not key.endswith(suffix) or len(parts) < 2 or any(p[0] in '._' for p in parts) or not obj['Size']:
+            continue
+        csv_key = key[:len(key) - len(suffix)] + '.csv'
+        schema, _ = path_to_schema_table(csv_key)
+        csv_file = RAW_DIR / csv_key
+        schemas.setdefault(schema, []).append(csv_file)
+        fingerprints[str(csv_file)] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+    return schemas, fingerprints
+
+
+def compaction_marker_key(csv_file: Path) -> str:
+    """Bucket key (and path below RAW_DIR) of the compaction marker of a file's folder."""
+    folder = csv_file.relative_to(RAW_DIR).parent.as_posix()
+    return f"{COMPACTED_PREFIX}/{folder}/{COMPACTION_MARKER}"
+
+
+def stale_compaction(marker: Dict, fingerprints: Dict[str, Dict]) -> Optional[str]:
+    """Why a compaction marker no longer matches the source files, or None if it does.
+    fingerprints are the files' current manifest fingerprints (file_fingerprint, or the
+    S3 size and ETag); the marker records the ones its parts were written from.
+    """
+    sources = marker.get('sources', {})
+    if sorted(sources) != sorted(fingerprints):
+        return 'files added or removed'
+    if sources != fingerprints:
+        return 'files changed'
+    return None
+
+
+def load_compaction(files: List[Path], fingerprints: Dict[str, Dict], client=None,
+                    bucket: str = 'raw') -> Optional[Dict]:
+    """The compacted copy of a table, if its marker was written from exactly the table's
+    current files (by their fingerprints); otherwise the table reads its files.
+    With an S3 client the marker is fetched from the bucket.
+    """
+    key = compaction_marker_key(files[0])
+    try:
+        if client is None:
+            with (RAW_DIR / key).open() as f:
+                marker = json.load(f)
+        else:
+            marker = json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        if client is not None and type(e).__name__ == 'NoSuchKey':
+            return None
+        print(f"  ⚠️  Ignoring unreadable compaction marker {key}: {e}")
+        return None
+    stale = stale_compaction(marker, {str(f): fingerprints[str(f)] for f in files})
+    if stale:
+        print(f"  ⚠️  {key} is stale ({stale}), using the original files")
+        return None
+    return {
+        **{k: marker[k] for k in ('format', 'separator', 'columns', 'source_column')},
+        'parts': len(marker['parts']),
+        'files': len(files),
+    }
+
+
+def compacted_location(s3_path: str) -> str:
+    """s3://bucket/<prefix>/ -> s3://bucket/_compacted/<prefix>/"""
+    bucket, prefix = s3_path[len('s3://'):].split('/', 1)
+    return f"s3://{bucket}/{COMPACTED_PREFIX}/{prefix}"
+
+
+def decompress_prefix(data: bytes, compression: str) -> bytes:
+    """Decompress the leading bytes of a gzip/zstd object (a truncated stream is fine)."""
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def open_s3_object(
+    csv_file: Path,
+    client=None,
+    bucket: str = 'raw',
+    compression: str = 'none',
+    range_bytes: int = DEFAULT_S3_RANGE_BYTES,
+) -> io.StringIO:
+    """Text of the first range_bytes of a raw object, fetched with a Range GET.
+    The range doubles until it holds a complete header line. Unless the whole
+    object was read, the text is cut after its last complete line, so the
+    sampled rows are the rows in the range.
+    """
+    key = csv_file.relative_to(RAW_DIR).as_posix() + RAW_COMPRESSION_SUFFIXES[compression]
+    while True:
+        response = client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{range_bytes - 1}")
+        data = response['Body'].read()
+        total = int(response.get('ContentRange', '').rsplit('/', 1)[-1] or len(data))
+        complete = len(data) >= total
+        text = decompress_prefix(data, compression).decode('utf-8', errors='ignore')
+        if complete or '\n' in text.lstrip('\r\n'):
+            break
+        range_bytes *= 2
+    if not complete:
+        text = text[:text.rfind('\n') + 1]
+    return io.StringIO(text, newline='')
+
+
+def scan_csv_file(
+    csv_file: Path,
+    head_rows: int = DEFAULT_HEAD_ROWS,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    max_scan_rows: int = 0,
+    infer_types: bool = True,
+    profile: bool = False,
+    open_text=None,
+) -> Dict:
+    """Detect separator, parse header and sample rows with a single open of the file.
+    With profile=True the same pass also feeds every row to a TableProfiler.
+    open_text(csv_file) replaces the local open (open_s3_object for --s3).
+    Runs inside worker processes, so progress lines are returned in 'log'
+    instead of printed, keeping output ordered.
+    """
+    result = {
+        'file': csv_file,
+        'separator': ',',
+        'strip_spaces': False,
+        'columns': None,
+        'typed_columns': None,
+        'sampled_rows': 0,
+        'profiler': None,
+        'error': None,
+        'log': [],
+    }
+    log = result['log']
+    try:
+        if open_text is None:
+            f = csv_file.open('r', encoding='utf-8', errors='ignore', newline='')
+        else:
+            f = open_text(csv_file)
+        with f:
+            first_line = read_header_line(f)
+            separator, strip_spaces = detect_separator_from_line(first_line)
+            result['separator'] = separator
+            result['strip_spaces'] = strip_spaces
+            log.append(f"    Separator: {repr(separator)}, strip_spaces={strip_spaces}")
+
+            delim = '\t' if separator == '\t' else separator[0]
+            reader = csv.reader(itertools.chain([first_line], f), delimiter=delim)
+            header = next(reader)
+            columns = parse_header(header, strip_spaces)
+            result['columns'] = columns
+            log.append(f"    Columns: {len(columns)}")
+
+            profiler = TableProfiler(columns) if profile else None
+            if infer_types or profile:
+                rows = sample_reader_rows(
+                    reader, strip_spaces,
+                    head_rows=head_rows if infer_types else 0,
+                    sample_rows=sample_rows if infer_types else 0,
+                    max_scan_rows=max_scan_rows,
+                    profiler=profiler,
+                )
+            if profiler is not None:
+                result['profiler'] = profiler
+                log.append(f"    Profiled: {profiler.rows} rows")
+            if infer_types:
+                typed_columns = infer_column_types(columns, rows)
+                result['typed_columns'] = typed_columns
+                result['sampled_rows'] = len(rows)
+                non_varchar = sum(1 for c in typed_columns if c.type != 'VARCHAR')
+                log.append(f"    Types: {non_varchar}/{len(typed_columns)} typed from {len(rows)} sampled rows")
+    except Exception as e:
+        result['error'] = str(e)
+        log.append(f"    ⚠️  Error reading columns: {e}")
+    return result
+
+
+def scan_csv_files(
+    files: List[Path],
+    jobs: int = 1,
+    header_only: Optional[List[bool]] = None,
+    threads: bool = False,
+    **scan_options,
+) -> List[Dict]:
+    """Scan files with a process pool of `jobs` workers (threads for S3 objects,
+    where the time goes into waiting on requests).
+    header_only[i] limits file i to separator and header detection.
+    Results are returned in input order, so the generated SQL does not depend
+    on which worker finishes first.
+    """
+    full_scan = partial(scan_csv_file, **scan_options)
+    header_scan = partial(scan_csv_file, **{**scan_options, 'infer_types': False})
+    if header_only is None:
+        header_only = [False] * len(files)
+    tasks = [header_scan if h else full_scan for h in header_only]
+    if jobs <= 1 or len(files) <= 1:
+        return [task(f) for task, f in zip(tasks, files)]
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(max_workers=min(jobs, len(files))) as pool:
+        futures = [pool.submit(task, f) for task, f in zip(tasks, files)]
+        return [future.result() for future in futures]
+
+
+def reconcile_headers(scans: List[Dict]) -> Tuple[List[Dict], List[str]]:
+    """Group the files of one table by header layout and describe any drift.
+    The first scan is the table's primary file and defines layout 0.
+    Hive reads CSV columns by position, so files whose separator or column
+    order differ cannot share one table definition.
+    Returns (layouts, drift_messages); one layout means no drift.
+    """
+    layouts: List[Dict] = []
+    for scan in scans:
+        if scan['error'] is not None:
+            continue
+        for layout in layouts:
+            if layout['separator'] == scan['separator'] and layout['columns'] == scan['columns']:
+                layout['files'].append(scan['file'])
+                break
+        else:
+            layouts.append({
+                'files': [scan['file']],
+                'separator': scan['separator'],
+                'columns': scan['columns'],
+            })
+
+    drift = []
+    if not layouts:
+        return layouts, drift
+    base = layouts[0]
+    for layout in layouts[1:]:
+        names = ', '.join(p.name for p in layout['files'])
+        if layout['separator'] != base['separator']:
+            drift.append(f"{names}: separator {layout['separator']!r} != {base['separator']!r}")
+        missing = [c for c in base['columns'] if c not in layout['columns']]
+        extra = [c for c in layout['columns'] if c not in base['columns']]
+        if missing:
+            drift.append(f"{names}: missing columns {', '.join(missing)}")
+        if extra:
+            drift.append(f"{names}: extra columns {', '.join(extra)}")
+        shared = [c for c in layout['columns'] if c in base['columns']]
+        if shared != [c for c in base['columns'] if c in layout['columns']]:
+            drift.append(f"{names}: column order differs")
+    return layouts, drift
+
+
+def load_partition_specs(spec_path: Optional[Path] = None) -> Dict[str, List[str]]:
+    """Partition spec per table key; a JSON file replaces the built-in PARTITION_SPECS."""
+    if spec_path is None:
+        return dict(PARTITION_SPECS)
+    with spec_path.open() as f:
+        specs = json.load(f)
+    return {k: list(v) for k, v in specs.items()}
+
+
+def file_fingerprint(file_path: Path) -> Dict:
+    """Cheap change fingerprint: size, mtime and a hash of the header block."""
+    st = file_path.stat()
+    with file_path.open('rb') as f:
+        header_hash = hashlib.sha1(f.read(HEADER_BLOCK_BYTES)).hexdigest()
+    return {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'header_hash': header_hash,
+    }
+
+
+def load_manifest(manifest_path: Path, options: Dict) -> Dict:
+    """Load the previous run's manifest; all files count as changed if generation options differ."""
+    empty = {'version': MANIFEST_VERSION, 'options': options, 'files': {}, 'tables': {}}
+    if not manifest_path.exists():
+        return empty
+    try:
+        with manifest_path.open() as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Ignoring unreadable manifest {manifest_path}: {e}")
+        return empty
+    if manifest.get('version') != MANIFEST_VERSION:
+        return empty
+    # Manifests written before profiles were kept per table had 'profile' among the options
+    manifest['options'] = {k: v for k, v in (manifest.get('options') or {}).items() if k != 'profile'}
+    if manifest['options'] != options:
+        # Rescan everything, but keep previous tables so the delta can drop them
+        print("  Manifest options changed, rescanning all files")
+        manifest['files'] = {}
+    return manifest
+
+
+def save_manifest(manifest_path: Path, manifest: Dict):
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    tmp_path.replace(manifest_path)
+
+
+def scan_to_manifest(scan: Dict, files: List[Path]) -> Dict:
+    return {
+        'source': str(scan['file']),
+        'files': [str(p) for p in files],
+        'separator': scan['separator'],
+        'strip_spaces': scan['strip_spaces'],
+        'columns': scan['columns'],
+        'typed_columns': [list(c) for c in scan['typed_columns']] if scan['typed_columns'] else None,
+        'sampled_rows': scan['sampled_rows'],
+        'layouts': [
+            {'files': [str(p) for p in l['files']], 'separator': l['separator'], 'columns': l['columns']}
+            for l in scan.get('layouts') or []
+        ],
+        'drift': scan.get('drift') or [],
+        'profile': scan.get('profile'),
+        'compaction': scan.get('compaction'),
+    }
+
+
+def scan_from_manifest(entry: Dict) -> Dict:
+    typed = entry.get('typed_columns')
+    return {
+        'file': Path(entry['source']),
+        'separator': entry['separator'],
+        'strip_spaces': entry['strip_spaces'],
+        'columns': entry['columns'],
+        'typed_columns': [InferredColumn(*c) for c in typed] if typed else None,
+        'sampled_rows': entry.get('sampled_rows', 0),
+        'layouts': [
+            {'files': [Path(p) for p in l['files']], 'separator': l['separator'], 'columns': l['columns']}
+            for l in entry.get('layouts') or []
+        ],
+        'drift': entry.get('drift') or [],
+        'profile': entry.get('profile'),
+        'compaction': entry.get('compaction'),
+        'error': None,
+        'log': ["    Unchanged (manifest)"],
+    }
+
+
+def sql_file_header(title: str) -> List[str]:
+    return [
+        "-- " + "=" * 60,
+        f"-- {title}",
+        "-- Generated from CSV files in raw/ directory",
+        "-- " + "=" * 60,
+        "",
+    ]
+
+
+def schema_header_sql(schema: str) -> List[str]:
+    return [
+        f"-- Schema: {schema}",
+        f"CREATE SCHEMA IF NOT EXISTS hive.{schema};",
+        f"USE hive.{schema};",
+        "",
+    ]
+
+
+def has_typed_view(typed_columns: Optional[List[InferredColumn]]) -> bool:
+    return bool(typed_columns) and any(c.type != 'VARCHAR' for c in typed_columns)
+
+
+def union_typed_columns(scan: Dict, columns: List[str]) -> List[InferredColumn]:
+    """Inferred types for a set of columns; columns absent from the primary file stay VARCHAR."""
+    known = {c.name: c for c in scan['typed_columns'] or []}
+    return [known.get(c, InferredColumn(c, 'VARCHAR')) for c in columns]
+
+
+def compacted_typed_columns(scan: Dict) -> List[InferredColumn]:
+    """Inferred types for the columns of a compacted copy (source column as VARCHAR)."""
+    return union_typed_columns(scan, scan['compaction']['columns'])
+
+
+def union_columns(layouts: List[Dict]) -> List[str]:
+    columns: List[str] = []
+    for layout in layouts:
+        columns.extend(c for c in layout['columns'] if c not in columns)
+    return columns
+
+
+def table_objects(scan: Dict, table_name: str, on_drift: str = 'union') -> List[Tuple[str, str]]:
+    """(kind, name) of every Trino object created for a table, in creation order."""
+    layouts = scan.get('layouts') or []
+    if scan.get('compaction'):
+        objects = [('TABLE', table_name)]
+        if has_typed_view(compacted_typed_columns(scan)):
+            objects.append(('VIEW', f"{table_name}_typed"))
+        return objects
+    if len(layouts) <= 1:
+        objects = [('TABLE', table_name)]
+        if has_typed_view(scan['typed_columns']):
+            objects.append(('VIEW', f"{table_name}_typed"))
+        return objects
+
+    objects = [('TABLE', f"{table_name}__layout{i}") for i in range(len(layouts))]
+    if on_drift == 'split':
+        objects.append(('VIEW', table_name))
+        objects.extend(('VIEW', f"{table_name}_layout{i}") for i in range(1, len(layouts)))
+        typed_columns = scan['typed_columns']
+    else:
+        objects.append(('VIEW', table_name))
+        typed_columns = union_typed_columns(scan, union_columns(layouts))
+    if has_typed_view(typed_columns):
+        objects.append(('VIEW', f"{table_name}_typed"))
+    return objects
+
+
+def drop_objects_sql(objects: List[Tuple[str, str]]) -> List[str]:
+    return [f"DROP {kind} IF EXISTS {name};" for kind, name in reversed(objects)]
+
+
+def layout_select_sql(layout_table: str, layout: Dict, columns: List[str], s3_location: str,
+                      object_suffix: str = '') -> str:
+    """Select from one layout table restricted to that layout's files via "$path"."""
+    paths = ", ".join(f"'{s3_location}{p.name}{object_suffix}'" for p in layout['files'])
+    col_exprs = ",\n    ".join(
+        c if c in layout['columns'] else f"CAST(NULL AS VARCHAR) AS {c}"
+        for c in columns
+    )
+    return f"""SELECT
+    {col_exprs}
+FROM {layout_table}
+WHERE "$path" IN ({paths})"""
+
+
+def table_sql(
+    scan: Dict,
+    schema_name: str,
+    table_name: str,
+    s3_path: str,
+    replace: Optional[List[Tuple[str, str]]] = None,
+    on_drift: str = 'union',
+    compression: str = 'none',
+) -> List[str]:
+    """SQL lines for one table and its typed view.
+    replace lists objects from a previous definition to drop first (external data is kept).
+    Tables whose files drifted get one table per header layout, exposed through
+    views filtered on "$path" (one unified view, or one view per layout for 'split').
+    """
+    columns = scan['columns']
+    layouts = scan.get('layouts') or []
+    suffix = RAW_COMPRESSION_SUFFIXES[compression]
+    lines = []
+    if replace:
+        lines.extend(drop_objects_sql(replace))
+    compaction = scan.get('compaction')
+    if compaction:
+        location = compacted_location(s3_path)
+        lines.append(f"-- Table: {table_name} (compacted: {compaction['parts']} parts from {compaction['files']} files)")
+        lines.append(f"-- Source: {location} (source file in {compaction['source_column']})")
+        lines.append(f"-- Columns: {', '.join(compaction['columns'][:5])}{'...' if len(compaction['columns']) > 5 else ''}")
+        if compaction['format'] == 'parquet':
+            lines.append(generate_parquet_create_table(table_name, compaction['columns'], location))
+        else:
+            lines.append(generate_create_table(
+                schema_name, table_name, compaction['columns'], location, compaction['separator'],
+            ))
+        lines.append("")
+        typed_columns = compacted_typed_columns(scan)
+        if has_typed_view(typed_columns):
+            lines.append(f"-- Typed view: {table_name}_typed")
+            lines.append(generate_typed_view(table_name, typed_columns))
+            lines.append("")
+        return lines
+    if len(layouts) <= 1:
+        lines.append(f"-- Table: {table_name}")
+        lines.append(f"-- Source: {scan['file']}")
+        if suffix:
+            lines.append(f"-- Objects: *{suffix} ({compression}, decompressed by Trino)")
+        lines.append(f"-- Columns: {', '.join(columns[:5])}{'...' if len(columns) > 5 else ''}")
+        lines.append(generate_create_table(
+            schema_name,
+            table_name,
+            columns,
+            s3_path,
+            scan['separator'],
+        ))
+        lines.append("")
+
+        typed_columns = scan['typed_columns']
+        if has_typed_view(typed_columns):
+            lines.append(f"-- Typed view: {table_name}_typed")
+            lines.append(generate_typed_view(table_name, typed_columns))
+            lines.append("")
+        return lines
+
+    lines.append(f"-- Table: {table_name} ({len(layouts)} header layouts, mode={on_drift})")
+    if suffix:
+        lines.append(f"-- Objects: *{suffix} ({compression}, decompressed by Trino)")
+    for message in scan.get('drift') or []:
+        lines.append(f"-- Drift: {message}")
+    for i, layout in enumerate(layouts):
+        layout_table = f"{table_name}__layout{i}"
+        lines.append(f"-- Layout {i}: {', '.join(p.name for p in layout['files'])}")
+        lines.append(generate_create_table(
+            schema_name,
+            layout_table,
+            layout['columns'],
+            s3_path,
+            layout['separator'],
+        ))
+        lines.append("")
+
+    if on_drift == 'split':
+        for i, layout in enumerate(layouts):
+            view_name = table_name if i == 0 else f"{table_name}_layout{i}"
+            lines.append(f"CREATE OR REPLACE VIEW {view_name} AS")
+            lines.append(layout_select_sql(f"{table_name}__layout{i}", layout, layout['columns'], s3_path, suffix) + ";")
+            lines.append("")
+        typed_columns = scan['typed_columns']
+    else:
+        all_columns = union_columns(layouts)
+        selects = [
+            layout_select_sql(f"{table_name}__layout{i}", layout, all_columns, s3_path, suffix)
+            for i, layout in enumerate(layouts)
+        ]
+        lines.append(f"CREATE OR REPLACE VIEW {table_name} AS")
+        lines.append("\nUNION ALL\n".join(selects) + ";")
+        lines.append("")
+        typed_columns = union_typed_columns(scan, all_columns)
+
+    if has_typed_view(typed_columns):
+        lines.append(f"-- Typed view: {table_name}_typed")
+        lines.append(generate_typed_view(table_name, typed_columns))
+        lines.append("")
+    return lines
+
+
+def generate_sql(
+    head_rows: int = DEFAULT_HEAD_ROWS,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    max_scan_rows: int = 0,
+    infer_types: bool = True,
+    jobs: int = 1,
+    incremental: bool = True,
+    on_drift: str = 'union',
+    profile: bool = False,
+    compression: Optional[str] = None,
+    s3: bool = False,
+    s3_range_bytes: int = DEFAULT_S3_RANGE_BYTES,
+):
     # Load env (S3 bucket name etc.)
     load_env()
     s3_bucket = os.environ.get('S3_RAW_BUCKET', 'raw')
+    compression = compression or os.environ.get('S3_RAW_COMPRESSION', 'none')
+    if compression not in RAW_COMPRESSION_SUFFIXES:
+        print(f"❌ Unknown S3_RAW_COMPRESSION '{compression}' (expected one of {', '.join(RAW_COMPRESSION_SUFFIXES)})")
+        sys.exit(1)
+    if s3 and profile:
+        print("❌ --profile reads every row and is not available with --s3 (only object prefixes are fetched)")
+        sys.exit(1)
+
+    s3_fingerprints: Dict[str, Dict] = {}
+    scan_source = {}
+    client = None
+    if s3:
+        print(f"🔍 Listing s3://{s3_bucket}/ ...")
+        jobs = max(jobs, S3_JOBS)
+        client = s3_client(jobs)
+        schemas_files, s3_fingerprints = collect_s3_objects(client, s3_bucket, compression, jobs)
+        scan_source = {
+            'threads': True,
+            'open_text': partial(open_s3_object, client=client, bucket=s3_bucket,
+                                 compression=compression, range_bytes=s3_range_bytes),
+        }
+    else:
+        print("🔍 Scanning CSV files...")
+        schemas_files = collect_csv_files(RAW_DIR)
+
+    # Group files per table; the first file (sorted) describes the table
+    table_files: Dict[str, List[Path]] = {}
+    table_names: Dict[str, Tuple[str, str]] = {}
+    for schema in sorted(schemas_files.keys()):
+        for csv_file in sorted(schemas_files[schema]):
+            schema_name, table_name = path_to_schema_table(csv_file, RAW_DIR)
+            table_key = f"{schema_name}.{table_name}"
+            table_files.setdefault(table_key, []).append(csv_file)
+            table_names[table_key] = (schema_name, table_name)
 
-    print("🔍 Scanning CSV files...")
-    schemas_files = collect_csv_files(RAW_DIR)
+    options = {
+        'head_rows': head_rows,
+        'sample_rows': sample_rows,
+        'max_scan_rows': max_scan_rows,
+        'infer_types': infer_types,
+        's3_bucket': s3_bucket,
+        'on_drift': on_drift,
+        'compression': compression,
+    }
+    if s3:
+        # Samples come from the object prefixes only, so they differ from a local scan
+        options['source'] = 's3'
+        options['s3_range_bytes'] = s3_range_bytes
+    if incremental:
+        previous = load_manifest(MANIFEST_PATH, options)
+    else:
+        previous = {'options': options, 'files': {}, 'tables': {}}
 
-    sql_output = []
-    sql_output.append("-- " + "=" * 60)
-    sql_output.append("-- AUTO-GENERATED TRINO SCHEMAS FOR RAW DATA")
-    sql_output.append("-- Generated from CSV files in raw/ directory")
-    sql_output.append("-- " + "=" * 60)
-    sql_output.append("")
+    fingerprints = {
+        str(csv_file): s3_fingerprints[str(csv_file)] if s3 else file_fingerprint(csv_file)
+        for files in table_files.values() for csv_file in files
+    }
+    # Multi-file tables with a current compacted copy are defined over the copy
+    compactions = {
+        table_key: load_compaction(files, fingerprints, client, s3_bucket)
+        for table_key, files in table_files.items() if len(files) > 1
+    }
 
-    processed_tables = set()
+    changed_tables = []
+    for table_key, files in table_files.items():
+        changed = previous['tables'].get(table_key, {}).get('files') != [str(p) for p in files]
+        if previous['tables'].get(table_key, {}).get('compaction') != compactions.get(table_key):
+            changed = True
+        # Profiles are kept in the manifest; --profile only reads the tables without one
+        if profile and not previous['tables'].get(table_key, {}).get('profile'):
+            changed = True
+        for csv_file in files:
+            if previous['files'].get(str(csv_file)) != fingerprints[str(csv_file)]:
+                changed = True
+        if changed:
+            changed_tables.append(table_key)
+    removed_tables = sorted(set(previous['tables']) - set(table_files))
+
+    if (incremental and not changed_tables and not removed_tables and SQL_OUTPUT.exists()
+            and not (profile and not PROFILE_OUTPUT.exists())):
+        print(f"  No changes since last run ({len(table_files)} tables unchanged)")
+        if pending_delta_sql():
+            print(f"🧩 Delta SQL: {DELTA_OUTPUT} still has changes to apply (make create-trino-schemas-delta)")
+        return
+
+    # Primary files are sampled; every other file of a table only has its
+    # header read, batched into the same worker pool
+    scan_targets = [f for k in changed_tables for f in table_files[k]]
+    if jobs > 1 and len(scan_targets) > 1:
+        print(f"  Using {jobs} {'threads' if s3 else 'worker processes'}")
+    file_scans = iter(scan_csv_files(
+        scan_targets,
+        jobs=jobs,
+        header_only=[i > 0 for k in changed_tables for i in range(len(table_files[k]))],
+        head_rows=head_rows,
+        sample_rows=sample_rows,
+        max_scan_rows=max_scan_rows,
+        infer_types=infer_types,
+        profile=profile,
+        **scan_source,
+    ))
+    scans = {k: scan_from_manifest(v) for k, v in previous['tables'].items() if k in table_files}
+    drifted = []
+    for table_key in changed_tables:
+        table_scans = [next(file_scans) for _ in table_files[table_key]]
+        scan = table_scans[0]
+        scan['layouts'], scan['drift'] = reconcile_headers(table_scans)
+        scan['compaction'] = compactions.get(table_key)
+        for other in table_scans[1:]:
+            if other['error'] is not None:
+                scan['log'].append(f"    ⚠️  {other['file']}: {other['error']}")
+        # A compacted copy already has the union of the layouts' columns
+        if scan['drift'] and not scan['compaction']:
+            drifted.append(table_key)
+        if profile and scan['error'] is None:
+            scan['profile'] = merge_profiles(scan, table_scans)
+        for other in table_scans:
+            other['profiler'] = None
+        scans[table_key] = scan
+
+    for table_key in drifted:
+        print(f"  ⚠️  Header drift in {table_key} ({len(table_files[table_key])} files):")
+        for message in scans[table_key]['drift']:
+            print(f"      {message}")
+    if drifted and on_drift == 'fail':
+        print(f"\n❌ Header drift in {len(drifted)} table(s); fix the files or rerun with --on-drift union|split")
+        sys.exit(1)
+
+    sql_output = sql_file_header("AUTO-GENERATED TRINO SCHEMAS FOR RAW DATA")
 
     for schema in sorted(schemas_files.keys()):
-        sql_output.append(f"-- Schema: {schema}")
-        sql_output.append(f"CREATE SCHEMA IF NOT EXISTS hive.{schema};")
-        sql_output.append(f"USE hive.{schema};")
-        sql_output.append("")
+        sql_output.extend(schema_header_sql(schema))
 
-        files = schemas_files[schema]
-        for csv_file in sorted(files):
-            schema_name, table_name = path_to_schema_table(csv_file, RAW_DIR)
-            table_key = f"{schema_name}.{table_name}"
-            if table_key in processed_tables:
+        for table_key, (schema_name, table_name) in table_names.items():
+            if schema_name != schema:
                 continue
-            processed_tables.add(table_key)
+            scan = scans[table_key]
+            csv_file = scan['file']
 
             print(f"  Processing: {csv_file}")
-            separator, strip_spaces = detect_separator(csv_file)
-            print(f"    Separator: {repr(separator)}, strip_spaces={strip_spaces}")
-
-            try:
-                columns = get_csv_columns(csv_file, separator, strip_spaces)
-                print(f"    Columns: {len(columns)}")
-            except Exception as e:
-                print(f"    ⚠️  Error reading columns: {e}")
+            for line in scan['log']:
+                print(line)
+            if scan['error'] is not None:
                 continue
 
             s3_path = get_s3_path(csv_file, RAW_DIR, s3_bucket)
             print(f"    S3: {s3_path}")
-
-            create_table_sql = generate_create_table(
-                schema_name,
-                table_name,
-                columns,
-                s3_path,
-                separator,
-            )
-
-            sql_output.append(f"-- Table: {table_name}")
-            sql_output.append(f"-- Source: {csv_file}")
-            sql_output.append(f"-- Columns: {', '.join(columns[:5])}{'...' if len(columns) > 5 else ''}")
-            sql_output.append(create_table_sql)
-            sql_output.append("")
+            sql_output.extend(table_sql(
+                scan, schema_name, table_name, s3_path, on_drift=on_drift, compression=compression,
+            ))
 
         sql_output.append("")
 
@@ -244,10 +1381,228 @@ def generate_sql():
     with SQL_OUTPUT.open('w') as f:
         f.write('\n'.join(sql_output))
 
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'options': options,
+        'files': fingerprints,
+        'tables': {
+            k: scan_to_manifest(scans[k], table_files[k])
+            for k in table_files
+            if scans[k]['error'] is None
+        },
+    }
+    # Tables that failed to scan are retried on the next run
+    for table_key in table_files:
+        if scans[table_key]['error'] is not None:
+            for csv_file in table_files[table_key]:
+                manifest['files'].pop(str(csv_file), None)
+    save_manifest(MANIFEST_PATH, manifest)
+
+    if profile:
+        write_profile(scans, table_names, on_drift)
+
+    write_delta_sql(
+        [k for k in changed_tables if scans[k]['error'] is None],
+        removed_tables,
+        scans,
+        {**{k: tuple(k.split('.', 1)) for k in removed_tables}, **table_names},
+        s3_bucket,
+        previous['tables'],
+        on_drift,
+        previous['options'].get('on_drift', 'union'),
+        compression,
+    )
+
     print(f"\n✅ Generated SQL schema: {SQL_OUTPUT}")
     print(f"📊 Total schemas: {len(schemas_files)}")
-    print(f"📋 Total tables: {len(processed_tables)}")
+    print(f"📋 Total tables: {len(table_files)} ({len(changed_tables)} changed, {len(removed_tables)} removed)")
+
+
+def merge_profiles(scan: Dict, table_scans: List[Dict]) -> Optional[Dict]:
+    """Combine the per-file profilers of one table into its JSON profile."""
+    profilers = [t['profiler'] for t in table_scans if t.get('profiler') is not None]
+    if not profilers:
+        return None
+    merged = profilers[0]
+    for other in profilers[1:]:
+        merged.merge(other)
+    layouts = scan.get('layouts') or []
+    if len(layouts) > 1:
+        typed_columns = union_typed_columns(scan, union_columns(layouts))
+    else:
+        typed_columns = scan['typed_columns']
+    return merged.result(typed_columns)
+
+
+def analyze_sql(scan: Dict, schema_name: str, table_name: str, on_drift: str = 'union') -> List[str]:
+    """Statistics refresh for the tables behind one raw table.
+    Stale stats are dropped first; columns the profile shows to be free text
+    are left out of ANALYZE since the optimizer gains little from them.
+    The <table>__layoutN tables of a drifted table all share its location and
+    only differ by a "$path" filter in the view, so ANALYZE would count every
+    file for each of them; they are left without statistics.
+    """
+    profiled = scan['profile']['columns']
+    lines = []
+    for kind, name in table_objects(scan, table_name, on_drift):
+        if kind != 'TABLE':
+            continue
+        if name != table_name:
+            lines.append(f"-- {name}: header drift, no statistics (its location holds every layout's files)")
+            continue
+        columns = scan['columns']
+        selected = [
+            c for c in columns
+            if c in profiled and profiled[c]['avg_length'] <= ANALYZE_MAX_AVG_LENGTH
+        ]
+        lines.append(f"CALL system.drop_stats(schema_name => '{schema_name}', table_name => '{name}');")
+        if selected and len(selected) < len(columns):
+            keys = ", ".join(f"'{c}'" for c in selected)
+            lines.append(f"ANALYZE {name} WITH (columns = ARRAY[{keys}]);")
+        else:
+            lines.append(f"ANALYZE {name};")
+    return lines
+
+
+def write_profile(scans: Dict[str, Dict], table_names: Dict[str, Tuple[str, str]], on_drift: str = 'union'):
+    """Write the JSON column profile and matching ANALYZE statements."""
+    profiled = {
+        k: scans[k] for k in sorted(table_names)
+        if scans[k]['error'] is None and scans[k].get('profile')
+    }
+    PROFILE_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with PROFILE_OUTPUT.open('w') as f:
+        json.dump({k: scan['profile'] for k, scan in profiled.items()}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    sql_output = sql_file_header("TABLE STATISTICS FOR RAW DATA")
+    current_schema = None
+    for table_key, scan in profiled.items():
+        schema_name, table_name = table_names[table_key]
+        if schema_name != current_schema:
+            if current_schema is not None:
+                sql_output.append("")
+            sql_output.append(f"-- Schema: {schema_name}")
+            sql_output.append(f"USE hive.{schema_name};")
+            sql_output.append("")
+            current_schema = schema_name
+        sql_output.append(f"-- Table: {table_name} ({scan['profile']['rows']} rows profiled)")
+        sql_output.extend(analyze_sql(scan, schema_name, table_name, on_drift))
+        sql_output.append("")
+
+    with ANALYZE_OUTPUT.open('w') as f:
+        f.write('\n'.join(sql_output))
+    print(f"📈 Column profile: {PROFILE_OUTPUT}, statistics SQL: {ANALYZE_OUTPUT}")
+    drifted = [k for k, scan in profiled.items() if not scan.get('compaction') and len(scan.get('layouts') or []) > 1]
+    if drifted:
+        print(f"   ℹ️  {len(drifted)} tables with header drift get no statistics: {', '.join(drifted)}")
+
+
+def write_delta_sql(
+    changed_tables: List[str],
+    removed_tables: List[str],
+    scans: Dict[str, Dict],
+    table_names: Dict[str, Tuple[str, str]],
+    s3_bucket: str,
+    previous_tables: Dict,
+    on_drift: str = 'union',
+    previous_on_drift: str = 'union',
+    compression: str = 'none',
+):
+    """Write only new, altered and removed tables to DELTA_OUTPUT.
+    Altered tables are dropped and recreated; they are external, so data stays in S3.
+    Statements of earlier runs that were not applied yet (create_trino_schemas.sh --delta
+    removes the file once it ran) are kept, and this run's are appended after them:
+    each run's drops refer to the objects the previous run defined.
+    """
+    if not changed_tables and not removed_tables:
+        return
+    pending = pending_delta_sql()
+    sql_output = pending.rstrip('\n').split('\n') + [""] if pending else \
+        sql_file_header("INCREMENTAL TRINO SCHEMA CHANGES FOR RAW DATA")
+    by_schema: Dict[str, List[str]] = {}
+    for table_key in sorted(changed_tables + removed_tables):
+        by_schema.setdefault(table_names[table_key][0], []).append(table_key)
+
+    for schema in sorted(by_schema):
+        sql_output.extend(schema_header_sql(schema))
+        for table_key in by_schema[schema]:
+            schema_name, table_name = table_names[table_key]
+            previous_objects = None
+            if table_key in previous_tables:
+                previous_objects = table_objects(
+                    scan_from_manifest(previous_tables[table_key]), table_name, previous_on_drift
+                )
+            if table_key in removed_tables:
+                sql_output.append(f"-- Removed: {table_name}")
+                sql_output.extend(drop_objects_sql(previous_objects))
+                sql_output.append("")
+                continue
+            scan = scans[table_key]
+            s3_path = get_s3_path(scan['file'], RAW_DIR, s3_bucket)
+            sql_output.extend(table_sql(
+                scan, schema_name, table_name, s3_path,
+                replace=previous_objects,
+                on_drift=on_drift,
+                compression=compression,
+            ))
+        sql_output.append("")
+
+    DELTA_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with DELTA_OUTPUT.open('w') as f:
+        f.write('\n'.join(sql_output))
+    print(f"🧩 Delta SQL: {DELTA_OUTPUT} ({len(changed_tables)} changed, {len(removed_tables)} removed"
+          f"{', after the changes not applied yet' if pending else ''})")
+
+
+def pending_delta_sql() -> str:
+    """Contents of DELTA_OUTPUT if it still holds statements, else ''."""
+    try:
+        text = DELTA_OUTPUT.read_text()
+    except FileNotFoundError:
+        return ''
+    return text if DELTA_STATEMENT_RE.search(text) else ''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Trino schemas from raw CSV files")
+    parser.add_argument('--head-rows', type=int, default=DEFAULT_HEAD_ROWS,
+                        help="rows always sampled from the start of each file")
+    parser.add_argument('--sample-rows', type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="reservoir sample size for the rest of each file")
+    parser.add_argument('--max-scan-rows', type=int, default=0,
+                        help="stop sampling after this many rows (0 = whole file)")
+    parser.add_argument('--no-infer-types', action='store_true',
+                        help="skip type inference and typed views")
+    parser.add_argument('--jobs', '-j', type=int, default=int(os.environ.get('SCHEMA_SCAN_JOBS', '1')),
+                        help="number of worker processes scanning files in parallel")
+    parser.add_argument('--on-drift', choices=('union', 'split', 'fail'), default='union',
+                        help="how to handle files of one table with different headers")
+    parser.add_argument('--profile', action='store_true',
+                        help="compute column statistics over every scanned row and emit ANALYZE SQL")
+    parser.add_argument('--compression', choices=tuple(RAW_COMPRESSION_SUFFIXES), default=None,
+                        help="codec raw CSVs were uploaded with (default: S3_RAW_COMPRESSION or none)")
+    parser.add_argument('--full', action='store_true',
+                        help="ignore the manifest and rescan every file")
+    parser.add_argument('--s3', action='store_true',
+                        help="discover the CSVs in the S3_RAW_BUCKET bucket instead of the local raw/ directory")
+    parser.add_argument('--s3-range-bytes', type=int, default=DEFAULT_S3_RANGE_BYTES,
+                        help="bytes fetched from the start of each object with --s3 (header and type sample)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    generate_sql()
+    args = parse_args()
+    generate_sql(
+        head_rows=args.head_rows,
+        sample_rows=args.sample_rows,
+        max_scan_rows=args.max_scan_rows,
+        infer_types=not args.no_infer_types,
+        jobs=args.jobs,
+        incremental=not args.full,
+        on_drift=args.on_drift,
+        profile=args.profile,
+        compression=args.compression,
+        s3=args.s3,
+        s3_range_bytes=args.s3_range_bytes,
+    )
@@ -0,0 +1,164 @@
+"""
+Readiness probes for the stack, instead of fixed sleeps.
+
+Each target is probed on its real protocol endpoint: Trino until GET /v1/info
+reports starting=false, Superset until /health answers 200, MinIO until
+/minio/health/live answers 200 and the Hive metastore until its thrift port
+replies to a call. Targets are probed concurrently with jittered exponential
+backoff; every probe has its own timeout and every target a hard deadline.
+
+Standalone (stdlib only) so the Superset container can use it as well:
+    python3 scripts/readiness.py trino metastore --timeout 120
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import struct
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+DEFAULT_TIMEOUT = 120.0
+PROBE_TIMEOUT = 3.0
+BACKOFF_INITIAL = 0.25
+BACKOFF_MAX = 5.0
+
+# TBinaryProtocol strict header: version 1 | message type
+THRIFT_VERSION_1 = 0x80010000
+THRIFT_CALL = 1
+
+
+class Target(NamedTuple):
+    name: str
+    kind: str  # 'trino', 'http', 'thrift'
+    address: str  # URL for trino/http, host:port for thrift
+
+
+def probe_trino(url: str, timeout: float = PROBE_TIMEOUT) -> Tuple[bool, str]:
+    """Trino accepts queries once /v1/info stops reporting starting=true."""
+    with urllib.request.urlopen(f"{url.rstrip('/')}/v1/info", timeout=timeout) as resp:
+        info = json.load(resp)
+    if info.get('starting', True):
+        return False, "starting"
+    return True, f"version {info.get('nodeVersion', {}).get('version', '?')}"
+
+
+def probe_http(url: str, timeout: float = PROBE_TIMEOUT) -> Tuple[bool, str]:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.status == 200, f"HTTP {resp.status}"
+
+
+def probe_thrift(address: str, timeout: float = PROBE_TIMEOUT) -> Tuple[bool, str]:
+    """Call get_all_databases and check a thrift reply (or exception) comes back.
+    An open port alone only means the JVM bound it, not that the handler serves.
+    """
+    host, port = address.rsplit(':', 1)
+    name = b'get_all_databases'
+    message = (
+        struct.pack('>Ii', THRIFT_VERSION_1 | THRIFT_CALL, len(name)) + name
+        + struct.pack('>i', 1)  # seqid
+        + b'\x00'  # empty args struct
+    )
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        sock.sendall(message)
+        header = sock.recv(4)
+    if len(header) < 4:
+        return False, "connection closed"
+    version = struct.unpack('>I', header)[0] & 0xffff0000
+    if version != THRIFT_VERSION_1:
+        return False, f"unexpected reply {header.hex()}"
+    return True, "thrift reply"
+
+
+PROBES: Dict[str, Callable[[str, float], Tuple[bool, str]]] = {
+    'trino': probe_trino,
+    'http': probe_http,
+    'thrift': probe_thrift,
+}
+
+
+def wait_for(target: Target, timeout: float = DEFAULT_TIMEOUT,
+             log: Callable[[str], None] = print) -> Tuple[bool, float, str]:
+    """Probe one target until it is ready or the deadline passes.
+    Returns (ready, seconds waited, last probe detail).
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    probe = PROBES[target.kind]
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = deadline - time.monotonic()
+        try:
+            ready, detail = probe(target.address, min(PROBE_TIMEOUT, max(remaining, 0.1)))
+        except (OSError, ValueError) as e:
+            ready, detail = False, f"{type(e).__name__}: {e}"
+        if ready:
+            return True, time.monotonic() - started, detail
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, time.monotonic() - started, detail
+        # full jitter: concurrent waiters do not probe in lockstep
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** attempt))
+        if attempt == 1 or attempt % 5 == 0:
+            log(f"  … waiting for {target.name} ({detail})")
+        time.sleep(min(delay, remaining))
+
+
+def wait_until_ready(targets: List[Target], timeout: float = DEFAULT_TIMEOUT,
+                     log: Callable[[str], None] = print) -> bool:
+    """Probe all targets concurrently. Returns True when every one became ready."""
+    if not targets:
+        return True
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        results = list(pool.map(lambda t: wait_for(t, timeout, log), targets))
+    for target, (ready, seconds, detail) in zip(targets, results):
+        if ready:
+            log(f"✓ {target.name} ready after {seconds:.1f}s ({detail})")
+        else:
+            log(f"✗ {target.name} not ready after {seconds:.1f}s ({detail})")
+    return all(ready for ready, _, _ in results)
+
+
+def default_targets() -> Dict[str, Target]:
+    """Targets as seen from the host running the scripts (compose.local port mappings)."""
+    s3_url = os.environ.get('S3_ENDPOINT_URL') or (
+        f"{os.environ.get('S3_PROTOCOL', 'http')}://{os.environ.get('S3_EXTERNAL_HOST', 'localhost')}"
+        f":{os.environ.get('S3_PORT', '9000')}"
+    )
+    metastore = (
+        f"{os.environ.get('HIVE_METASTORE_EXTERNAL_HOST', 'localhost')}"
+        f":{os.environ.get('HIVE_METASTORE_PORT', '9083')}"
+    )
+    return {
+        'trino': Target('trino', 'trino', os.environ.get('TRINO_URL', 'http://localhost:8088')),
+        'superset': Target('superset', 'http', f"{os.environ.get('SUPERSET_URL', 'http://localhost:8089').rstrip('/')}/health"),
+        's3': Target('s3', 'http', f"{s3_url.rstrip('/')}/minio/health/live"),
+        'metastore': Target('metastore', 'thrift', metastore),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Wait until stack services are ready")
+    parser.add_argument('targets', nargs='+', choices=sorted(default_targets()),
+                        help="services to wait for (probed concurrently)")
+    parser.add_argument('--timeout', type=float, default=float(os.environ.get('READINESS_TIMEOUT', DEFAULT_TIMEOUT)),
+                        help="hard deadline per service in seconds")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    try:
+        from generate_trino_schemas import load_env
+        load_env()
+    except ImportError:
+        pass
+    args = parse_args()
+    targets = default_targets()
+    print(f"⏳ Waiting for {', '.join(args.targets)} (deadline {args.timeout:.0f}s)")
+    sys.exit(0 if wait_until_ready([targets[name] for name in args.targets], args.timeout) else 1)
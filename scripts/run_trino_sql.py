@@ -0,0 +1,499 @@
+"""
+Execute Trino SQL files over the HTTP statement protocol (no CLI / JVM start-up).
+Statements are grouped by the schema they run in (CREATE SCHEMA / USE blocks);
+groups run concurrently on a shared keep-alive connection pool while statements
+within a group keep file order. Every statement is timed.
+
+Retries never run a statement twice unless that is harmless: a dropped connection
+while following nextUri re-fetches the same URI (the protocol allows it), and only
+idempotent statements (CREATE / DROP / ANALYZE, read-only queries) are submitted
+again after a transient failure. An INSERT or DELETE whose submission may have
+reached the coordinator fails instead of being duplicated.
+
+Reads TRINO_URL / TRINO_USER from the environment or .env (no external deps).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Tuple, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from generate_trino_schemas import load_env
+
+DEFAULT_TRINO_URL = "http://localhost:8088"
+DEFAULT_TRINO_USER = "admin"
+CLIENT_SOURCE = "spark-cluster-ddl"
+
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+HTTP_TIMEOUT_SECONDS = 300
+
+# Trino asks clients to retry the same request on these statuses
+RETRY_HTTP_STATUSES = {429, 502, 503, 504}
+# Query failures worth running the statement again for
+TRANSIENT_ERROR_TYPES = {'INSUFFICIENT_RESOURCES'}
+TRANSIENT_ERROR_NAMES = {
+    'SERVER_STARTING_UP',
+    'SERVER_SHUTTING_DOWN',
+    'HIVE_METASTORE_ERROR',
+    'ABANDONED_QUERY',
+    'REMOTE_TASK_ERROR',
+    'TOO_MANY_REQUESTS_FAILED',
+    'PAGE_TRANSPORT_TIMEOUT',
+}
+
+# Statements that can be submitted again after a failure without changing the result
+RESUBMIT_RE = re.compile(
+    r'^(CREATE|DROP|ANALYZE|SELECT|WITH|SHOW|DESCRIBE|EXPLAIN|CALL\s+system\.(drop_stats|sync_partition_metadata))\b',
+    re.IGNORECASE,
+)
+
+USE_RE = re.compile(r'^USE\s+(?:([\w"]+)\.)?([\w"]+)$', re.IGNORECASE)
+CREATE_SCHEMA_RE = re.compile(
+    r'^CREATE\s+SCHEMA\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:([\w"]+)\.)?([\w"]+)', re.IGNORECASE
+)
+
+
+class Statement(NamedTuple):
+    sql: str
+    catalog: Optional[str]
+    schema: Optional[str]
+    line: int
+
+
+class TrinoError(Exception):
+    """Statement failure; transient errors are retried."""
+
+    def __init__(self, message: str, transient: bool = False, error_name: str = ''):
+        super().__init__(message)
+        self.transient = transient
+        self.error_name = error_name
+
+
+class ConnectionLost(TrinoError):
+    """The connection failed or returned garbage. submitted=False when the statement
+    never left the client (connection refused), so submitting it again is safe.
+    """
+
+    def __init__(self, message: str, submitted: bool = True):
+        super().__init__(message, transient=True)
+        self.submitted = submitted
+
+
+def split_statements(text: str) -> List[Tuple[str, int]]:
+    """Split SQL text on semicolons outside quotes and comments.
+    Returns (statement, starting line) pairs with comment-only chunks dropped.
+    """
+    statements = []
+    buf: List[str] = []
+    has_code = False
+    start_line = line = 1
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '-' and text.startswith('--', i):
+            end = text.find('\n', i)
+            end = n if end == -1 else end
+            buf.append(text[i:end])
+            i = end
+            continue
+        if ch == '/' and text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            line += text.count('\n', i, end)
+            buf.append(text[i:end])
+            i = end
+            continue
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if text[end] == ch:
+                    # doubled quote is an escaped quote
+                    if end + 1 < n and text[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            end = min(end + 1, n)
+            line += text.count('\n', i, end)
+            if not has_code:
+                start_line = line
+            has_code = True
+            buf.append(text[i:end])
+            i = end
+            continue
+        if ch == ';':
+            if has_code:
+                statements.append((strip_comments(''.join(buf)), start_line))
+            buf, has_code = [], False
+            i += 1
+            continue
+        if ch == '\n':
+            line += 1
+        elif not ch.isspace() and not has_code:
+            start_line = line
+            has_code = True
+        buf.append(ch)
+        i += 1
+    if has_code:
+        statements.append((strip_comments(''.join(buf)), start_line))
+    return statements
+
+
+def strip_comments(sql: str) -> str:
+    """Drop the blank and comment lines before the first line of code, so the statement
+    starts with its keyword (banners are followed by a blank line, then "-- Schema: ...").
+    """
+    lines = sql.strip().splitlines()
+    while lines and (not lines[0].strip() or lines[0].lstrip().startswith('--')):
+        lines.pop(0)
+    return '\n'.join(lines).strip()
+
+
+def unquote_identifier(name: Optional[str]) -> Optional[str]:
+    if name is None:
+        return None
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name.lower()
+
+
+def group_statements(text: str, catalog: Optional[str] = None,
+                     schema: Optional[str] = None) -> Dict[str, List[Statement]]:
+    """Group statements by the schema they belong to, in file order.
+    USE is applied client-side as session catalog/schema. Statements before the
+    first CREATE SCHEMA / USE end up in the '' group, which runs first.
+    """
+    groups: Dict[str, List[Statement]] = {}
+    key = ''
+    for sql, line in split_statements(text):
+        use = USE_RE.match(sql)
+        if use:
+            catalog = unquote_identifier(use.group(1)) or catalog
+            schema = unquote_identifier(use.group(2))
+            key = f"{catalog}.{schema}"
+            continue
+        create = CREATE_SCHEMA_RE.match(sql)
+        if create:
+            # a new schema block must not inherit the previous block's session schema
+            catalog = unquote_identifier(create.group(1)) or catalog
+            schema = None
+            key = f"{catalog}.{unquote_identifier(create.group(2))}"
+        groups.setdefault(key, []).append(Statement(sql, catalog, schema, line))
+    return groups
+
+
+def statement_label(sql: str, width: int = 72) -> str:
+    first = ' '.join(sql.split())
+    return first if len(first) <= width else first[:width - 3] + '...'
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to the coordinator, shared between workers."""
+
+    def __init__(self, url: str, size: int, timeout: float = HTTP_TIMEOUT_SECONDS):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if self.scheme == 'https' else 80)
+        self.timeout = timeout
+        self.idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def connect(self) -> http.client.HTTPConnection:
+        """A new connection, for a caller that already holds a slot."""
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        with self.lock:
+            self.opened += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self) -> http.client.HTTPConnection:
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, conn: http.client.HTTPConnection, broken: bool = False):
+        if broken:
+            conn.close()
+        else:
+            self.idle.put(conn)
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class TrinoClient:
+    """Minimal client for POST /v1/statement and its nextUri chain."""
+
+    def __init__(self, pool: ConnectionPool, user: str, retries: int = DEFAULT_RETRIES,
+                 backoff: float = RETRY_BACKOFF_SECONDS):
+        self.pool = pool
+        self.user = user
+        self.retries = retries
+        self.backoff = backoff
+
+    def _request(self, conn: http.client.HTTPConnection, method: str, path: str,
+                 body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None) -> Dict:
+        """One protocol request; retries statuses Trino marks as retryable."""
+        for attempt in range(self.retries + 1):
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            payload = resp.read()
+            if resp.status == 200:
+                return json.loads(payload)
+            if resp.status in RETRY_HTTP_STATUSES and attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            raise TrinoError(
+                f"HTTP {resp.status} from {method} {path}: {payload[:200].decode('utf-8', 'replace')}",
+                transient=resp.status in RETRY_HTTP_STATUSES,
+            )
+        raise AssertionError("unreachable")
+
+    def _follow(self, conns: List[http.client.HTTPConnection], path: str) -> Dict:
+        """GET a nextUri on conns[0]. A dropped connection is replaced in conns and the
+        same URI fetched again, which Trino allows; the statement is not submitted again.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return self._request(conns[0], 'GET', path, headers={'X-Trino-User': self.user})
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                conns[0].close()
+                if attempt >= self.retries:
+                    raise ConnectionLost(f"{type(e).__name__} fetching {path}: {e}") from e
+                time.sleep(self.backoff * 2 ** attempt)
+                conns[0] = self.pool.connect()
+        raise AssertionError("unreachable")
+
+    def _run(self, stmt: Statement) -> Dict:
+        headers = {
+            'X-Trino-User': self.user,
+            'X-Trino-Source': CLIENT_SOURCE,
+            'Content-Type': 'text/plain; charset=utf-8',
+        }
+        if stmt.catalog:
+            headers['X-Trino-Catalog'] = stmt.catalog
+        if stmt.schema:
+            headers['X-Trino-Schema'] = stmt.schema
+        conns = [self.pool.acquire()]
+        conn = conns[0]
+        broken = False
+        try:
+            try:
+                if conn.sock is None:
+                    conn.connect()
+            except OSError as e:
+                broken = True
+                raise ConnectionLost(f"{type(e).__name__}: {e}", submitted=False) from e
+            try:
+                result = self._request(conn, 'POST', '/v1/statement', stmt.sql.encode('utf-8'), headers)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                # the coordinator may or may not have accepted the statement
+                broken = True
+                raise ConnectionLost(f"{type(e).__name__}: {e}") from e
+            rows = 0
+            first_row = None
+            while True:
+                data = result.get('data') or []
+                if data and first_row is None:
+                    first_row = data[0]
+                rows += len(data)
+                error = result.get('error')
+                if error:
+                    name = error.get('errorName', '')
+                    raise TrinoError(
+                        f"{name}: {error.get('message', 'query failed')}",
+                        transient=name in TRANSIENT_ERROR_NAMES or error.get('errorType') in TRANSIENT_ERROR_TYPES,
+                        error_name=name,
+                    )
+                next_uri = result.get('nextUri')
+                if not next_uri:
+                    stats = result.get('stats') or {}
+                    return {
+                        'query_id': result.get('id'),
+                        'rows': rows,
+                        'first_row': first_row,
+                        'server_ms': stats.get('elapsedTimeMillis'),
+                        'cpu_ms': stats.get('cpuTimeMillis'),
+                        'physical_input_bytes': stats.get('physicalInputBytes'),
+                        'processed_bytes': stats.get('processedBytes'),
+                    }
+                parts = urlsplit(next_uri)
+                path = parts.path + (f"?{parts.query}" if parts.query else '')
+                try:
+                    result = self._follow(conns, path)
+                except ConnectionLost:
+                    broken = True
+                    raise
+        finally:
+            self.pool.release(conns[0], broken)
+
+    def execute(self, stmt: Statement) -> Dict:
+        """Run one statement. Transient failures are retried by submitting it again only
+        when it is idempotent (RESUBMIT_RE). Adds attempts and seconds.
+        """
+        started = time.monotonic()
+        resubmit = RESUBMIT_RE.match(stmt.sql) is not None
+        for attempt in range(1, self.retries + 2):
+            try:
+                result = self._run(stmt)
+            except TrinoError as e:
+                error = e
+            else:
+                result.update(attempts=attempt, seconds=time.monotonic() - started)
+                return result
+            safe = resubmit or getattr(error, 'submitted', True) is False
+            if not (error.transient and safe) or attempt > self.retries:
+                if error.transient and not safe:
+                    error.args = (f"{error} (not submitted again: the statement is not idempotent)",)
+                error.attempts = attempt
+                error.seconds = time.monotonic() - started
+                raise error
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+        raise AssertionError("unreachable")
+
+
+def run_group(client: TrinoClient, key: str, statements: List[Statement], source: str,
+              stop: threading.Event, fail_fast: bool) -> List[Dict]:
+    """Run one schema's statements in order; returns a timing record per statement."""
+    records = []
+    for stmt in statements:
+        record = {
+            'file': source,
+            'line': stmt.line,
+            'group': key,
+            'statement': statement_label(stmt.sql),
+        }
+        if stop.is_set():
+            record.update(status='skipped')
+            records.append(record)
+            continue
+        try:
+            result = client.execute(stmt)
+            record.update(status='ok', **result)
+            print(f"  ✓ [{key or '-'}] {record['statement']} ({result['seconds']:.2f}s)")
+        except TrinoError as e:
+            record.update(status='failed', error=str(e),
+                          attempts=getattr(e, 'attempts', 1), seconds=getattr(e, 'seconds', 0.0))
+            print(f"  ✗ [{key or '-'}] {record['statement']} ({source}:{stmt.line})\n      {e}")
+            if fail_fast:
+                stop.set()
+        records.append(record)
+    return records
+
+
+def run_sql_file(client: TrinoClient, path: Path, jobs: int, stop: threading.Event,
+                 fail_fast: bool = False) -> List[Dict]:
+    """Execute one SQL file: the preamble first, then schema groups concurrently."""
+    groups = group_statements(path.read_text())
+    total = sum(len(s) for s in groups.values())
+    print(f"📄 {path}: {total} statements in {len(groups)} groups")
+    records = run_group(client, '', groups.pop('', []), str(path), stop, fail_fast)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [
+            pool.submit(run_group, client, key, statements, str(path), stop, fail_fast)
+            for key, statements in groups.items()
+        ]
+        for future in futures:
+            records.extend(future.result())
+    return records
+
+
+def print_summary(records: List[Dict], elapsed: float, slowest: int = 5):
+    ok = [r for r in records if r['status'] == 'ok']
+    failed = [r for r in records if r['status'] == 'failed']
+    skipped = [r for r in records if r['status'] == 'skipped']
+    retried = sum(1 for r in records if r.get('attempts', 1) > 1)
+    statement_seconds = sum(r.get('seconds', 0.0) for r in records)
+    print(f"\n⏱  {len(ok)} ok, {len(failed)} failed, {len(skipped)} skipped, {retried} retried "
+          f"in {elapsed:.2f}s wall ({statement_seconds:.2f}s statement time)")
+    timed = sorted((r for r in records if 'seconds' in r), key=lambda r: -r['seconds'])
+    if timed:
+        print("   Slowest statements:")
+        for r in timed[:slowest]:
+            print(f"     {r['seconds']:7.2f}s  [{r['group'] or '-'}] {r['statement']}")
+    for r in failed:
+        print(f"❌ {r['file']}:{r['line']} {r['statement']}\n   {r['error']}")
+
+
+def run_sql_files(paths: List[Path], url: str, user: str, jobs: int = 4,
+                  retries: int = DEFAULT_RETRIES, fail_fast: bool = False,
+                  report: Optional[Path] = None) -> bool:
+    """Execute SQL files in order. Returns True when every statement succeeded."""
+    pool = ConnectionPool(url, size=max(1, jobs))
+    client = TrinoClient(pool, user, retries=retries)
+    stop = threading.Event()
+    started = time.monotonic()
+    records: List[Dict] = []
+    try:
+        for path in paths:
+            if stop.is_set():
+                break
+            records.extend(run_sql_file(client, path, jobs, stop, fail_fast))
+    finally:
+        pool.close()
+    elapsed = time.monotonic() - started
+    print_summary(records, elapsed)
+    print(f"   Connections opened: {pool.opened}")
+    if report:
+        report.parent.mkdir(parents=True, exist_ok=True)
+        with report.open('w') as f:
+            json.dump({'elapsed_seconds': elapsed, 'statements': records}, f, indent=2)
+            f.write('\n')
+        print(f"🧾 Timing report: {report}")
+    return all(r['status'] == 'ok' for r in records)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Execute Trino SQL files over HTTP")
+    parser.add_argument('files', nargs='+', type=Path, help="SQL files, executed in order")
+    parser.add_argument('--url', default=None,
+                        help=f"coordinator URL (default: TRINO_URL or {DEFAULT_TRINO_URL})")
+    parser.add_argument('--user', default=None,
+                        help=f"Trino user (default: TRINO_USER or {DEFAULT_TRINO_USER})")
+    parser.add_argument('--jobs', '-j', type=int, default=int(os.environ.get('TRINO_DDL_JOBS', '4')),
+                        help="schemas executed concurrently")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help="retries per statement for transient failures")
+    parser.add_argument('--fail-fast', action='store_true',
+                        help="stop at the first failed statement instead of reporting all failures")
+    parser.add_argument('--report', type=Path, default=None,
+                        help="write per-statement timings as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_env()
+    missing = [str(p) for p in args.files if not p.exists()]
+    if missing:
+        print(f"❌ SQL file not found: {', '.join(missing)}")
+        sys.exit(1)
+    ok = run_sql_files(
+        args.files,
+        url=args.url or os.environ.get('TRINO_URL', DEFAULT_TRINO_URL),
+        user=args.user or os.environ.get('TRINO_USER', DEFAULT_TRINO_USER),
+        jobs=args.jobs,
+        retries=args.retries,
+        fail_fast=args.fail_fast,
+        report=args.report,
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,580 @@
+"""
+Upload the raw/ directory to its S3 bucket, skipping objects whose content is unchanged.
+Local files are hashed in streaming part-sized chunks and compared with the remote ETag
+(plain MD5 or multipart MD5-of-MD5s); changed files are sent as concurrent multipart
+uploads. Interrupted multipart uploads are resumed: parts already on S3 with a matching
+MD5 are reused instead of sent again.
+
+With --compression gzip|zstd, CSVs are compressed while streaming into the multipart
+upload (no temporary copy) and stored as <name>.csv.gz / .csv.zst next to where the
+plain file would be. The source hash is kept as object metadata for change detection.
+
+Requires boto3 (pip install boto3), and zstandard for zstd. Reads S3 settings from .env
+like the other scripts.
+"""
+
+import os
+import sys
+import json
+import zlib
+import base64
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+from generate_trino_schemas import RAW_DIR, RAW_COMPRESSION_SUFFIXES, load_env
+
+try:
+    import boto3
+    from botocore.config import Config
+except ImportError:  # checked before running so the module stays importable
+    boto3 = None
+
+try:
+    import zstandard
+except ImportError:  # only needed for --compression zstd
+    zstandard = None
+
+# Hash cache, so unchanged files are not re-read on every run
+UPLOAD_CACHE_PATH = Path("sql/raw_upload_cache.json")
+
+# The AWS CLI also uses 8 MiB parts, so objects it uploaded compare without a re-upload
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+HASH_CHUNK_BYTES = 1024 * 1024
+DEFAULT_PART_JOBS = 8
+# Object metadata key recording the part size used, needed to recompute multipart ETags
+PART_SIZE_METADATA = 'part-size'
+# Compressed objects: ETag of the uncompressed source (at 'part-size') and the codec
+SOURCE_ETAG_METADATA = 'source-etag'
+COMPRESSION_METADATA = 'compression'
+
+# Only CSVs are compressed; Parquet copies and markers are uploaded as they are
+COMPRESSIBLE_SUFFIX = '.csv'
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def s3_client(max_connections: int):
+    endpoint = f"{os.environ.get('S3_PROTOCOL', 'http')}://" \
+               f"{os.environ.get('S3_EXTERNAL_HOST', 'localhost')}:{os.environ.get('S3_PORT', '9000')}"
+    return boto3.client(
+        's3',
+        endpoint_url=os.environ.get('S3_ENDPOINT_URL', endpoint),
+        aws_access_key_id=os.environ.get('S3_ACCESS_KEY'),
+        aws_secret_access_key=os.environ.get('S3_SECRET_KEY'),
+        region_name=os.environ.get('AWS_REGION', os.environ.get('S3_REGION', 'us-east-1')),
+        config=Config(
+            max_pool_connections=max_connections,
+            s3={'addressing_style': 'path'},
+            retries={'max_attempts': 5, 'mode': 'standard'},
+        ),
+    )
+
+
+def part_digests(path: Path, part_size: int) -> List[str]:
+    """Hex MD5 of each part_size chunk of a file, read in small blocks."""
+    digests = []
+    with path.open('rb') as f:
+        while True:
+            h = hashlib.md5()
+            read = 0
+            while read < part_size:
+                chunk = f.read(min(HASH_CHUNK_BYTES, part_size - read))
+                if not chunk:
+                    break
+                h.update(chunk)
+                read += len(chunk)
+            if read == 0 and digests:
+                break
+            digests.append(h.hexdigest())
+            if read < part_size:
+                break
+    return digests
+
+
+def expected_etag(digests: List[str]) -> str:
+    """ETag S3 reports for an object uploaded with these part digests.
+    A single part is a plain PUT (hex MD5); more parts use MD5-of-MD5s with a -N suffix.
+    """
+    if len(digests) == 1:
+        return digests[0]
+    combined = hashlib.md5(b''.join(bytes.fromhex(d) for d in digests)).hexdigest()
+    return f"{combined}-{len(digests)}"
+
+
+def fit_part_size(size: int, part_size: int) -> int:
+    """Grow the part size so the file fits in the 10,000-part multipart limit."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while size > part_size * MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def load_upload_cache(path: Path) -> Dict[str, Dict]:
+    if path.exists():
+        try:
+            with path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_upload_cache(path: Path, cache: Dict[str, Dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with tmp.open('w') as f:
+        json.dump(cache, f, sort_keys=True)
+    tmp.replace(path)
+
+
+class LocalFile:
+    """A raw file and its (cached) part digests for one part size."""
+
+    def __init__(self, path: Path, key: str, cache: Dict[str, Dict], lock: threading.Lock):
+        self.path = path
+        self.key = key
+        st = path.stat()
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.cache = cache
+        self.lock = lock
+
+    def digests(self, part_size: int) -> List[str]:
+        with self.lock:
+            entry = self.cache.get(self.key)
+        if entry and (entry['size'], entry['mtime_ns'], entry['part_size']) == (self.size, self.mtime_ns, part_size):
+            return entry['parts']
+        digests = part_digests(self.path, part_size)
+        with self.lock:
+            self.cache[self.key] = {
+                'size': self.size, 'mtime_ns': self.mtime_ns, 'part_size': part_size, 'parts': digests,
+            }
+        return digests
+
+
+def list_remote_objects(client, bucket: str) -> Dict[str, Tuple[int, str]]:
+    """key -> (size, ETag) for every object in the bucket."""
+    remote = {}
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket):
+        for obj in page.get('Contents', []):
+            remote[obj['Key']] = (obj['Size'], obj['ETag'].strip('"'))
+    return remote
+
+
+def file_md5(path: Path) -> str:
+    h = hashlib.md5()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def remote_part_size(client, bucket: str, key: str) -> int:
+    """Part size a remote multipart object was uploaded with (metadata, else AWS CLI default)."""
+    try:
+        head = client.head_object(Bucket=bucket, Key=key)
+        return int(head.get('Metadata', {}).get(PART_SIZE_METADATA, DEFAULT_PART_SIZE))
+    except Exception:
+        return DEFAULT_PART_SIZE
+
+
+def is_unchanged(client, bucket: str, local: LocalFile, remote: Optional[Tuple[int, str]],
+                 part_size: int) -> bool:
+    """Compare a local file with its remote object by size and content hash."""
+    if remote is None or remote[0] != local.size:
+        return False
+    remote_etag = remote[1]
+    if '-' not in remote_etag:
+        # plain PUT: the ETag is the MD5 of the whole object
+        if local.size <= part_size:
+            return local.digests(part_size)[0] == remote_etag
+        return file_md5(local.path) == remote_etag
+    parts = int(remote_etag.rsplit('-', 1)[1])
+    size = part_size
+    if parts != -(-local.size // part_size):
+        size = remote_part_size(client, bucket, local.key)
+    return expected_etag(local.digests(size)) == remote_etag
+
+
+def b64_md5(hex_digest: str) -> str:
+    return base64.b64encode(bytes.fromhex(hex_digest)).decode('ascii')
+
+
+def find_resumable_upload(client, bucket: str, key: str, part_size: int,
+                          digests: List[str]) -> Tuple[Optional[str], Dict[int, str]]:
+    """Latest in-progress multipart upload of key, with the parts that can be kept.
+    Uploads with nothing reusable, and any older ones, are aborted.
+    """
+    uploads = []
+    for page in client.get_paginator('list_multipart_uploads').paginate(Bucket=bucket, Prefix=key):
+        uploads.extend(u for u in page.get('Uploads', []) if u['Key'] == key)
+    uploads.sort(key=lambda u: u['Initiated'], reverse=True)
+
+    upload_id, reusable = None, {}
+    for upload in uploads:
+        if upload_id is None:
+            parts = {}
+            for page in client.get_paginator('list_parts').paginate(
+                    Bucket=bucket, Key=key, UploadId=upload['UploadId']):
+                for p in page.get('Parts', []):
+                    number, etag = p['PartNumber'], p['ETag'].strip('"')
+                    if number > len(digests) or etag != digests[number - 1]:
+                        continue
+                    # every part but the last must have been cut at the same size
+                    if number == len(digests) or p['Size'] == part_size:
+                        parts[number] = etag
+            if parts:
+                upload_id, reusable = upload['UploadId'], parts
+                continue
+        client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload['UploadId'])
+    return upload_id, reusable
+
+
+def abort_pending_uploads(client, bucket: str, key: str):
+    for page in client.get_paginator('list_multipart_uploads').paginate(Bucket=bucket, Prefix=key):
+        for upload in page.get('Uploads', []):
+            if upload['Key'] == key:
+                client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload['UploadId'])
+
+
+def read_part(path: Path, number: int, part_size: int) -> bytes:
+    with path.open('rb') as f:
+        f.seek((number - 1) * part_size)
+        return f.read(part_size)
+
+
+def upload_multipart(client, part_pool: ThreadPoolExecutor, bucket: str, local: LocalFile,
+                     part_size: int, digests: List[str]) -> Tuple[int, int]:
+    """Concurrent multipart upload, resuming a previous attempt when possible.
+    Returns (parts sent, parts reused). A failed upload is left open for the next run.
+    """
+    upload_id, done = find_resumable_upload(client, bucket, local.key, part_size, digests)
+    if upload_id is None:
+        upload_id = client.create_multipart_upload(
+            Bucket=bucket, Key=local.key, Metadata={PART_SIZE_METADATA: str(part_size)},
+        )['UploadId']
+
+    def send(number: int) -> Tuple[int, str]:
+        data = read_part(local.path, number, part_size)
+        if hashlib.md5(data).hexdigest() != digests[number - 1]:
+            raise RuntimeError(f"{local.path} changed while uploading (part {number})")
+        resp = client.upload_part(
+            Bucket=bucket, Key=local.key, UploadId=upload_id, PartNumber=number,
+            Body=data, ContentMD5=b64_md5(digests[number - 1]),
+        )
+        return number, resp['ETag'].strip('"')
+
+    pending = [n for n in range(1, len(digests) + 1) if n not in done]
+    etags = dict(done)
+    for number, etag in part_pool.map(send, pending):
+        etags[number] = etag
+    client.complete_multipart_upload(
+        Bucket=bucket, Key=local.key, UploadId=upload_id,
+        MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': f'"{etags[n]}"'} for n in sorted(etags)]},
+    )
+    return len(pending), len(done)
+
+
+def compressor(compression: str):
+    """Streaming compressor with compress()/flush() for the codec.
+    gzip output has a zero mtime, so equal input gives equal objects.
+    """
+    if compression == 'gzip':
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def compressed_is_current(client, bucket: str, local: LocalFile, remote_key: str,
+                          remote: Optional[Tuple[int, str]], source_etag: str) -> bool:
+    """A compressed object is current if it was made from the same source content.
+    The upload cache answers from the listing ETag; otherwise the object metadata is read.
+    """
+    if remote is None:
+        return False
+    with local.lock:
+        cached = (local.cache.get(local.key) or {}).get('compressed')
+    if cached and cached == {'key': remote_key, 'etag': remote[1], 'source': source_etag}:
+        return True
+    try:
+        head = client.head_object(Bucket=bucket, Key=remote_key)
+    except Exception:
+        return False
+    if head.get('Metadata', {}).get(SOURCE_ETAG_METADATA) != source_etag:
+        return False
+    remember_compressed(local, remote_key, remote[1], source_etag)
+    return True
+
+
+def remember_compressed(local: LocalFile, remote_key: str, etag: str, source_etag: str):
+    with local.lock:
+        entry = local.cache.get(local.key)
+        if entry is not None:
+            entry['compressed'] = {'key': remote_key, 'etag': etag, 'source': source_etag}
+
+
+def upload_compressed(client, part_pool: ThreadPoolExecutor, bucket: str, local: LocalFile,
+                      remote_key: str, compression: str, part_size: int, digests: List[str],
+                      max_inflight: int) -> Tuple[int, int, str]:
+    """Compress a file while streaming it into S3; nothing is written to local disk.
+    Output is cut into part_size parts sent concurrently (at most max_inflight buffered);
+    output that fits in one part is sent with a single PUT.
+    Returns (parts, compressed bytes, ETag). Interrupted uploads are aborted, not resumed,
+    because the source hash metadata is fixed when the upload is created.
+    """
+    source_etag = expected_etag(digests)
+    metadata = {
+        PART_SIZE_METADATA: str(part_size),
+        SOURCE_ETAG_METADATA: source_etag,
+        COMPRESSION_METADATA: compression,
+    }
+    abort_pending_uploads(client, bucket, remote_key)
+    slots = threading.Semaphore(max(1, max_inflight))
+    futures = []
+    upload_id = None
+
+    def send(number: int, data: bytes) -> Tuple[int, str]:
+        try:
+            resp = client.upload_part(
+                Bucket=bucket, Key=remote_key, UploadId=upload_id, PartNumber=number,
+                Body=data, ContentMD5=base64.b64encode(hashlib.md5(data).digest()).decode('ascii'),
+            )
+            return number, resp['ETag'].strip('"')
+        finally:
+            slots.release()
+
+    def submit(data: bytes):
+        nonlocal upload_id
+        if upload_id is None:
+            upload_id = client.create_multipart_upload(Bucket=bucket, Key=remote_key, Metadata=metadata)['UploadId']
+        slots.acquire()
+        futures.append(part_pool.submit(send, len(futures) + 1, data))
+
+    comp = compressor(compression)
+    buf = bytearray()
+    total = 0
+    seen: List[str] = []
+    h, in_part = hashlib.md5(), 0
+    try:
+        with local.path.open('rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                # re-hash the source as it streams to catch edits made mid-upload
+                h.update(chunk)
+                in_part += len(chunk)
+                if in_part == part_size:
+                    seen.append(h.hexdigest())
+                    h, in_part = hashlib.md5(), 0
+                buf += comp.compress(chunk)
+                while len(buf) > part_size:
+                    submit(bytes(buf[:part_size]))
+                    total += part_size
+                    del buf[:part_size]
+        if in_part or not seen:
+            seen.append(h.hexdigest())
+        buf += comp.flush()
+        if seen != digests:
+            raise RuntimeError(f"{local.path} changed while uploading")
+
+        total += len(buf)
+        if upload_id is None:
+            resp = client.put_object(
+                Bucket=bucket, Key=remote_key, Body=bytes(buf),
+                ContentMD5=base64.b64encode(hashlib.md5(buf).digest()).decode('ascii'), Metadata=metadata,
+            )
+            return 1, total, resp['ETag'].strip('"')
+        submit(bytes(buf))
+        etags = dict(future.result() for future in futures)
+        resp = client.complete_multipart_upload(
+            Bucket=bucket, Key=remote_key, UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': f'"{etags[n]}"'} for n in sorted(etags)]},
+        )
+        return len(etags), total, resp['ETag'].strip('"')
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        if upload_id is not None:
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+            client.abort_multipart_upload(Bucket=bucket, Key=remote_key, UploadId=upload_id)
+        raise
+
+
+def object_key(local: LocalFile, compression: str) -> str:
+    """Remote key: CSVs get the codec's suffix, everything else keeps its name."""
+    if local.key.endswith(COMPRESSIBLE_SUFFIX):
+        return local.key + RAW_COMPRESSION_SUFFIXES[compression]
+    return local.key
+
+
+def stale_variants(local: LocalFile, remote_key: str, remote: Dict[str, Tuple[int, str]]) -> List[str]:
+    """Copies of a CSV stored with another codec; Trino would read them as extra rows."""
+    if not local.key.endswith(COMPRESSIBLE_SUFFIX):
+        return []
+    variants = {local.key + suffix for suffix in RAW_COMPRESSION_SUFFIXES.values()}
+    return sorted(k for k in variants - {remote_key} if k in remote)
+
+
+def upload_file(client, part_pool: ThreadPoolExecutor, bucket: str, local: LocalFile,
+                remote: Dict[str, Tuple[int, str]], part_size: int, dry_run: bool,
+                compression: str = 'none', part_jobs: int = DEFAULT_PART_JOBS) -> Dict:
+    """Upload one file if its content differs from the remote object."""
+    remote_key = object_key(local, compression)
+    result = {
+        'key': remote_key, 'size': local.size, 'stored_size': None, 'status': 'unchanged',
+        'parts': 0, 'reused': 0, 'removed': [], 'error': None,
+    }
+    try:
+        size = fit_part_size(local.size, part_size)
+        current = remote.get(remote_key)
+        if remote_key == local.key:
+            unchanged = is_unchanged(client, bucket, local, current, size)
+        else:
+            source_etag = expected_etag(local.digests(size))
+            unchanged = compressed_is_current(client, bucket, local, remote_key, current, source_etag)
+        if not unchanged:
+            result['status'] = 'new' if current is None else 'changed'
+        result['removed'] = stale_variants(local, remote_key, remote)
+        if dry_run:
+            return result
+
+        digests = local.digests(size)
+        if unchanged:
+            pass
+        elif remote_key != local.key:
+            result['parts'], result['stored_size'], etag = upload_compressed(
+                client, part_pool, bucket, local, remote_key, compression, size, digests, part_jobs,
+            )
+            remember_compressed(local, remote_key, etag, expected_etag(digests))
+        elif len(digests) == 1:
+            client.put_object(
+                Bucket=bucket, Key=local.key, Body=read_part(local.path, 1, size),
+                ContentMD5=b64_md5(digests[0]), Metadata={PART_SIZE_METADATA: str(size)},
+            )
+            result['parts'] = 1
+        else:
+            result['parts'], result['reused'] = upload_multipart(client, part_pool, bucket, local, size, digests)
+        # only once the new object is in place, so the table never has a gap
+        for key in result['removed']:
+            client.delete_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def collect_local_files(raw_dir: Path, cache: Dict[str, Dict], lock: threading.Lock) -> List[LocalFile]:
+    """Every file under raw_dir except hidden ones (in-progress temp files)."""
+    files = []
+    for path in sorted(p for p in raw_dir.rglob('*') if p.is_file()):
+        rel = path.relative_to(raw_dir)
+        if any(part.startswith('.') for part in rel.parts):
+            continue
+        files.append(LocalFile(path, rel.as_posix(), cache, lock))
+    return files
+
+
+def ensure_buckets(client, buckets: List[str]):
+    existing = {b['Name'] for b in client.list_buckets().get('Buckets', [])}
+    for bucket in buckets:
+        if bucket not in existing:
+            print(f"🪣 Creating bucket: {bucket}")
+            client.create_bucket(Bucket=bucket)
+
+
+def upload_all(raw_dir: Path = RAW_DIR, bucket: Optional[str] = None, jobs: int = 4,
+               part_size: int = DEFAULT_PART_SIZE, part_jobs: int = DEFAULT_PART_JOBS,
+               rehash: bool = False, dry_run: bool = False, compression: str = 'none') -> bool:
+    """Sync raw_dir to the bucket by content. Returns True if nothing failed."""
+    bucket = bucket or raw_dir.name
+    client = s3_client(max_connections=jobs + part_jobs)
+    if not dry_run:
+        ensure_buckets(client, [b.strip() for b in os.environ.get('S3_BUCKETS', bucket).split(',') if b.strip()])
+
+    cache = {} if rehash else load_upload_cache(UPLOAD_CACHE_PATH)
+    lock = threading.Lock()
+    files = collect_local_files(raw_dir, cache, lock)
+    try:
+        remote = list_remote_objects(client, bucket)
+    except client.exceptions.NoSuchBucket:
+        remote = {}
+    print(f"🔍 {len(files)} local files, {len(remote)} objects in s3://{bucket}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, part_jobs)) as part_pool, \
+            ThreadPoolExecutor(max_workers=max(1, jobs)) as file_pool:
+        futures = [
+            file_pool.submit(upload_file, client, part_pool, bucket, f, remote, part_size, dry_run,
+                             compression, part_jobs)
+            for f in files
+        ]
+        for future in futures:
+            r = future.result()
+            results.append(r)
+            if r['status'] == 'failed':
+                print(f"  ❌ {r['key']}: {r['error']}")
+            elif r['status'] != 'unchanged':
+                action = "would upload" if dry_run else "uploaded"
+                resumed = f", {r['reused']} parts resumed" if r['reused'] else ""
+                stored = f" -> {r['stored_size']} {compression}" if r['stored_size'] is not None else ""
+                print(f"  ⬆️  {r['key']} ({r['status']}, {r['size']} bytes{stored}) {action}{resumed}")
+            for key in r['removed']:
+                print(f"  🗑  {key} ({'would remove' if dry_run else 'removed'}: stored with another codec)")
+
+    live = {f.key for f in files}
+    save_upload_cache(UPLOAD_CACHE_PATH, {k: v for k, v in cache.items() if k in live})
+
+    sent = [r for r in results if r['status'] in ('new', 'changed')]
+    failed = [r for r in results if r['status'] == 'failed']
+    stored = sum(r['size'] if r['stored_size'] is None else r['stored_size'] for r in sent)
+    print(f"📋 Uploaded: {len(sent)} ({sum(r['size'] for r in sent)} bytes, {stored} stored), "
+          f"unchanged: {len(results) - len(sent) - len(failed)}, failed: {len(failed)}")
+    return not failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload raw/ to S3 by content hash")
+    parser.add_argument('--jobs', '-j', type=int, default=int(os.environ.get('S3_UPLOAD_JOBS', '4')),
+                        help="files hashed/uploaded in parallel")
+    parser.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE // (1024 * 1024),
+                        help="multipart part size in MiB (min 5)")
+    parser.add_argument('--part-jobs', type=int, default=int(os.environ.get('S3_UPLOAD_PART_JOBS', DEFAULT_PART_JOBS)),
+                        help="parts uploaded in parallel across all files")
+    parser.add_argument('--compression', choices=tuple(RAW_COMPRESSION_SUFFIXES),
+                        default=os.environ.get('S3_RAW_COMPRESSION', 'none'),
+                        help="compress CSVs on upload (regenerate schemas with the same setting)")
+    parser.add_argument('--rehash', action='store_true',
+                        help="ignore the local hash cache")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only report which files differ from S3")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if boto3 is None:
+        print("❌ boto3 is required: pip install boto3")
+        sys.exit(1)
+    load_env()
+    args = parse_args()
+    if args.compression == 'zstd' and zstandard is None:
+        print("❌ zstandard is required for zstd: pip install zstandard")
+        sys.exit(1)
+    raw_dir = Path(os.environ.get('S3_RAW_BUCKET', str(RAW_DIR)))
+    if not raw_dir.is_dir():
+        print(f"❌ Directory not found: {raw_dir}")
+        sys.exit(1)
+    ok = upload_all(
+        raw_dir=raw_dir,
+        jobs=args.jobs,
+        part_size=args.part_size_mb * 1024 * 1024,
+        part_jobs=args.part_jobs,
+        rehash=args.rehash,
+        dry_run=args.dry_run,
+        compression=args.compression,
+    )
+    sys.exit(0 if ok else 1)
@@ -46,7 +46,16 @@ for BUCKET in "${BUCKETS[@]}"; do
 done
 
 echo "Загружаю файлы из ${S3_RAW_BUCKET}/ в бакет ${S3_RAW_BUCKET}..."
-# Use --size-only to skip files that already exist with same size (idempotent)
-aws --endpoint-url "$S3_URL" --profile local s3 sync ${S3_RAW_BUCKET}/ "s3://${S3_RAW_BUCKET}/" --size-only
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+if python3 -c "import boto3" >/dev/null 2>&1; then
+  # Compares content hashes with remote ETags; changed files go up as parallel multipart uploads
+  python3 "$SCRIPT_DIR/upload_raw_to_s3.py" "$@"
+elif [ "${S3_RAW_COMPRESSION:-none}" != "none" ]; then
+  echo "Для S3_RAW_COMPRESSION=${S3_RAW_COMPRESSION} нужен boto3: pip install boto3"
+  exit 1
+else
+  echo "boto3 не найден (pip install boto3), использую aws s3 sync по размеру и времени изменения"
+  aws --endpoint-url "$S3_URL" --profile local s3 sync ${S3_RAW_BUCKET}/ "s3://${S3_RAW_BUCKET}/" --exclude ".*" --exclude "*/.*"
+fi
 
 echo "Загрузка завершена успешно!"
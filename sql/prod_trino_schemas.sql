@@ -0,0 +1,108 @@
+-- ============================================================
+-- PRODUCTION DELTA LAKE SCHEMAS (written by the ETL in etl/)
+-- Generated by: python3 -m etl.job --ddl
+-- ============================================================
+
+-- Schema: prod_hotels
+CREATE SCHEMA IF NOT EXISTS delta.prod_hotels WITH (location = 's3://prod/prod_hotels/');
+USE delta.prod_hotels;
+
+CREATE TABLE IF NOT EXISTS hotels (
+    hotel_id VARCHAR,
+    hotel_name VARCHAR,
+    hotel_code VARCHAR,
+    rating DOUBLE,
+    address VARCHAR,
+    zip_code VARCHAR,
+    latitude DOUBLE,
+    longitude DOUBLE,
+    facilities ARRAY(VARCHAR),
+    phone VARCHAR,
+    website VARCHAR,
+    row_hash VARCHAR,
+    country VARCHAR,
+    city VARCHAR
+)
+WITH (
+    location = 's3://prod/prod_hotels/hotels',
+    partitioned_by = ARRAY['country', 'city']
+);
+
+-- Schema: prod_hotels
+CREATE SCHEMA IF NOT EXISTS delta.prod_hotels WITH (location = 's3://prod/prod_hotels/');
+USE delta.prod_hotels;
+
+CREATE TABLE IF NOT EXISTS hotel_index (
+    name_key VARCHAR,
+    city_key VARCHAR,
+    hotel_id VARCHAR,
+    match_method VARCHAR,
+    score DOUBLE,
+    records BIGINT,
+    source VARCHAR
+)
+WITH (
+    location = 's3://prod/prod_hotels/hotel_index',
+    partitioned_by = ARRAY['source']
+);
+
+-- Schema: prod_reviews
+CREATE SCHEMA IF NOT EXISTS delta.prod_reviews WITH (location = 's3://prod/prod_reviews/');
+USE delta.prod_reviews;
+
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id VARCHAR,
+    hotel_id VARCHAR,
+    hotel_name VARCHAR,
+    reviewer_nationality VARCHAR,
+    reviewer_type VARCHAR,
+    review_text VARCHAR,
+    positive_review VARCHAR,
+    negative_review VARCHAR,
+    overall_rating DOUBLE,
+    cleanliness_rating DOUBLE,
+    room_rating DOUBLE,
+    service_rating DOUBLE,
+    location_rating DOUBLE,
+    value_rating DOUBLE,
+    comfort_rating DOUBLE,
+    row_hash VARCHAR,
+    review_date DATE
+)
+WITH (
+    location = 's3://prod/prod_reviews/reviews',
+    partitioned_by = ARRAY['review_date']
+);
+
+-- Schema: prod_reservations
+CREATE SCHEMA IF NOT EXISTS delta.prod_reservations WITH (location = 's3://prod/prod_reservations/');
+USE delta.prod_reservations;
+
+CREATE TABLE IF NOT EXISTS reservations (
+    booking_id VARCHAR,
+    hotel_id VARCHAR,
+    num_adults INTEGER,
+    num_children INTEGER,
+    num_babies INTEGER,
+    arrival_date DATE,
+    num_weekend_nights INTEGER,
+    num_week_nights INTEGER,
+    room_type VARCHAR,
+    lead_time INTEGER,
+    market_segment VARCHAR,
+    avg_price_per_room DOUBLE,
+    meal_plan VARCHAR,
+    car_parking_required BOOLEAN,
+    num_special_requests INTEGER,
+    is_repeated_guest BOOLEAN,
+    previous_cancellations INTEGER,
+    booking_status VARCHAR,
+    is_canceled BOOLEAN,
+    row_hash VARCHAR,
+    arrival_year INTEGER,
+    arrival_month INTEGER
+)
+WITH (
+    location = 's3://prod/prod_reservations/reservations',
+    partitioned_by = ARRAY['arrival_year', 'arrival_month']
+);
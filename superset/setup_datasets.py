@@ -1,71 +1,223 @@
 """
 Automatically configure Superset with Trino connections and dashboards.
-This script runs after Superset initialization to set up:
-- Trino Delta Lake connection
-- Trino Hive connection
-- Sample datasets and dashboards
+This script runs after Superset initialization and reconciles the objects
+declared in provisioning.yaml:
+- Trino Delta Lake and Hive connections
+- Datasets (raw tables taken from the generate_trino_schemas.py manifest)
+- Charts and dashboards
 """
 
 import os
 import sys
 import time
+import json
+import argparse
+import importlib
+import queue
+import fnmatch
+import hashlib
 import logging
-from typing import Optional
+import threading
+from typing import List, Optional
+
+try:
+    import yaml
+except ImportError:  # JSON specs still work without PyYAML
+    yaml = None
+
+try:
+    import readiness  # scripts/readiness.py, mounted next to this script
+except ImportError:
+    readiness = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Column profile written by `generate_trino_schemas.py --profile`
+COLUMN_PROFILE_PATH = os.environ.get('COLUMN_PROFILE_PATH', '/app/sql/trino_column_profile.json')
+# Columns above either limit are not offered as filters / group-bys, so
+# Superset never issues SELECT DISTINCT over free text or near-unique keys
+FILTER_MAX_DISTINCT = 10000
+FILTER_MAX_AVG_LENGTH = 64
+
+# Hard deadline for Trino / Superset to become ready
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', '120'))
+
+# Bulk mode prefetches existing objects and provisions everything in one transaction;
+# set to false to fall back to one query + commit per object
+BULK_SETUP = os.environ.get('SUPERSET_BULK_SETUP', 'true').lower() in ('1', 'true', 'yes')
+
+# Dataset columns are described through Trino by a bounded pool of workers; a table
+# that does not answer within the timeout keeps its dataset, without new columns
+METADATA_JOBS = int(os.environ.get('SUPERSET_METADATA_JOBS', '8'))
+METADATA_TIMEOUT = float(os.environ.get('SUPERSET_METADATA_TIMEOUT', '60'))
+# Also re-describe datasets that already exist (picks up regenerated raw schemas)
+REFRESH_METADATA = os.environ.get('SUPERSET_REFRESH_METADATA', 'false').lower() in ('1', 'true', 'yes')
+
+# Declarative spec of the databases, datasets, charts and dashboards to provision
+SPEC_PATH = os.environ.get(
+    'SUPERSET_SPEC_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'provisioning.yaml')
+)
+# Raw datasets are the tables in the manifest written by generate_trino_schemas.py
+MANIFEST_PATH = os.environ.get('TRINO_SCHEMAS_MANIFEST_PATH', '/app/sql/trino_schemas_manifest.json')
+# Hash of the last reconciled spec and the ids of the objects it manages
+SPEC_STATE_PATH = os.environ.get('SUPERSET_SPEC_STATE_PATH', '/app/superset_home/provisioning_state.json')
+SPEC_STATE_VERSION = 2
+# Reconcile even when the spec hash is unchanged
+FORCE_SETUP = os.environ.get('SUPERSET_FORCE_SETUP', 'false').lower() in ('1', 'true', 'yes')
+
+# After provisioning, every managed chart query is run once (forced) so its result is in
+# the results cache for its dataset's cache_timeout; `--warm-up` reruns just this stage
+WARMUP = os.environ.get('SUPERSET_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_JOBS = int(os.environ.get('SUPERSET_WARMUP_JOBS', '4'))
+WARMUP_TIMEOUT = float(os.environ.get('SUPERSET_WARMUP_TIMEOUT', '300'))
+WARMUP_REPORT_PATH = os.environ.get('SUPERSET_WARMUP_REPORT_PATH', '/app/superset_home/cache_warmup.json')
+
+
+
+class MetadataState:
+    """Existing Superset objects, prefetched in a handful of queries for bulk provisioning.
+    Lookups replace per-object existence queries; new objects are only flushed, so the
+    whole run is one transaction committed (or rolled back) by the caller.
+    """
+
+    def __init__(self):
+        from sqlalchemy.orm import selectinload
+        from superset import db
+        from superset.models.core import Database
+        from superset.connectors.sqla.models import SqlaTable
+        from superset.models.slice import Slice
+        from superset.models.dashboard import Dashboard
+
+        self.databases = {d.database_name: d for d in db.session.query(Database).all()}
+        self.datasets = {
+            (t.database_id, t.schema, t.table_name): t
+            for t in db.session.query(SqlaTable).options(selectinload(SqlaTable.columns)).all()
+        }
+        self.slices = {s.slice_name: s for s in db.session.query(Slice).all()}
+        self.dashboards = {
+            d.dashboard_title: d
+            for d in db.session.query(Dashboard).options(selectinload(Dashboard.slices)).all()
+        }
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        logger.info(
+            f"Prefetched {len(self.databases)} databases, {len(self.datasets)} datasets, "
+            f"{len(self.slices)} charts, {len(self.dashboards)} dashboards"
+        )
+
+    def slice_by_id(self, chart_id: int):
+        return next((s for s in self.slices.values() if s.id == chart_id), None)
 
-def wait_for_trino(max_attempts=30):
-    """Wait for Trino to be ready."""
-    import socket
-    trino_host = os.environ.get('TRINO_HOST', 'trino')
-    trino_port = int(os.environ.get('TRINO_PORT', '8080'))
-    
-    for i in range(max_attempts):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)
-            result = sock.connect_ex((trino_host, trino_port))
-            sock.close()
-            if result == 0:
-                logger.info(f"Trino is ready at {trino_host}:{trino_port}")
-                time.sleep(5)  # Additional wait for Trino to fully initialize
-                return True
-        except Exception as e:
-            logger.debug(f"Waiting for Trino... ({i+1}/{max_attempts}): {e}")
-        time.sleep(2)
-    
-    logger.warning(f"Trino not available at {trino_host}:{trino_port}, continuing anyway...")
-    return False
 
+def poll_until_ready(name: str, url: str, is_ready, timeout: float) -> bool:
+    """Stdlib poll of one HTTP endpoint until is_ready(status, body) or the deadline.
+    Used when readiness.py is not next to this script (images that only ship setup_datasets.py).
+    """
+    import urllib.request
 
-def wait_for_superset():
-    """Wait for Superset to be ready."""
-    import requests
-    max_attempts = 30
-    for i in range(max_attempts):
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
         try:
-            response = requests.get("http://localhost:8088/health")
-            if response.status_code == 200:
-                logger.info("Superset is ready")
-                return True
-        except Exception as e:
-            logger.debug(f"Waiting for Superset... ({i+1}/{max_attempts})")
-            time.sleep(2)
-    logger.error("Superset did not become ready in time")
+            with urllib.request.urlopen(url, timeout=3) as resp:
+                if is_ready(resp.status, resp.read()):
+                    logger.info(f"{name} is ready ({url})")
+                    return True
+        except Exception as e:  # refused, timeouts, HTTP errors: all mean not ready yet
+            logger.debug(f"Waiting for {name}: {e}")
+        if time.monotonic() + delay > deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 5.0)
+
+
+def wait_for_targets(targets: list, timeout: float) -> bool:
+    """Wait for readiness.Target endpoints; without readiness.py, for their fallback
+    (name, url, is_ready) polls instead.
+    """
+    if readiness is not None:
+        ready = readiness.wait_until_ready([t for t, _ in targets], timeout, log=logger.info)
+    else:
+        deadline = time.monotonic() + timeout
+        ready = all(poll_until_ready(*fallback, max(deadline - time.monotonic(), 0)) for _, fallback in targets)
+    if ready:
+        return True
+    logger.warning("Services not ready before the deadline, continuing anyway...")
     return False
 
 
-def get_or_create_database(database_name: str, sqlalchemy_uri: str) -> Optional[int]:
-    """Create a database connection if it doesn't exist."""
+def wait_for_trino(timeout: float = READINESS_TIMEOUT) -> bool:
+    """Wait until Trino's /v1/info reports it has finished starting."""
+    url = f"http://{os.environ.get('TRINO_HOST', 'trino')}:{os.environ.get('TRINO_PORT', '8080')}"
+    target = readiness.Target('trino', 'trino', url) if readiness else None
+    started = lambda status, body: status == 200 and not json.loads(body).get('starting', True)
+    return wait_for_targets([(target, ('Trino', f"{url}/v1/info", started))], timeout)
+
+
+def wait_for_superset(timeout: float = READINESS_TIMEOUT) -> bool:
+    """Wait until the Superset web server answers /health."""
+    url = "http://localhost:8088/health"
+    target = readiness.Target('superset', 'http', url) if readiness else None
+    return wait_for_targets([(target, ('Superset', url, lambda status, body: status == 200))], timeout)
+
+
+def database_extra(engine: Optional[dict] = None) -> dict:
+    """Superset `extra` of a Trino connection with the spec's engine tuning.
+    Superset builds query engines with NullPool, which rejects pool_size/max_overflow, so only
+    pool options valid for every pool class are passed on.
+    """
+    engine = engine or {}
+    pool = engine.get('pool') or {}
+    connect_args = {'source': 'superset'}
+    if engine.get('session_properties'):
+        connect_args['session_properties'] = dict(engine['session_properties'])
+    if engine.get('request_timeout') is not None:
+        connect_args['request_timeout'] = engine['request_timeout']
+    engine_params = {'connect_args': connect_args}
+    if pool.get('recycle') is not None:
+        engine_params['pool_recycle'] = pool['recycle']
+    if pool.get('pre_ping'):
+        engine_params['pool_pre_ping'] = True
+    return {'allows_virtual_table_explore': True, 'engine_params': engine_params}
+
+
+def get_or_create_database(database_name: str, sqlalchemy_uri: str,
+                           state: Optional[MetadataState] = None,
+                           cache_timeout: Optional[int] = None,
+                           extra: Optional[dict] = None) -> Optional[int]:
+    """Create a database connection if it doesn't exist; keep its cache timeout and engine
+    tuning in sync (in bulk mode, also its URI).
+    """
     from superset import db
     from superset.models.core import Database
     
+    extra = extra if extra is not None else database_extra()
     # Check if database already exists
-    existing_db = db.session.query(Database).filter_by(database_name=database_name).first()
+    if state is not None:
+        existing_db = state.databases.get(database_name)
+    else:
+        existing_db = db.session.query(Database).filter_by(database_name=database_name).first()
     if existing_db:
-        logger.info(f"Database '{database_name}' already exists with id={existing_db.id}")
+        changed = []
+        if state is not None and existing_db.sqlalchemy_uri != sqlalchemy_uri:
+            existing_db.sqlalchemy_uri = sqlalchemy_uri
+            changed.append('uri')
+        if existing_db.cache_timeout != cache_timeout:
+            existing_db.cache_timeout = cache_timeout
+            changed.append('cache_timeout')
+        if json.loads(existing_db.extra or '{}') != extra:
+            existing_db.extra = json.dumps(extra)
+            changed.append('extra')
+        if not changed:
+            logger.info(f"Database '{database_name}' already exists with id={existing_db.id}")
+            return existing_db.id
+        if state is not None:
+            state.updated += 1
+        else:
+            db.session.commit()
+        logger.info(f"Database '{database_name}' updated ({', '.join(changed)})")
         return existing_db.id
     
     logger.info(f"Creating database connection: {database_name}")
@@ -79,25 +231,36 @@ def get_or_create_database(database_name: str, sqlalchemy_uri: str) -> Optional[
             allow_cvas=True,
             allow_dml=True,
             allow_run_async=True,
-            cache_timeout=None,
-            extra='{"allows_virtual_table_explore": true, "engine_params": {"connect_args": {"source": "superset"}}}'
+            cache_timeout=cache_timeout,
+            extra=json.dumps(extra),
         )
         db.session.add(database)
-        db.session.commit()
+        if state is not None:
+            db.session.flush()
+            state.databases[database_name] = database
+            state.created += 1
+        else:
+            db.session.commit()
         logger.info(f"Database '{database_name}' created successfully with id={database.id}")
         return database.id
     except Exception as e:
         logger.error(f"Failed to create database '{database_name}': {e}")
+        if state is not None:
+            raise
         db.session.rollback()
         return None
 
 
-def test_database_connection(database_id: int, database_name: str) -> bool:
+def test_database_connection(database_id: int, database_name: str,
+                             state: Optional[MetadataState] = None) -> bool:
     """Test database connection."""
     from superset import db
     from superset.models.core import Database
     
-    database = db.session.query(Database).get(database_id)
+    if state is not None:
+        database = state.databases.get(database_name)
+    else:
+        database = db.session.query(Database).get(database_id)
     if not database:
         logger.error(f"Database with id={database_id} not found")
         return False
@@ -112,20 +275,205 @@ def test_database_connection(database_id: int, database_name: str) -> bool:
         return False
 
 
-def create_dataset(database_id: int, schema: str, table_name: str, dataset_name: str) -> Optional[int]:
-    """Create a dataset (table reference) if it doesn't exist."""
+def load_column_profile(path: str = COLUMN_PROFILE_PATH) -> dict:
+    """Load the raw table column profile, or an empty one if it was not generated."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        logger.info(f"Loaded column profile for {len(profile)} tables from {path}")
+        return profile
+    except FileNotFoundError:
+        logger.info(f"No column profile at {path} - dataset columns keep Superset defaults")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read column profile {path}: {e}")
+    return {}
+
+
+def apply_column_profile(dataset, table_profile: dict) -> int:
+    """Annotate dataset columns with profiled statistics. Returns columns updated."""
+    profiled = table_profile.get('columns', {})
+    updated = 0
+    for column in dataset.columns:
+        stats = profiled.get(column.column_name)
+        if not stats:
+            continue
+        column.description = (
+            f"{stats['type']}; {stats['null_fraction']:.1%} null; "
+            f"~{stats['distinct_count']} distinct; "
+            f"range {stats['min']} .. {stats['max']}; avg length {stats['avg_length']}"
+        )
+        selectable = (
+            stats['distinct_count'] <= FILTER_MAX_DISTINCT
+            and stats['avg_length'] <= FILTER_MAX_AVG_LENGTH
+        )
+        column.filterable = selectable
+        column.groupby = selectable
+        updated += 1
+    return updated
+
+
+def fetch_dataset_metadata(dataset, commit: bool = True):
+    """Refresh dataset columns from the database.
+    Older Superset versions commit inside fetch_metadata unless told not to.
+    """
+    import inspect
+    if 'commit' in inspect.signature(dataset.fetch_metadata).parameters:
+        return dataset.fetch_metadata(commit=commit)
+    return dataset.fetch_metadata()
+
+
+def run_in_app_threads(func, items: list, jobs: int, timeout: float, name: str) -> list:
+    """Call func(item) inside an app context for each item on up to `jobs` worker threads.
+    Returns, in order, the result or the exception per item. An item not finished within
+    `timeout` seconds of its start gets a TimeoutError; its worker is a daemon thread,
+    abandoned and replaced so the pool keeps its size.
+    """
+    from flask import current_app
+    app = current_app._get_current_object()
+
+    results: list = [None] * len(items)
+    done = [False] * len(items)
+    started = {}
+    tasks: "queue.Queue[int]" = queue.Queue()
+    for i in range(len(items)):
+        tasks.put(i)
+    lock = threading.Lock()
+    finished = threading.Condition(lock)
+
+    def worker():
+        while True:
+            try:
+                i = tasks.get_nowait()
+            except queue.Empty:
+                return
+            with lock:
+                started[i] = time.monotonic()
+            try:
+                with app.app_context():
+                    result = func(items[i])
+            except Exception as e:
+                result = e
+            with lock:
+                if done[i]:
+                    return  # timed out and replaced meanwhile
+                results[i], done[i] = result, True
+                finished.notify()
+
+    def start_worker():
+        threading.Thread(target=worker, name=name, daemon=True).start()
+
+    for _ in range(max(1, min(jobs, len(items)))):
+        start_worker()
+    with lock:
+        while not all(done):
+            now = time.monotonic()
+            for i, t in started.items():
+                if not done[i] and now - t > timeout:
+                    results[i], done[i] = TimeoutError(f"not done after {timeout:.0f}s"), True
+                    start_worker()
+            finished.wait(0.5)
+    return results
+
+
+def describe_datasets(datasets: list, jobs: int = METADATA_JOBS,
+                      timeout: float = METADATA_TIMEOUT) -> list:
+    """Run external_metadata() (the Trino DESCRIBE round trip) for each dataset on up to
+    `jobs` worker threads. Returns, in order, the columns or the exception per dataset.
+    """
+    return run_in_app_threads(
+        lambda dataset: dataset.external_metadata(), datasets, jobs, timeout, "superset-describe"
+    )
+
+
+def apply_external_metadata(dataset, columns):
+    """Merge already described columns with fetch_metadata(), without another round trip."""
+    dataset.external_metadata = lambda: columns
+    try:
+        fetch_dataset_metadata(dataset, commit=False)
+    finally:
+        del dataset.external_metadata
+
+
+def fetch_pending_metadata(pending: List[tuple], state: Optional[MetadataState] = None) -> int:
+    """Describe (dataset, name, profile) entries concurrently, then merge their columns
+    and profiles on this thread. Per-object mode commits once for all of them; in bulk
+    mode the caller's transaction does. Returns the datasets described.
+    """
+    from superset import db
+
+    if not pending:
+        return 0
+    started = time.monotonic()
+    # Workers must not touch the session: load what external_metadata reads here
+    for dataset, _, _ in pending:
+        dataset.table_name, dataset.database.sqlalchemy_uri
+
+    results = describe_datasets([dataset for dataset, _, _ in pending])
+    described = 0
+    for (dataset, dataset_name, table_profile), result in zip(pending, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            apply_external_metadata(dataset, result)
+            described += 1
+        except Exception as e:
+            logger.warning(f"Could not fetch metadata for '{dataset_name}': {e}")
+            logger.warning("Table may not exist or may be empty - dataset may not work in charts")
+        if table_profile:
+            apply_column_profile(dataset, table_profile)
+
+    if state is None:
+        try:
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to save dataset metadata: {e}")
+            db.session.rollback()
+    logger.info(
+        f"Described {described}/{len(pending)} datasets in {time.monotonic() - started:.2f}s "
+        f"({min(METADATA_JOBS, len(pending))} workers)"
+    )
+    return described
+
+
+def create_dataset(database_id: int, schema: str, table_name: str, dataset_name: str,
+                   column_profile: Optional[dict] = None,
+                   state: Optional[MetadataState] = None,
+                   pending: Optional[List[tuple]] = None,
+                   cache_timeout: Optional[int] = None) -> Optional[int]:
+    """Create a dataset (table reference) if it doesn't exist; keep its cache timeout in sync.
+    With `pending`, column metadata is queued for fetch_pending_metadata instead of fetched here.
+    """
     from superset import db
     from superset.connectors.sqla.models import SqlaTable
     
     # Check if dataset already exists
-    existing_dataset = db.session.query(SqlaTable).filter_by(
-        database_id=database_id,
-        schema=schema,
-        table_name=table_name
-    ).first()
+    if state is not None:
+        existing_dataset = state.datasets.get((database_id, schema, table_name))
+    else:
+        existing_dataset = db.session.query(SqlaTable).filter_by(
+            database_id=database_id,
+            schema=schema,
+            table_name=table_name
+        ).first()
     
+    # Typed views share the profile of the raw table they cast
+    profile_key = f"{schema}.{table_name[:-len('_typed')] if table_name.endswith('_typed') else table_name}"
+    table_profile = (column_profile or {}).get(profile_key)
+
     if existing_dataset:
         logger.info(f"Dataset '{dataset_name}' already exists with id={existing_dataset.id}")
+        changed = existing_dataset.cache_timeout != cache_timeout
+        if changed:
+            existing_dataset.cache_timeout = cache_timeout
+            logger.info(f"Dataset '{dataset_name}' cache timeout set to {cache_timeout}")
+            if state is not None:
+                state.updated += 1
+        if REFRESH_METADATA and pending is not None:
+            pending.append((existing_dataset, dataset_name, table_profile))
+        elif table_profile and apply_column_profile(existing_dataset, table_profile):
+            changed = True
+        if changed and state is None:
+            db.session.commit()
         return existing_dataset.id
     
     logger.info(f"Creating dataset: {dataset_name} ({schema}.{table_name})")
@@ -136,14 +484,28 @@ def create_dataset(database_id: int, schema: str, table_name: str, dataset_name:
             schema=schema,
             database_id=database_id,
             sql=None,
+            cache_timeout=cache_timeout,
         )
         db.session.add(dataset)
-        db.session.commit()
-        
+        if state is not None:
+            db.session.flush()
+            state.datasets[(database_id, schema, table_name)] = dataset
+            state.created += 1
+        else:
+            db.session.commit()
+
+        if pending is not None:
+            pending.append((dataset, dataset_name, table_profile))
+            logger.info(f"Dataset '{dataset_name}' created with id={dataset.id}, columns pending")
+            return dataset.id
+
         # Refresh columns
         try:
-            dataset.fetch_metadata()
-            db.session.commit()
+            fetch_dataset_metadata(dataset, commit=state is None)
+            if table_profile:
+                apply_column_profile(dataset, table_profile)
+            if state is None:
+                db.session.commit()
             logger.info(f"Dataset '{dataset_name}' created successfully with id={dataset.id}")
         except Exception as e:
             logger.warning(f"Could not fetch metadata for '{dataset_name}': {e}")
@@ -152,20 +514,84 @@ def create_dataset(database_id: int, schema: str, table_name: str, dataset_name:
         return dataset.id
     except Exception as e:
         logger.error(f"Failed to create dataset '{dataset_name}': {e}")
+        if state is not None:
+            raise
         db.session.rollback()
         return None
 
 
-def create_chart(slice_name: str, viz_type: str, datasource_id: int, params: dict, datasource_name: str = "") -> Optional[int]:
-    """Create a chart if it doesn't exist."""
+def chart_query_context(viz_type: str, datasource_id: int, params: dict) -> dict:
+    """The query context the chart data API runs for a chart, built from its form params.
+
+    Superset saves one when a chart is saved in Explore; charts of the newer (non-legacy)
+    types cannot be queried, and so not warmed up, without it.
+    """
+    metrics = list(params.get('metrics') or ([params['metric']] if params.get('metric') else []))
+    columns = list(params.get('groupby') or [])
+    columns += [params[axis] for axis in ('x', 'y') if isinstance(params.get(axis), str)]
+    filters, clauses = [], {'WHERE': [], 'HAVING': []}
+    for adhoc in params.get('adhoc_filters') or []:
+        if adhoc.get('expressionType') == 'SQL':
+            clauses[adhoc.get('clause', 'WHERE')].append(f"({adhoc['sqlExpression']})")
+        else:
+            filters.append({'col': adhoc['subject'], 'op': adhoc['operator'], 'val': adhoc.get('comparator')})
+    query = {
+        'columns': columns,
+        'metrics': metrics,
+        'filters': filters,
+        'extras': {'where': ' AND '.join(clauses['WHERE']), 'having': ' AND '.join(clauses['HAVING'])},
+        'orderby': [[metrics[0], not params.get('order_desc', True)]] if metrics and columns else [],
+        'annotation_layers': [],
+        'url_params': {},
+        'custom_params': {},
+        'custom_form_data': {},
+    }
+    if params.get('row_limit'):
+        query['row_limit'] = params['row_limit']
+    return {
+        'datasource': {'id': datasource_id, 'type': 'table'},
+        'force': False,
+        'queries': [query],
+        'form_data': {**params, 'viz_type': viz_type, 'datasource': f"{datasource_id}__table"},
+        'result_format': 'json',
+        'result_type': 'full',
+    }
+
+
+def create_chart(slice_name: str, viz_type: str, datasource_id: int, params: dict, datasource_name: str = "",
+                 state: Optional[MetadataState] = None) -> Optional[int]:
+    """Create a chart if it doesn't exist (in bulk mode, also update it if it differs)."""
     from superset import db
     from superset.models.slice import Slice
     import json
     
+    query_context = json.dumps(chart_query_context(viz_type, datasource_id, params), sort_keys=True)
     # Check if chart already exists
-    existing_slice = db.session.query(Slice).filter_by(slice_name=slice_name).first()
+    if state is not None:
+        existing_slice = state.slices.get(slice_name)
+        if existing_slice:
+            desired = {
+                'viz_type': viz_type,
+                'datasource_id': datasource_id,
+                'datasource_type': 'table',
+                'params': json.dumps(params),
+                'query_context': query_context,
+                'datasource_name': datasource_name or f"table_{datasource_id}",
+            }
+            changed = {k: v for k, v in desired.items() if getattr(existing_slice, k) != v}
+            for key, value in changed.items():
+                setattr(existing_slice, key, value)
+            if changed:
+                state.updated += 1
+                logger.info(f"Chart '{slice_name}' updated ({', '.join(sorted(changed))})")
+            return existing_slice.id
+    else:
+        existing_slice = db.session.query(Slice).filter_by(slice_name=slice_name).first()
     if existing_slice:
         logger.info(f"Chart '{slice_name}' already exists with id={existing_slice.id}")
+        if not existing_slice.query_context:
+            existing_slice.query_context = query_context
+            db.session.commit()
         return existing_slice.id
     
     logger.info(f"Creating chart: {slice_name} for datasource_id={datasource_id}")
@@ -177,499 +603,602 @@ def create_chart(slice_name: str, viz_type: str, datasource_id: int, params: dic
             datasource_id=datasource_id,
             datasource_type='table',
             params=json.dumps(params),
+            query_context=query_context,
             datasource_name=datasource_name or f"table_{datasource_id}"
         )
         db.session.add(chart)
-        db.session.commit()
+        if state is not None:
+            db.session.flush()
+            state.slices[slice_name] = chart
+            state.created += 1
+        else:
+            db.session.commit()
         logger.info(f"Chart '{slice_name}' created successfully with id={chart.id}")
         return chart.id
     except Exception as e:
         logger.error(f"Failed to create chart '{slice_name}': {e}")
         logger.error(f"Params were: {params}")
+        if state is not None:
+            raise
         db.session.rollback()
         return None
 
 
-def create_dashboard(dashboard_title: str, slug: str, chart_ids: list) -> Optional[int]:
-    """Create a dashboard with charts if it doesn't exist."""
+def dashboard_position_json(chart_ids: list, chart_names: dict) -> dict:
+    """Grid layout with the charts two per row."""
+    chart_elements = [f"CHART-{chart_id}" for chart_id in chart_ids]
+    
+    position_json = {
+        "DASHBOARD_VERSION_KEY": "v2",
+        "ROOT_ID": {
+            "type": "ROOT",
+            "id": "ROOT_ID",
+            "children": ["GRID_ID"]
+        },
+        "GRID_ID": {
+            "type": "GRID",
+            "id": "GRID_ID",
+            "children": chart_elements,
+            "parents": ["ROOT_ID"]
+        }
+    }
+    
+    # Add each chart with proper positioning
+    for chart_id in chart_ids:
+        chart_key = f"CHART-{chart_id}"
+        
+        position_json[chart_key] = {
+            "type": "CHART",
+            "id": chart_key,
+            "children": [],
+            "parents": ["ROOT_ID", "GRID_ID"],
+            "meta": {
+                "width": 24,  # Full width for single column, or 24 for half
+                "height": 16,
+                "chartId": chart_id,
+                "sliceName": chart_names.get(chart_id, f"Chart {chart_id}")
+            }
+        }
+    return position_json
+
+
+def create_dashboard(dashboard_title: str, slug: str, chart_ids: list,
+                     state: Optional[MetadataState] = None) -> Optional[int]:
+    """Create a dashboard with charts if it doesn't exist (in bulk mode, also update it if it differs)."""
     from superset import db
     from superset.models.dashboard import Dashboard
     from superset.models.slice import Slice
     import json
     
     # Check if dashboard already exists
-    existing_dashboard = db.session.query(Dashboard).filter_by(dashboard_title=dashboard_title).first()
-    if existing_dashboard:
+    if state is not None:
+        existing_dashboard = state.dashboards.get(dashboard_title)
+    else:
+        existing_dashboard = db.session.query(Dashboard).filter_by(dashboard_title=dashboard_title).first()
+    if existing_dashboard and state is None:
         logger.info(f"Dashboard '{dashboard_title}' already exists with id={existing_dashboard.id}")
         return existing_dashboard.id
     
-    logger.info(f"Creating dashboard: {dashboard_title} with {len(chart_ids)} charts")
-    
     try:
-        # Get chart slice names for better layout
-        chart_names = {}
-        for chart_id in chart_ids:
-            chart = db.session.query(Slice).get(chart_id)
-            if chart:
-                chart_names[chart_id] = chart.slice_name
+        # Charts in one lookup instead of one query per chart
+        if state is not None:
+            charts = [state.slice_by_id(chart_id) for chart_id in chart_ids]
+        else:
+            by_id = {c.id: c for c in db.session.query(Slice).filter(Slice.id.in_(chart_ids)).all()}
+            charts = [by_id.get(chart_id) for chart_id in chart_ids]
+        charts = [c for c in charts if c is not None]
+        position_json = json.dumps(dashboard_position_json(chart_ids, {c.id: c.slice_name for c in charts}))
         
-        # Create grid layout - simpler structure
-        chart_elements = []
-        for idx, chart_id in enumerate(chart_ids):
-            col = (idx % 2) * 24  # 0 or 24 (half width each)
-            row = (idx // 2) * 16  # Stack rows
-            chart_key = f"CHART-{chart_id}"
-            chart_elements.append(chart_key)
-        
-        position_json = {
-            "DASHBOARD_VERSION_KEY": "v2",
-            "ROOT_ID": {
-                "type": "ROOT",
-                "id": "ROOT_ID",
-                "children": ["GRID_ID"]
-            },
-            "GRID_ID": {
-                "type": "GRID",
-                "id": "GRID_ID",
-                "children": chart_elements,
-                "parents": ["ROOT_ID"]
-            }
-        }
-        
-        # Add each chart with proper positioning
-        for idx, chart_id in enumerate(chart_ids):
-            col = (idx % 2) * 24
-            row = (idx // 2) * 16
-            chart_key = f"CHART-{chart_id}"
-            
-            position_json[chart_key] = {
-                "type": "CHART",
-                "id": chart_key,
-                "children": [],
-                "parents": ["ROOT_ID", "GRID_ID"],
-                "meta": {
-                    "width": 24,  # Full width for single column, or 24 for half
-                    "height": 16,
-                    "chartId": chart_id,
-                    "sliceName": chart_names.get(chart_id, f"Chart {chart_id}")
-                }
-            }
+        if existing_dashboard:
+            changed = []
+            if existing_dashboard.slug != slug:
+                existing_dashboard.slug = slug
+                changed.append('slug')
+            if existing_dashboard.position_json != position_json:
+                existing_dashboard.position_json = position_json
+                changed.append('layout')
+            if {c.id for c in existing_dashboard.slices} != {c.id for c in charts}:
+                existing_dashboard.slices = charts
+                changed.append('charts')
+            if changed:
+                state.updated += 1
+                logger.info(f"Dashboard '{dashboard_title}' updated ({', '.join(changed)})")
+            else:
+                logger.info(f"Dashboard '{dashboard_title}' already exists with id={existing_dashboard.id}")
+            return existing_dashboard.id
         
+        logger.info(f"Creating dashboard: {dashboard_title} with {len(chart_ids)} charts")
         dashboard = Dashboard(
             dashboard_title=dashboard_title,
             slug=slug,
-            position_json=json.dumps(position_json),
+            position_json=position_json,
             published=True,
         )
         
         # Link charts to dashboard
-        for chart_id in chart_ids:
-            chart = db.session.query(Slice).get(chart_id)
-            if chart:
-                dashboard.slices.append(chart)
+        dashboard.slices.extend(charts)
         
         db.session.add(dashboard)
-        db.session.commit()
+        if state is not None:
+            db.session.flush()
+            state.dashboards[dashboard_title] = dashboard
+            state.created += 1
+        else:
+            db.session.commit()
         logger.info(f"Dashboard '{dashboard_title}' created successfully with id={dashboard.id}")
         return dashboard.id
     except Exception as e:
         logger.error(f"Failed to create dashboard '{dashboard_title}': {e}")
+        if state is not None:
+            raise
         import traceback
         traceback.print_exc()
         db.session.rollback()
         return None
 
 
-def setup_connections_and_datasets():
-    """Set up Trino connections and sample datasets."""
-    
-    # Database connections configuration
-    databases = [
+def load_spec(path: str = SPEC_PATH) -> dict:
+    """Read the provisioning spec (YAML, or JSON for .json files)."""
+    with open(path) as f:
+        if path.endswith('.json'):
+            spec = json.load(f)
+        elif yaml is None:
+            raise RuntimeError(f"PyYAML is required to read {path}")
+        else:
+            spec = yaml.safe_load(f) or {}
+    for section in ('databases', 'freshness', 'charts', 'dashboards'):
+        if not isinstance(spec.get(section, []), list):
+            raise ValueError(f"{path}: '{section}' must be a list")
+    return spec
+
+
+def load_manifest_tables(path: str = MANIFEST_PATH) -> List[str]:
+    """'schema.table' keys of the tables generate_trino_schemas.py created."""
+    try:
+        with open(path) as f:
+            tables = sorted(json.load(f).get('tables', {}))
+        logger.info(f"Loaded {len(tables)} tables from manifest {path}")
+        return tables
+    except FileNotFoundError:
+        logger.warning(f"No schema manifest at {path} - run generate_trino_schemas.py first")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read schema manifest {path}: {e}")
+    return []
+
+
+def freshness_policy(freshness: list, dataset_name: str) -> Optional[dict]:
+    """First freshness policy whose `match` glob matches 'schema.table', if any."""
+    return next((p for p in freshness if fnmatch.fnmatchcase(dataset_name, p['match'])), None)
+
+
+def resolve_spec(spec: dict, manifest_tables: List[str]) -> dict:
+    """Expand manifest references and defaults into the exact objects to provision."""
+    freshness = [
         {
-            "name": "Trino - Delta Lake (Production)",
-            "uri": "trino://admin@trino:8080/delta",
-            "schemas": {
-                "prod_hotels": ["hotels"],
-                "prod_reviews": ["reviews"],
-                "prod_reservations": ["reservations"],
-            }
-        },
+            'match': policy['match'],
+            'cache_timeout': policy.get('cache_timeout'),
+            'invalidated_by': sorted(policy.get('invalidated_by') or []),
+        }
+        for policy in spec.get('freshness', [])
+    ]
+    databases = []
+    for entry in spec.get('databases', []):
+        datasets = {
+            (schema, table)
+            for schema, tables in (entry.get('datasets') or {}).items()
+            for table in tables
+        }
+        prefix = entry.get('manifest')
+        if prefix is not None:
+            prefix = '' if prefix is True else prefix
+            datasets.update(
+                tuple(key.split('.', 1)) for key in manifest_tables if key.startswith(prefix)
+            )
+        databases.append({
+            'name': entry['name'],
+            'uri': entry['uri'],
+            'cache_timeout': entry.get('cache_timeout'),
+            'engine': entry.get('engine') or {},
+            'datasets': sorted(datasets),
+        })
+    charts = [
         {
-            "name": "Trino - Hive (Raw Data)",
-            "uri": "trino://admin@trino:8080/hive",
-            "schemas": {
-                "raw_hotels": ["hotels_makemytrip"],
-                "raw_reviews": ["reviews_detailed", "reviews_aggregated", "reviews_by_city"],
-                "raw_reservations": ["reservations_standard", "reservations_standard_2", "reservations_detailed", "makemytrip_external"],
-            }
+            'name': chart['name'],
+            'dataset': chart['dataset'],
+            'viz_type': chart['viz_type'],
+            'params': chart.get('params') or {},
         }
+        for chart in spec.get('charts', [])
     ]
-    
+    dashboards = [
+        {'title': d['title'], 'slug': d['slug'], 'charts': list(d.get('charts') or [])}
+        for d in spec.get('dashboards', [])
+    ]
+    return {'databases': databases, 'freshness': freshness, 'charts': charts, 'dashboards': dashboards}
+
+
+def spec_hash(spec: dict, column_profile: dict) -> str:
+    """Stable digest of everything a reconciliation run depends on."""
+    payload = json.dumps(
+        {'version': SPEC_STATE_VERSION, 'spec': spec, 'profile': column_profile},
+        sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def desired_names(spec: dict) -> dict:
+    """Names of the objects the spec manages, per section; keys of the spec state."""
+    datasets = {f"{schema}.{table}" for d in spec['databases'] for schema, table in d['datasets']}
+    # Such charts stay desired, so the run is incomplete and its hash is not recorded
+    for chart in spec['charts']:
+        if chart['dataset'] not in datasets:
+            logger.error(f"Chart '{chart['name']}': dataset {chart['dataset']} is not provisioned by any database")
+    return {
+        'databases': {d['name'] for d in spec['databases']},
+        'datasets': datasets,
+        'charts': {c['name'] for c in spec['charts']},
+        'dashboards': {d['title'] for d in spec['dashboards']},
+    }
+
+
+def load_spec_state(path: str = SPEC_STATE_PATH) -> dict:
+    """Hash and object ids of the last reconciliation, or an empty state."""
+    empty = {'version': SPEC_STATE_VERSION, 'hash': None,
+             'databases': {}, 'datasets': {}, 'charts': {}, 'dashboards': {}}
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return empty
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read spec state {path}: {e}")
+        return empty
+    if state.get('version') != SPEC_STATE_VERSION:
+        return empty
+    return {**empty, **state}
+
+
+def save_spec_state(state: dict, path: str = SPEC_STATE_PATH):
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not save spec state {path}: {e}")
+
+
+def managed_objects_exist(previous: dict) -> bool:
+    """Guard against a reset metadata database behind an unchanged spec: one id query per model."""
+    from superset import db
+    from superset.models.core import Database
+    from superset.connectors.sqla.models import SqlaTable
+    from superset.models.slice import Slice
+    from superset.models.dashboard import Dashboard
+
+    for section, model in (('databases', Database), ('datasets', SqlaTable),
+                           ('charts', Slice), ('dashboards', Dashboard)):
+        ids = set(previous[section].values())
+        if ids and db.session.query(model.id).filter(model.id.in_(ids)).count() != len(ids):
+            logger.info(f"Managed {section} are missing from the metadata database")
+            return False
+    return True
+
+
+def setup_connections_and_datasets(databases: list, freshness: list, column_profile: dict,
+                                   state: Optional[MetadataState] = None):
+    """Create the spec's Trino connections and their datasets.
+    Datasets take the cache timeout of their freshness policy; without one they inherit
+    the database's.
+    """
     created_databases = {}
     created_datasets = {}
-    
+    pending_metadata = []
+
     # Create database connections
     for db_config in databases:
-        db_id = get_or_create_database(db_config["name"], db_config["uri"])
+        db_id = get_or_create_database(db_config["name"], db_config["uri"], state, db_config["cache_timeout"],
+                                       database_extra(db_config["engine"]))
         if db_id:
             created_databases[db_config["name"]] = db_id
-            test_database_connection(db_id, db_config["name"])
-            
+            test_database_connection(db_id, db_config["name"], state)
+
             # Create datasets for each schema/table
-            for schema, tables in db_config["schemas"].items():
-                for table in tables:
-                    dataset_name = f"{schema}.{table}"
-                    dataset_id = create_dataset(db_id, schema, table, dataset_name)
-                    if dataset_id:
-                        created_datasets[dataset_name] = dataset_id
-    
+            for schema, table in db_config["datasets"]:
+                dataset_name = f"{schema}.{table}"
+                policy = freshness_policy(freshness, dataset_name)
+                dataset_id = create_dataset(db_id, schema, table, dataset_name, column_profile, state,
+                                            pending_metadata, policy['cache_timeout'] if policy else None)
+                if dataset_id:
+                    created_datasets[dataset_name] = dataset_id
+
+    # Describe every new (or refreshed) dataset concurrently, written back in one commit
+    fetch_pending_metadata(pending_metadata, state)
+
     return created_databases, created_datasets
 
 
-def setup_sample_charts_and_dashboards(created_datasets: dict):
-    """Create sample charts and dashboards."""
-    
-    prod_chart_ids = []
-    raw_chart_ids = []
-    
-    # Production charts (note: these may be empty until ETL runs)
-    if "prod_hotels.hotels" in created_datasets:
-        hotels_dataset_id = created_datasets["prod_hotels.hotels"]
-        
-        # Chart 1: Hotels by Country
-        chart_id = create_chart(
-            slice_name="[Prod] Hotels by Country",
-            viz_type="dist_bar",
-            datasource_id=hotels_dataset_id,
-            datasource_name="prod_hotels.hotels",
-            params={
-                "metrics": ["count"],
-                "groupby": ["country"],
-                "row_limit": 15,
-                "adhoc_filters": [],
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            prod_chart_ids.append(chart_id)
-        
-        # Chart 2: Hotels by City
-        chart_id = create_chart(
-            slice_name="[Prod] Top Cities by Hotel Count",
-            viz_type="dist_bar",
-            datasource_id=hotels_dataset_id,
-            datasource_name="prod_hotels.hotels",
-            params={
-                "metrics": ["count"],
-                "groupby": ["city"],
-                "row_limit": 10,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            prod_chart_ids.append(chart_id)
-    
-    if "prod_reviews.reviews" in created_datasets:
-        reviews_dataset_id = created_datasets["prod_reviews.reviews"]
-        
-        # Chart 3: Average Rating by Nationality
-        chart_id = create_chart(
-            slice_name="[Prod] Avg Rating by Reviewer Nationality",
-            viz_type="dist_bar",
-            datasource_id=reviews_dataset_id,
-            datasource_name="prod_reviews.reviews",
-            params={
-                "metrics": [{"expressionType": "SIMPLE", "column": {"column_name": "overall_rating"}, "aggregate": "AVG", "label": "Avg Rating"}],
-                "groupby": ["reviewer_nationality"],
-                "row_limit": 15,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            prod_chart_ids.append(chart_id)
-    
-    if "prod_reservations.reservations" in created_datasets:
-        reservations_dataset_id = created_datasets["prod_reservations.reservations"]
-        
-        # Chart 4: Bookings by Market Segment
-        chart_id = create_chart(
-            slice_name="[Prod] Bookings by Market Segment",
-            viz_type="pie",
-            datasource_id=reservations_dataset_id,
-            datasource_name="prod_reservations.reservations",
-            params={
-                "metrics": ["count"],
-                "groupby": ["market_segment"],
-                "row_limit": 10,
-            }
-        )
-        if chart_id:
-            prod_chart_ids.append(chart_id)
-    
-    # Raw data charts - using actual column names from schemas
-    if "raw_hotels.hotels_makemytrip" in created_datasets:
-        raw_hotels_dataset_id = created_datasets["raw_hotels.hotels_makemytrip"]
-        
-        # Chart 1: Hotels by City (city_name column)
-        chart_id = create_chart(
-            slice_name="[Raw] Hotels by City",
-            viz_type="dist_bar",
-            datasource_id=raw_hotels_dataset_id,
-            datasource_name="raw_hotels.hotels_makemytrip",
-            params={
-                "metrics": ["count"],
-                "groupby": ["city_name"],
-                "row_limit": 15,
-                "adhoc_filters": [],
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 2: Hotels by Rating
-        chart_id = create_chart(
-            slice_name="[Raw] Hotels by Rating Distribution",
-            viz_type="pie",
-            datasource_id=raw_hotels_dataset_id,
-            datasource_name="raw_hotels.hotels_makemytrip",
-            params={
-                "metrics": ["count"],
-                "groupby": ["hotel_rating"],
-                "row_limit": 10,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 3: Total Hotels Count
-        chart_id = create_chart(
-            slice_name="[Raw] Total Hotels",
-            viz_type="big_number_total",
-            datasource_id=raw_hotels_dataset_id,
-            datasource_name="raw_hotels.hotels_makemytrip",
-            params={
-                "metric": "count",
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 4: Hotels by Country
-        chart_id = create_chart(
-            slice_name="[Raw] Hotels by Country",
-            viz_type="dist_bar",
-            datasource_id=raw_hotels_dataset_id,
-            datasource_name="raw_hotels.hotels_makemytrip",
-            params={
-                "metrics": ["count"],
-                "groupby": ["county_name"],
-                "row_limit": 15,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-    
-    if "raw_reviews.reviews_by_city" in created_datasets:
-        raw_reviews_city_dataset_id = created_datasets["raw_reviews.reviews_by_city"]
-        
-        # Chart 4: Reviews by City
-        chart_id = create_chart(
-            slice_name="[Raw] Reviews by City",
-            viz_type="dist_bar",
-            datasource_id=raw_reviews_city_dataset_id,
-            datasource_name="raw_reviews.reviews_by_city",
-            params={
-                "metrics": ["count"],
-                "groupby": ["city"],
-                "row_limit": 12,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 5: Average Overall Rating by City
-        chart_id = create_chart(
-            slice_name="[Raw] Avg Rating by City",
-            viz_type="dist_bar",
-            datasource_id=raw_reviews_city_dataset_id,
-            datasource_name="raw_reviews.reviews_by_city",
-            params={
-                "metrics": [{"expressionType": "SIMPLE", "column": {"column_name": "overall_rating"}, "aggregate": "AVG", "label": "Avg Rating"}],
-                "groupby": ["city"],
-                "row_limit": 10,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 6: Service vs Cleanliness Scatter
-        chart_id = create_chart(
-            slice_name="[Raw] Service vs Cleanliness Ratings",
-            viz_type="scatter",
-            datasource_id=raw_reviews_city_dataset_id,
-            datasource_name="raw_reviews.reviews_by_city",
-            params={
-                "metrics": ["count"],
-                "x": "service",
-                "y": "cleanliness",
-                "row_limit": 500,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-    
-    if "raw_reviews.reviews_detailed" in created_datasets:
-        raw_reviews_detailed_dataset_id = created_datasets["raw_reviews.reviews_detailed"]
-        
-        # Chart 7: Top Hotels by Review Count
-        chart_id = create_chart(
-            slice_name="[Raw] Most Reviewed Hotels",
-            viz_type="dist_bar",
-            datasource_id=raw_reviews_detailed_dataset_id,
-            datasource_name="raw_reviews.reviews_detailed",
-            params={
-                "metrics": ["count"],
-                "groupby": ["hotel_name"],
-                "row_limit": 15,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 8: Reviews by Nationality
-        chart_id = create_chart(
-            slice_name="[Raw] Top Reviewer Nationalities",
-            viz_type="pie",
-            datasource_id=raw_reviews_detailed_dataset_id,
-            datasource_name="raw_reviews.reviews_detailed",
-            params={
-                "metrics": ["count"],
-                "groupby": ["reviewer_nationality"],
-                "row_limit": 10,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-    
-    if "raw_reservations.reservations_detailed" in created_datasets:
-        raw_reservations_dataset_id = created_datasets["raw_reservations.reservations_detailed"]
-        
-        # Chart 9: Bookings by Country
-        chart_id = create_chart(
-            slice_name="[Raw] Bookings by Country",
-            viz_type="dist_bar",
-            datasource_id=raw_reservations_dataset_id,
-            datasource_name="raw_reservations.reservations_detailed",
-            params={
-                "metrics": ["count"],
-                "groupby": ["country"],
-                "row_limit": 15,
-                "order_desc": True,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 10: Bookings by Market Segment
-        chart_id = create_chart(
-            slice_name="[Raw] Market Segment Distribution",
-            viz_type="pie",
-            datasource_id=raw_reservations_dataset_id,
-            datasource_name="raw_reservations.reservations_detailed",
-            params={
-                "metrics": ["count"],
-                "groupby": ["market_segment"],
-                "row_limit": 10,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 11: Canceled vs Completed Bookings
-        chart_id = create_chart(
-            slice_name="[Raw] Cancellation Status",
-            viz_type="pie",
-            datasource_id=raw_reservations_dataset_id,
-            datasource_name="raw_reservations.reservations_detailed",
-            params={
-                "metrics": ["count"],
-                "groupby": ["is_canceled"],
-                "row_limit": 5,
-            }
-        )
-        if chart_id:
-            raw_chart_ids.append(chart_id)
-        
-        # Chart 12: Total Reservations
+def setup_charts_and_dashboards(charts: list, dashboards: list, created_datasets: dict,
+                                state: Optional[MetadataState] = None):
+    """Create the spec's charts and dashboards. Returns chart and dashboard ids by name."""
+    chart_ids = {}
+    for chart in charts:
+        dataset_id = created_datasets.get(chart['dataset'])
+        if not dataset_id:
+            logger.warning(f"Skipping chart '{chart['name']}': dataset {chart['dataset']} is not provisioned")
+            continue
         chart_id = create_chart(
-            slice_name="[Raw] Total Reservations",
-            viz_type="big_number_total",
-            datasource_id=raw_reservations_dataset_id,
-            datasource_name="raw_reservations.reservations_detailed",
-            params={
-                "metric": "count",
-            }
+            slice_name=chart['name'],
+            viz_type=chart['viz_type'],
+            datasource_id=dataset_id,
+            datasource_name=chart['dataset'],
+            params=chart['params'],
+            state=state,
         )
         if chart_id:
-            raw_chart_ids.append(chart_id)
-    
-    # Create dashboards
-    all_chart_ids = []
-    
-    if prod_chart_ids:
-        dashboard_id = create_dashboard(
-            dashboard_title="Production - Hotel Analytics",
-            slug="production-hotel-analytics",
-            chart_ids=prod_chart_ids
-        )
-        if dashboard_id:
-            logger.info(f"Production dashboard created. Access at: http://localhost:8088/superset/dashboard/{dashboard_id}/")
-        all_chart_ids.extend(prod_chart_ids)
-    
-    if raw_chart_ids:
+            chart_ids[chart['name']] = chart_id
+
+    dashboard_ids = {}
+    for dashboard in dashboards:
+        ids = [chart_ids[name] for name in dashboard['charts'] if name in chart_ids]
+        if not ids:
+            logger.warning(f"Skipping dashboard '{dashboard['title']}': none of its charts are provisioned")
+            continue
         dashboard_id = create_dashboard(
-            dashboard_title="Raw Data - Hotel Overview",
-            slug="raw-data-hotel-overview",
-            chart_ids=raw_chart_ids
+            dashboard_title=dashboard['title'],
+            slug=dashboard['slug'],
+            chart_ids=ids,
+            state=state,
         )
         if dashboard_id:
-            logger.info(f"Raw data dashboard created. Access at: http://localhost:8088/superset/dashboard/{dashboard_id}/")
-        all_chart_ids.extend(raw_chart_ids)
-    
-    return all_chart_ids, len(prod_chart_ids), len(raw_chart_ids)
+            dashboard_ids[dashboard['title']] = dashboard_id
+            logger.info(f"Dashboard '{dashboard['title']}': http://localhost:8088/superset/dashboard/{dashboard_id}/")
+
+    return chart_ids, dashboard_ids
+
+
+def delete_drift(previous: dict, desired: dict, state: Optional[MetadataState] = None) -> int:
+    """Delete objects a previous spec provisioned that the current one no longer lists.
+    Objects created by hand are not in the spec state, so they are never touched.
+    """
+    from superset import db
+    from superset.models.core import Database
+    from superset.connectors.sqla.models import SqlaTable
+    from superset.models.slice import Slice
+    from superset.models.dashboard import Dashboard
+
+    deleted = 0
+    # Dependents first: dashboards hold charts, datasets belong to databases
+    for section, model in (('dashboards', Dashboard), ('charts', Slice),
+                           ('datasets', SqlaTable), ('databases', Database)):
+        for name, object_id in previous[section].items():
+            if name in desired[section]:
+                continue
+            obj = db.session.query(model).get(object_id)
+            if obj is None:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.delete(obj)
+                    db.session.flush()
+                deleted += 1
+                logger.info(f"Deleted {section[:-1]} '{name}' (no longer in the spec)")
+            except Exception as e:
+                logger.warning(f"Could not delete {section[:-1]} '{name}': {e}")
+    if state is not None:
+        state.deleted += deleted
+    else:
+        db.session.commit()
+    return deleted
+
+
+def reconcile(spec: dict, column_profile: dict, previous: dict, desired: dict,
+              state: Optional[MetadataState] = None) -> dict:
+    """Create/update the spec's objects and delete drift. Returns the ids per section."""
+    databases, datasets = setup_connections_and_datasets(spec['databases'], spec['freshness'],
+                                                         column_profile, state)
+    charts, dashboards = setup_charts_and_dashboards(spec['charts'], spec['dashboards'], datasets, state)
+    delete_drift(previous, desired, state)
+    return {'databases': databases, 'datasets': datasets, 'charts': charts, 'dashboards': dashboards}
+
+
+def provision(force: bool = FORCE_SETUP) -> dict:
+    """Reconcile Superset with the provisioning spec.
+    An unchanged spec (same hash, managed objects still present) is skipped entirely.
+    In bulk mode everything is diffed against prefetched state and committed once;
+    if that transaction fails, it is rolled back and the per-object path is used.
+    """
+    from superset import db
+
+    started = time.monotonic()
+    column_profile = load_column_profile()
+    spec = resolve_spec(load_spec(), load_manifest_tables())
+    digest = spec_hash(spec, column_profile)
+    previous = load_spec_state()
+    if (not force and not REFRESH_METADATA and previous['hash'] == digest
+            and managed_objects_exist(previous)):
+        logger.info(f"Spec {SPEC_PATH} unchanged ({digest[:12]}) - nothing to reconcile")
+        return previous
+
+    logger.info(f"Reconciling spec {SPEC_PATH} ({digest[:12]})")
+    desired = desired_names(spec)
+    result = None
+    if BULK_SETUP:
+        try:
+            state = MetadataState()
+            result = reconcile(spec, column_profile, previous, desired, state)
+            db.session.commit()
+            logger.info(
+                f"Bulk provisioning committed in {time.monotonic() - started:.2f}s "
+                f"({state.created} created, {state.updated} updated, {state.deleted} deleted)"
+            )
+        except Exception as e:
+            db.session.rollback()
+            result = None
+            logger.warning(f"Bulk provisioning failed and was rolled back ({e}); retrying object by object")
+    if result is None:
+        result = reconcile(spec, column_profile, previous, desired)
+
+    # Only a complete run records the hash; otherwise the next run reconciles again
+    complete = all(desired[s] <= set(result[s]) for s in ('databases', 'datasets', 'charts'))
+    for section in ('databases', 'datasets', 'charts', 'dashboards'):
+        # keep tracking objects that failed this time, so later drift still deletes them
+        for name, object_id in previous[section].items():
+            if name in desired[section]:
+                result[section].setdefault(name, object_id)
+    result.update(version=SPEC_STATE_VERSION, hash=digest if complete else None)
+    save_spec_state(result)
+    return result
+
+
+def chart_warm_up_command():
+    """Superset's ChartWarmUpCacheCommand; its module moved between releases."""
+    for module in ('superset.commands.chart.warm_up_cache', 'superset.charts.commands.warm_up_cache'):
+        try:
+            return importlib.import_module(module).ChartWarmUpCacheCommand
+        except ImportError:
+            continue
+    return None
+
+
+def warm_up_charts(charts: dict, jobs: int = WARMUP_JOBS, timeout: float = WARMUP_TIMEOUT,
+                   report_path: str = WARMUP_REPORT_PATH) -> list:
+    """Run the query of each chart ({name: id}) on up to `jobs` worker threads, bypassing
+    and refilling the results cache, as the admin user. Per-chart latency and status are
+    logged and written to `report_path`. Returns the report entries.
+    """
+    from superset import security_manager
+    from superset.utils.core import override_user
+
+    command = chart_warm_up_command()
+    if command is None:
+        logger.warning("This Superset has no ChartWarmUpCacheCommand - skipping cache warm-up")
+        return []
+    if not charts:
+        return []
+    username = os.environ.get('SUPERSET_ADMIN_USERNAME', 'admin')
+    if security_manager.find_user(username=username) is None:
+        logger.warning(f"Admin user '{username}' not found - skipping cache warm-up")
+        return []
+
+    def warm_up(chart_id):
+        chart_started = time.monotonic()
+        with override_user(security_manager.find_user(username=username)):
+            outcome = command(chart_id, None, None).run()
+        return time.monotonic() - chart_started, outcome
+
+    started = time.monotonic()
+    names = sorted(charts)
+    results = run_in_app_threads(warm_up, [charts[name] for name in names], jobs, timeout, "superset-warmup")
+    entries = []
+    for name, result in zip(names, results):
+        entry = {'chart': name, 'id': charts[name], 'seconds': None, 'error': None}
+        if isinstance(result, Exception):
+            entry['error'] = str(result) or type(result).__name__
+        else:
+            entry['seconds'] = round(result[0], 3)
+            entry['error'] = result[1].get('viz_error')
+        entries.append(entry)
+        if entry['error']:
+            logger.warning(f"Warm-up of '{name}' failed: {entry['error']}")
+        else:
+            logger.info(f"Warmed up '{name}' in {entry['seconds']:.2f}s")
+
+    warmed = sum(1 for e in entries if not e['error'])
+    elapsed = time.monotonic() - started
+    logger.info(f"Warmed up {warmed}/{len(entries)} charts in {elapsed:.2f}s ({min(jobs, len(entries))} workers)")
+    try:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump({'finished_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                       'seconds': round(elapsed, 3), 'charts': entries}, f, indent=2)
+            f.write('\n')
+    except OSError as e:
+        logger.warning(f"Could not save warm-up report {report_path}: {e}")
+    return entries
+
+
+def invalidate_cached_results(dataset_ids: list) -> int:
+    """Delete the cached query results Superset recorded for these datasets. Returns the
+    keys deleted. Keys are only recorded with STORE_CACHE_KEYS_IN_METADATA_DB = True;
+    without it, the forced warm-up that follows still overwrites the managed charts' results.
+    """
+    from superset import db
+    from superset.extensions import cache_manager
+    from superset.models.cache import CacheKey
+
+    uids = [f"{dataset_id}__table" for dataset_id in dataset_ids]
+    if not uids:
+        return 0
+    keys = db.session.query(CacheKey).filter(CacheKey.datasource_uid.in_(uids)).all()
+    if keys:
+        cache_manager.data_cache.delete_many(*[key.cache_key for key in keys])
+        for key in keys:
+            db.session.delete(key)
+        db.session.commit()
+    return len(keys)
+
+
+def invalidate(event: str) -> list:
+    """Drop and re-warm the cached results of the managed datasets whose freshness policy
+    is invalidated by `event` (e.g. 'upload', 'etl'). Returns the warm-up report entries.
+    """
+    spec = resolve_spec(load_spec(), load_manifest_tables())
+    managed = load_spec_state()
+    datasets = {
+        name for name in managed['datasets']
+        if event in (freshness_policy(spec['freshness'], name) or {}).get('invalidated_by', [])
+    }
+    deleted = invalidate_cached_results([managed['datasets'][name] for name in sorted(datasets)])
+    charts = {
+        chart['name']: managed['charts'][chart['name']]
+        for chart in spec['charts']
+        if chart['dataset'] in datasets and chart['name'] in managed['charts']
+    }
+    logger.info(
+        f"'{event}' invalidates {len(datasets)} datasets: {deleted} cached results dropped, "
+        f"{len(charts)} charts to warm up"
+    )
+    return warm_up_charts(charts)
 
 
 def main():
     """Main setup function."""
+    parser = argparse.ArgumentParser(description="Provision Superset from provisioning.yaml")
+    stage = parser.add_mutually_exclusive_group()
+    stage.add_argument('--warm-up', action='store_true',
+                       help="only re-run the chart queries of the last provisioning")
+    stage.add_argument('--invalidate', metavar='EVENT',
+                       help="only drop and re-warm the results of datasets whose freshness policy "
+                            "lists EVENT (upload, etl)")
+    args = parser.parse_args()
+
     logger.info("Starting Superset auto-configuration...")
     
-    # Wait for Trino to be ready
+    # Wait for Trino to be ready (create_app only needs the metadata database)
     wait_for_trino()
     
-    # Wait a bit for Superset to fully start
-    time.sleep(5)
-    
     try:
         # Set up Flask app context - create app properly
         from superset.app import create_app
         app = create_app()
         
         with app.app_context():
-            # Create connections and datasets
-            created_databases, created_datasets = setup_connections_and_datasets()
-            
-            logger.info(f"Created/verified {len(created_databases)} database connections")
-            logger.info(f"Created/verified {len(created_datasets)} datasets")
-            
-            # Create sample charts and dashboards
-            chart_ids, prod_count, raw_count = setup_sample_charts_and_dashboards(created_datasets)
+            if args.warm_up or args.invalidate:
+                if args.invalidate:
+                    entries = invalidate(args.invalidate)
+                else:
+                    entries = warm_up_charts(load_spec_state()['charts'])
+                if any(e['error'] for e in entries):
+                    sys.exit(1)
+                return
+
+            result = provision()
+            if WARMUP:
+                warm_up_charts(result['charts'])
             
-            logger.info(f"Created {len(chart_ids)} sample charts")
             logger.info("Superset auto-configuration completed successfully!")
             
             # Print summary
@@ -677,15 +1206,13 @@ def main():
             logger.info("SUPERSET SETUP COMPLETE")
             logger.info("="*60)
             logger.info("Database Connections:")
-            for db_name in created_databases.keys():
+            for db_name in result['databases'].keys():
                 logger.info(f"  ✓ {db_name}")
-            logger.info(f"\nDatasets: {len(created_datasets)}")
-            logger.info(f"Charts: {len(chart_ids)}")
-            logger.info(f"  - Production charts: {prod_count}")
-            logger.info(f"  - Raw data charts: {raw_count}")
-            logger.info("\nDashboards Created:")
-            logger.info("  - Production - Hotel Analytics (production Delta Lake data)")
-            logger.info("  - Raw Data - Hotel Overview (raw CSV data from S3)")
+            logger.info(f"\nDatasets: {len(result['datasets'])}")
+            logger.info(f"Charts: {len(result['charts'])}")
+            logger.info("\nDashboards:")
+            for title, dashboard_id in result['dashboards'].items():
+                logger.info(f"  - {title}: http://localhost:8088/superset/dashboard/{dashboard_id}/")
             logger.info("\nAccess Superset at: http://localhost:8088")
             logger.info("Login: admin / admin")
             logger.info("\nImportant Notes:")
@@ -694,7 +1221,7 @@ def main():
             logger.info("\nIf charts show errors, ensure:")
             logger.info("  1. Data is loaded to S3: bash upload_raw_to_s3.sh")
             logger.info("  2. Schemas are created: bash create_trino_schemas.sh")
-            logger.info("  3. Trino can query tables: docker exec trino trino --execute 'SELECT COUNT(*) FROM hive.raw_hotels.hotels_makemytrip'")
+            logger.info("  3. Trino can query tables: docker exec trino trino --execute 'SELECT COUNT(*) FROM hive.raw_hotels.hotels'")
             logger.info("="*60 + "\n")
             
     except Exception as e:
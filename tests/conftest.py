@@ -0,0 +1,13 @@
+"""
+The scripts import each other as top-level modules (they are run from the
+repository root as `python3 scripts/<name>.py`, and superset/setup_datasets.py
+likewise), and etl/ is a package at the root; all are put on sys.path here.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT / 'scripts', ROOT / 'superset', ROOT):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
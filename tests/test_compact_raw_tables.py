@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import compact_raw_tables as crt
+import generate_trino_schemas as gen
+
+
+def test_part_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        crt.PartWriter(tmp_path, ['id'], 1)
+
+
+def test_full_last_part_is_not_followed_by_an_empty_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(crt, 'SIZE_CHECK_ROWS', 2)
+    writer = crt.CsvPartWriter(tmp_path, ['id'], target_bytes=1)
+    for i in range(4):
+        writer.write([str(i)])
+    assert writer.close() == ['part-00000.csv', 'part-00001.csv']
+    assert (tmp_path / 'part-00001.csv').read_text().splitlines() == ['id', '2', '3']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['part-00000.csv', 'part-00001.csv']
+
+
+def test_generator_and_compaction_share_the_fingerprint_check(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gen, 'RAW_DIR', gen.Path('raw'))
+    monkeypatch.setattr(crt, 'RAW_DIR', gen.Path('raw'))
+    folder = tmp_path / 'raw' / 'reviews' / 'by_city'
+    folder.mkdir(parents=True)
+    (folder / 'goa.csv').write_text('hotel_name,rating\nSea View,4\n')
+    (folder / 'pune.csv').write_text('hotel_name,rating\nHill Inn,3\n')
+
+    gen.generate_sql()
+    assert crt.compact_all(regenerate=True)
+    manifest = json.loads(gen.MANIFEST_PATH.read_text())
+    [(table_key, entry)] = manifest['tables'].items()
+    assert entry['compaction']['parts'] == 1
+    marker = json.loads((tmp_path / 'raw' / '_compacted' / 'reviews' / 'by_city' / '_compaction.json').read_text())
+    assert marker['sources'] == {k: manifest['files'][k] for k in entry['files']}
+    assert crt.compact_table(table_key, entry) is None
+
+    # Same size, other contents: only the fingerprint tells them apart
+    (folder / 'goa.csv').write_text('hotel_name,rating\nSea Hut,5\n')
+    capsys.readouterr()
+    gen.generate_sql()
+    assert 'is stale (files changed)' in capsys.readouterr().out
+    assert json.loads(gen.MANIFEST_PATH.read_text())['tables'][table_key]['compaction'] is None
+    assert crt.compact_table(table_key, entry) is not None
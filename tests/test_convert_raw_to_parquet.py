@@ -0,0 +1,50 @@
+import datetime
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from convert_raw_to_parquet import convert_column
+from generate_trino_schemas import InferredColumn
+
+
+def convert(values, trino_type):
+    return convert_column(pa.array(values, pa.string()), InferredColumn('c', trino_type)).to_pylist()
+
+
+def test_bigint_keeps_the_whole_int64_range():
+    values = ['42', '+5', ' -7 ', '007', '-0',
+              '9223372036854775807', '-9223372036854775808', '000009223372036854775807']
+    assert convert(values, 'BIGINT') == [42, 5, -7, 7, 0, 2 ** 63 - 1, -2 ** 63, 2 ** 63 - 1]
+
+
+def test_bigint_outside_the_range_or_not_an_integer_is_null():
+    values = ['9223372036854775808', '-9223372036854775809', '12345678901234567890', '1.5', 'x', 'NA', '', None]
+    assert convert(values, 'BIGINT') == [None] * len(values)
+
+
+def test_timestamp_keeps_microseconds():
+    values = ['2021-03-04 05:06:07.123456', '2021-03-04T05:06:07.1234', '2021-03-04 05:06', 'null', 'soon']
+    assert convert(values, 'TIMESTAMP') == [
+        datetime.datetime(2021, 3, 4, 5, 6, 7, 123456),
+        datetime.datetime(2021, 3, 4, 5, 6, 7, 123400),
+        datetime.datetime(2021, 3, 4, 5, 6),
+        None,
+        None,
+    ]
+
+
+def test_timestamp_column_with_dates_keeps_them_as_midnight():
+    # The generator infers TIMESTAMP for a mix of ISO dates and datetimes
+    from generate_trino_schemas import infer_column_types
+
+    values = ['2021-03-04', '2021-03-05 10:00:00', '2021-03-06', '2021-03-07', '2021-03-08']
+    [column] = infer_column_types(['opened'], [[v] for v in values])
+    assert column.type == 'TIMESTAMP'
+    assert convert_column(pa.array(values), column).to_pylist() == [
+        datetime.datetime(2021, 3, 4),
+        datetime.datetime(2021, 3, 5, 10),
+        datetime.datetime(2021, 3, 6),
+        datetime.datetime(2021, 3, 7),
+        datetime.datetime(2021, 3, 8),
+    ]
@@ -0,0 +1,157 @@
+"""
+The ETL on a few hand-written raw rows in a local[*] session: counts, reject
+rules, the type mappings and an idempotent second load. Needs pyspark and
+delta-spark (whose jars configure_spark_with_delta_pip fetches).
+"""
+
+import csv
+import datetime
+
+import pytest
+
+pytest.importorskip('pyspark')
+pytest.importorskip('delta')
+
+from etl.job import build_session, prod_path, run
+from etl.schemas import RAW_TABLES
+
+HOTELS = [
+    # Same name and city twice: one hotel_id, latest_per_key keeps the lowest hotel_code
+    {'county_name': 'India', 'city_name': 'Goa', 'hotel_code': 'H1', 'hotel_name': 'Sea View',
+     'hotel_rating': 'FourStar', 'hotel_facilities': 'Pool, Wifi'},
+    {'county_name': 'India', 'city_name': 'Goa', 'hotel_code': 'H0', 'hotel_name': 'Sea View',
+     'hotel_rating': 'FourStar', 'hotel_facilities': 'Pool, Wifi'},
+    {'county_name': 'India', 'city_name': 'Pune', 'hotel_code': 'H2', 'hotel_name': 'Hill Inn',
+     'hotel_rating': 'ThreeStar'},
+    {'county_name': 'India', 'city_name': 'Pune', 'hotel_code': 'H3', 'hotel_name': 'NA'},
+    {'county_name': 'India', 'city_name': 'Agra', 'hotel_code': 'H4', 'hotel_name': 'Fort Stay',
+     'hotel_rating': '7'},
+    {'county_name': 'India', 'city_name': '', 'hotel_code': 'H5', 'hotel_name': 'Nowhere Lodge'},
+]
+
+STANDARD = [
+    {'booking_id': 'INN1', 'no_of_adults': '2', 'no_of_weekend_nights': '1', 'no_of_week_nights': '2',
+     'required_car_parking_space': 'yes', 'repeated_guest': '0', 'arrival_year': '2018', 'arrival_month': '10',
+     'arrival_date': '2', 'avg_price_per_room': '100.5', 'booking_status': 'Not_Canceled'},
+    # Same booking again: one row per key
+    {'booking_id': 'INN1', 'no_of_adults': '2', 'no_of_weekend_nights': '1', 'no_of_week_nights': '2',
+     'required_car_parking_space': 'yes', 'repeated_guest': '0', 'arrival_year': '2018', 'arrival_month': '10',
+     'arrival_date': '5', 'avg_price_per_room': '100.5', 'booking_status': 'Not_Canceled'},
+    {'booking_id': 'INN2', 'no_of_adults': '2', 'no_of_week_nights': '1', 'arrival_year': '2018',
+     'arrival_month': '2', 'arrival_date': '30', 'avg_price_per_room': '80'},
+    {'booking_id': 'INN3', 'no_of_adults': '0', 'no_of_children': '1', 'no_of_week_nights': '1',
+     'arrival_year': '2018', 'arrival_month': '3', 'arrival_date': '1', 'avg_price_per_room': '50'},
+    {'booking_id': 'INN4', 'no_of_adults': '1', 'no_of_weekend_nights': '0', 'no_of_week_nights': '0',
+     'arrival_year': '2018', 'arrival_month': '3', 'arrival_date': '2', 'avg_price_per_room': '50'},
+    {'booking_id': 'INN5', 'no_of_adults': '1', 'no_of_week_nights': '1', 'arrival_year': '2018',
+     'arrival_month': '3', 'arrival_date': '3', 'avg_price_per_room': '0'},
+]
+
+DETAILED_RESERVATIONS = [
+    {'hotel': 'Sea View', 'is_canceled': '1', 'lead_time': '3', 'arrival_date_year': '2017',
+     'arrival_date_month': 'July', 'arrival_date_day_of_month': '5', 'stays_in_weekend_nights': '1',
+     'stays_in_week_nights': '2', 'adults': '2', 'children': '0', 'babies': '0', 'meal': 'BB',
+     'market_segment': 'Direct', 'is_repeated_guest': '0', 'adr': '75.0', 'required_car_parking_spaces': '0',
+     'reservation_status': 'Canceled'},
+]
+
+DETAILED_REVIEWS = [
+    {'review_date': '8/3/2017', 'hotel_name': 'Sea View', 'reviewer_nationality': 'India',
+     'negative_review': 'No Negative', 'positive_review': 'Great pool', 'reviewer_score': '9.5',
+     'tags': "[' Leisure trip ', ' Couple ', ' Stayed 2 nights ']"},
+    {'review_date': 'yesterday', 'hotel_name': 'Sea View', 'positive_review': 'Fine', 'reviewer_score': '8'},
+    {'review_date': '2017-08-04', 'hotel_name': 'Hill Inn', 'positive_review': 'Fine', 'reviewer_score': '11'},
+    {'review_date': '2017-08-04', 'hotel_name': 'Hill Inn', 'positive_review': 'No Positive',
+     'negative_review': 'No Negative', 'reviewer_score': '7'},
+]
+
+ROWS = {
+    'raw_hotels.hotels': HOTELS,
+    'raw_reservations.reservations_standard': STANDARD,
+    'raw_reservations.reservations_detailed': DETAILED_RESERVATIONS,
+    'raw_reviews.reviews_detailed': DETAILED_REVIEWS,
+}
+
+
+def write_raw(root):
+    """Every raw table as one CSV under its location; tables without rows get only the header."""
+    for key, table in RAW_TABLES.items():
+        folder = root / table.location
+        folder.mkdir(parents=True)
+        with (folder / 'part.csv').open('w', newline='') as f:
+            writer = csv.DictWriter(f, table.columns, restval='', delimiter=table.separator)
+            writer.writeheader()
+            writer.writerows(ROWS.get(key, []))
+
+
+@pytest.fixture(scope='module')
+def spark():
+    session = build_session('local[*]', app_name='etl-test')
+    session.conf.set('spark.sql.shuffle.partitions', '4')
+    yield session
+    session.stop()
+
+
+@pytest.fixture(scope='module')
+def loaded(spark, tmp_path_factory):
+    root = tmp_path_factory.mktemp('etl')
+    write_raw(root / 'raw')
+    prod_root = str(root / 'prod')
+    first = run(spark, str(root / 'raw'), prod_root, ['hotels', 'reviews', 'reservations'])
+    return spark, str(root / 'raw'), prod_root, first
+
+
+def table(spark, prod_root, name):
+    return {r[0]: r for r in spark.read.format('delta').load(prod_path(prod_root, name)).collect()}
+
+
+def test_rows_and_rejects(loaded):
+    _, _, _, first = loaded
+    assert first['hotels']['valid'] == 2
+    assert first['hotels']['rejected'] == {'hotel_name_missing': 1, 'rating_out_of_range': 1, 'city_missing': 1}
+    assert first['reservations']['valid'] == 2
+    assert first['reservations']['rejected'] == {
+        'arrival_date_missing': 1, 'no_adults': 1, 'no_nights': 1, 'price_not_positive': 1}
+    assert first['reviews']['valid'] == 1
+    assert first['reviews']['rejected'] == {
+        'review_date_missing': 1, 'overall_rating_out_of_range': 1, 'review_text_missing': 1}
+    for name in ('hotels', 'reviews', 'reservations'):
+        assert first[name]['inserted'] == first[name]['valid']
+
+
+def test_mapped_values(loaded):
+    spark, _, prod_root, _ = loaded
+    hotels = {r['hotel_name']: r for r in table(spark, prod_root, 'hotels').values()}
+    assert set(hotels) == {'Sea View', 'Hill Inn'}
+    assert hotels['Sea View']['hotel_code'] == 'H0'
+    assert hotels['Sea View']['rating'] == 4.0
+    assert hotels['Sea View']['facilities'] == ['Pool', 'Wifi']
+    assert (hotels['Hill Inn']['country'], hotels['Hill Inn']['city']) == ('India', 'Pune')
+
+    reservations = table(spark, prod_root, 'reservations')
+    standard = reservations['INN1']
+    assert standard['car_parking_required'] is True
+    assert standard['is_repeated_guest'] is False
+    assert standard['arrival_date'].year == 2018 and standard['arrival_month'] == 10
+    [detailed] = [r for key, r in reservations.items() if key != 'INN1']
+    assert detailed['arrival_date'] == datetime.date(2017, 7, 5)
+    assert detailed['is_canceled'] is True
+    assert detailed['car_parking_required'] is False
+
+    [review] = table(spark, prod_root, 'reviews').values()
+    assert review['review_date'] == datetime.date(2017, 8, 3)
+    assert review['reviewer_type'] == 'Couple'
+    assert review['negative_review'] is None
+    assert review['review_text'] == 'Great pool'
+
+
+def test_second_load_changes_nothing(loaded):
+    spark, raw_root, prod_root, first = loaded
+    files = {name: set(spark.read.format('delta').load(prod_path(prod_root, name)).inputFiles())
+             for name in ('hotels', 'reviews', 'reservations')}
+    second = run(spark, raw_root, prod_root, ['hotels', 'reviews', 'reservations'])
+    for name in ('hotels', 'reviews', 'reservations'):
+        assert (second[name]['inserted'], second[name]['updated']) == (0, 0)
+        assert second[name]['clustered'] == {'removed': 0, 'added': 0}
+        assert second[name]['valid'] == first[name]['valid']
+        assert set(spark.read.format('delta').load(prod_path(prod_root, name)).inputFiles()) == files[name]
@@ -0,0 +1,80 @@
+"""
+Maintenance of a local Delta table: VACUUM only counts, and only runs for,
+unreferenced files older than the retention (by tombstone for files the log
+removed). Needs pyspark and delta-spark.
+"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('pyspark')
+pytest.importorskip('delta')
+
+from etl.delta import create
+from etl.job import build_session
+from etl.maintenance import inspect, maintain_table
+from etl.schemas import PROD_TABLES, prod_schema
+
+HOTELS = PROD_TABLES['hotels']
+
+
+@pytest.fixture(scope='module')
+def spark():
+    session = build_session('local[*]', app_name='maintenance-test')
+    yield session
+    session.stop()
+
+
+def hotels(spark, names):
+    columns = [c for c, _ in HOTELS.columns]
+    rows = [{**dict.fromkeys(columns), 'hotel_id': n, 'hotel_name': n, 'country': 'India', 'city': 'Goa'}
+            for n in names]
+    return spark.createDataFrame([tuple(r[c] for c in columns) for r in rows], prod_schema('hotels'))
+
+
+def maintain(spark, path, retention_hours):
+    return maintain_table(spark, HOTELS, path, target_bytes=128 * 1024 * 1024, min_small_files=1000,
+                          retention_hours=retention_hours, min_unreferenced_files=1, max_log_commits=1000)
+
+
+def test_vacuum_only_counts_files_past_retention(spark, tmp_path):
+    path = str(tmp_path / 'hotels')
+    create(spark, hotels(spark, ['a', 'b']), path, HOTELS)
+    # The overwrite leaves the first files unreferenced, but they were just written
+    create(spark, hotels(spark, ['c']), path, HOTELS)
+    state = inspect(spark, path, 128 * 1024 * 1024, retention_hours=168)
+    assert state['unreferenced_files'] >= 1
+    assert state['expired_files'] == 0
+    assert maintain(spark, path, 168)['steps'] == []
+
+    # A stray file from an aborted write, last modified a month ago
+    partition = tmp_path / 'hotels' / 'country=India' / 'city=Goa'
+    stray = partition / 'part-99999-aborted.snappy.parquet'
+    stray.write_bytes(b'PAR1')
+    month_ago = time.time() - 30 * 24 * 3600
+    os.utime(stray, (month_ago, month_ago))
+    result = maintain(spark, path, 168)
+    assert result['before']['expired_files'] == 1
+    assert result['steps'] == ['vacuum']
+    assert not stray.exists()
+    # The recently overwritten files are within the retention and stay
+    assert result['after']['unreferenced_files'] == state['unreferenced_files']
+    assert result['after']['expired_files'] == 0
+
+
+def test_removed_files_age_from_their_tombstone(spark, tmp_path):
+    path = str(tmp_path / 'hotels')
+    create(spark, hotels(spark, ['a', 'b']), path, HOTELS)
+    # Written a month ago, but only removed by the overwrite below
+    month_ago = time.time() - 30 * 24 * 3600
+    written = list((tmp_path / 'hotels').rglob('*.parquet'))
+    for data_file in written:
+        os.utime(data_file, (month_ago, month_ago))
+    create(spark, hotels(spark, ['c']), path, HOTELS)
+    state = inspect(spark, path, 128 * 1024 * 1024, retention_hours=168)
+    assert state['unreferenced_files'] == len(written)
+    assert state['expired_files'] == 0
+    assert maintain(spark, path, 168)['steps'] == []
+    assert all(data_file.exists() for data_file in written)
@@ -0,0 +1,124 @@
+"""
+--s3 scanning of generate_trino_schemas.py against a moto bucket: listing and
+fingerprints, and the prefix reads of open_s3_object.
+"""
+
+import gzip
+import hashlib
+
+import pytest
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+import generate_trino_schemas as gen
+
+BUCKET = 'raw'
+ROWS = ''.join(f"{i},hotel {i},{i % 7}\n" for i in range(500))
+
+
+class RecordingClient:
+    """The moto client, recording the Range of every GET."""
+
+    def __init__(self, client):
+        self.client = client
+        self.ranges = []
+
+    def get_object(self, **params):
+        self.ranges.append(params.get('Range'))
+        return self.client.get_object(**params)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    import boto3
+
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def read(client, key, compression='none', range_bytes=64):
+    recording = RecordingClient(client)
+    csv_key = key[:len(key) - len(gen.RAW_COMPRESSION_SUFFIXES[compression])]
+    text = gen.open_s3_object(gen.RAW_DIR / csv_key, client=recording, bucket=BUCKET,
+                              compression=compression, range_bytes=range_bytes).read()
+    return text, recording.ranges
+
+
+def test_range_doubles_until_the_header_line_is_complete(s3):
+    header = ','.join(f"column_{i}" for i in range(30)) + '\n'
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv', Body=(header + ROWS).encode())
+    text, ranges = read(s3, 'hotels/hotels.csv', range_bytes=64)
+    assert ranges == ['bytes=0-63', 'bytes=0-127', 'bytes=0-255', 'bytes=0-511']
+    assert text.startswith(header)
+
+
+def test_text_is_cut_after_the_last_complete_line(s3):
+    data = 'id,name,stars\n' + ROWS
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv', Body=data.encode())
+    text, ranges = read(s3, 'hotels/hotels.csv', range_bytes=100)
+    assert ranges == ['bytes=0-99']
+    assert text == data[:data[:100].rfind('\n') + 1]
+
+
+def test_small_object_is_read_whole(s3):
+    data = 'id,name\n1,a\n2,b'  # no newline at the end
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv', Body=data.encode())
+    text, ranges = read(s3, 'hotels/hotels.csv', range_bytes=1024)
+    assert (text, ranges) == (data, ['bytes=0-1023'])
+
+
+def test_gzip_prefix_is_decompressed(s3):
+    data = 'id,name,stars\n' + ROWS * 20
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv.gz', Body=gzip.compress(data.encode()))
+    text, ranges = read(s3, 'hotels/hotels.csv.gz', compression='gzip', range_bytes=256)
+    assert len(ranges) == 1
+    assert text.startswith('id,name,stars\n0,hotel 0,0\n') and text.endswith('\n')
+    assert data.startswith(text) and len(text) < len(data)
+
+
+def test_zstd_prefix_is_decompressed(s3):
+    zstandard = pytest.importorskip('zstandard')
+    # zstd only emits whole blocks (up to 128 KiB of text): the range doubles until the first one is in
+    data = 'id,digest\n' + ''.join(f"{i},{hashlib.sha256(str(i).encode()).hexdigest()}\n" for i in range(20000))
+    body = zstandard.ZstdCompressor().compress(data.encode())
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv.zst', Body=body)
+    text, ranges = read(s3, 'hotels/hotels.csv.zst', compression='zstd', range_bytes=16 * 1024)
+    assert int(ranges[-1].rsplit('-', 1)[1]) + 1 < len(body)
+    assert text.startswith('id,digest\n0,') and text.endswith('\n')
+    assert data.startswith(text) and len(text) < len(data)
+
+
+def test_collect_lists_tables_with_etag_fingerprints(s3):
+    bodies = {
+        'hotels/hotels.csv': b'id,name\n1,a\n',
+        'reviews/by_city/goa.csv': b'id,city\n1,goa\n',
+        'reviews/by_city/pune.csv': b'id,city\n2,pune\n',
+        'reviews/by_city/empty.csv': b'',
+        'reviews/by_city/notes.txt': b'not a table',
+        '_bench/hotels/hotels.csv': b'id,name\n',
+        'reviews/.tmp/partial.csv': b'id,city\n',
+    }
+    for key, body in bodies.items():
+        s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    schemas, fingerprints = gen.collect_s3_objects(s3, BUCKET, jobs=4)
+    assert {k: sorted(v) for k, v in schemas.items()} == {
+        'raw_hotels': [gen.RAW_DIR / 'hotels/hotels.csv'],
+        'raw_reviews': [gen.RAW_DIR / 'reviews/by_city/goa.csv', gen.RAW_DIR / 'reviews/by_city/pune.csv'],
+    }
+    for key in ('hotels/hotels.csv', 'reviews/by_city/goa.csv', 'reviews/by_city/pune.csv'):
+        assert fingerprints[str(gen.RAW_DIR / key)] == {
+            'size': len(bodies[key]), 'etag': hashlib.md5(bodies[key]).hexdigest()}
+
+
+def test_collect_maps_compressed_keys_to_csv_paths(s3):
+    body = gzip.compress(b'id,name\n1,a\n')
+    s3.put_object(Bucket=BUCKET, Key='hotels/hotels.csv.gz', Body=body)
+    s3.put_object(Bucket=BUCKET, Key='hotels/stale.csv', Body=b'id\n1\n')
+    schemas, fingerprints = gen.collect_s3_objects(s3, BUCKET, compression='gzip')
+    assert schemas == {'raw_hotels': [gen.RAW_DIR / 'hotels/hotels.csv']}
+    assert fingerprints[str(gen.RAW_DIR / 'hotels/hotels.csv')]['size'] == len(body)
@@ -0,0 +1,84 @@
+import generate_trino_schemas as gen
+
+
+def profile(**avg_lengths):
+    return {'rows': 10, 'columns': {c: {'avg_length': n} for c, n in avg_lengths.items()}}
+
+
+def test_analyze_leaves_out_free_text_columns():
+    scan = {'columns': ['id', 'review'], 'typed_columns': [], 'layouts': [],
+            'profile': profile(id=4, review=gen.ANALYZE_MAX_AVG_LENGTH + 1)}
+    assert gen.analyze_sql(scan, 'raw_reviews', 'reviews') == [
+        "CALL system.drop_stats(schema_name => 'raw_reviews', table_name => 'reviews');",
+        "ANALYZE reviews WITH (columns = ARRAY['id']);",
+    ]
+
+
+def test_analyze_skips_the_layout_tables_of_a_drifted_table():
+    scan = {'columns': ['id', 'city'], 'typed_columns': [],
+            'layouts': [{'columns': ['id', 'city']}, {'columns': ['city', 'id']}],
+            'profile': profile(id=4, city=8)}
+    for on_drift in ('union', 'split'):
+        lines = gen.analyze_sql(scan, 'raw_reviews', 'reviews_by_city', on_drift)
+        assert not any(line.startswith(('CALL', 'ANALYZE')) for line in lines)
+        assert [line.split(':')[0] for line in lines] == ['-- reviews_by_city__layout0', '-- reviews_by_city__layout1']
+
+
+def test_profile_rescans_only_tables_without_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gen, 'RAW_DIR', gen.Path('raw'))
+    for folder, name in (('hotels', 'hotels'), ('reservations', 'reservations_standard')):
+        (tmp_path / 'raw' / folder).mkdir(parents=True)
+        (tmp_path / 'raw' / folder / f'{name}.csv').write_text('id,city\n1,Pune\n2,Goa\n')
+    scanned = []
+
+    def scan_csv_files(files, **options):
+        scanned.append(sorted(p.name for p in files))
+        return real_scan(files, **options)
+
+    real_scan = gen.scan_csv_files
+    monkeypatch.setattr(gen, 'scan_csv_files', scan_csv_files)
+
+    gen.generate_sql(profile=True)
+    assert scanned.pop() == ['hotels.csv', 'reservations_standard.csv']
+    # The options do not include --profile: a plain run keeps the stored profiles
+    gen.generate_sql()
+    assert not scanned
+    gen.generate_sql(profile=True)
+    assert not scanned
+
+    (tmp_path / 'raw' / 'hotels' / 'hotels.csv').write_text('id,city\n1,Pune\n2,Goa\n3,Agra\n')
+    gen.generate_sql()
+    assert scanned.pop() == ['hotels.csv']
+    gen.generate_sql(profile=True)
+    assert scanned.pop() == ['hotels.csv']
+    profile = gen.json.loads(gen.PROFILE_OUTPUT.read_text())
+    assert sorted(profile) == ['raw_hotels.hotels', 'raw_reservations.reservations_standard']
+    assert profile['raw_hotels.hotels']['rows'] == 3
+
+
+def test_delta_sql_accumulates_until_applied(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gen, 'RAW_DIR', gen.Path('raw'))
+    hotels = tmp_path / 'raw' / 'hotels' / 'hotels.csv'
+    hotels.parent.mkdir(parents=True)
+    hotels.write_text('id,city\n1,Pune\n')
+
+    gen.generate_sql()
+    first = gen.DELTA_OUTPUT.read_text()
+    assert 'CREATE TABLE IF NOT EXISTS hotels' in first
+    # A second run with nothing new keeps the changes that were not applied
+    gen.generate_sql()
+    assert gen.DELTA_OUTPUT.read_text() == first
+
+    hotels.write_text('id,city,stars\n1,Pune,4\n')
+    gen.generate_sql()
+    delta = gen.DELTA_OUTPUT.read_text()
+    assert delta.startswith(first.rstrip('\n'))
+    assert delta.index('DROP TABLE IF EXISTS hotels;') > len(first.rstrip('\n'))
+    assert delta.count('CREATE TABLE IF NOT EXISTS hotels') == 2
+
+    # create_trino_schemas.sh --delta removes the file once applied
+    gen.DELTA_OUTPUT.unlink()
+    gen.generate_sql()
+    assert not gen.DELTA_OUTPUT.exists()
@@ -0,0 +1,159 @@
+"""
+run_trino_sql against a local stub of the Trino statement protocol, so no
+coordinator is needed: POST /v1/statement answers with a nextUri, the GET of
+that URI finishes the query. Faults drop the connection without a response.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from etl.schemas import prod_ddl
+from run_trino_sql import (
+    ConnectionPool,
+    Statement,
+    TrinoClient,
+    TrinoError,
+    group_statements,
+    run_sql_files,
+)
+from conftest import ROOT
+
+
+class StubTrino(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.posts = []  # (sql, catalog, schema)
+        self.gets = []
+        self.drop_posts = 0  # drop the next N POSTs without answering
+        self.drop_gets = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def drop(self, counter: str) -> bool:
+        with self.server.lock:
+            if getattr(self.server, counter) > 0:
+                setattr(self.server, counter, getattr(self.server, counter) - 1)
+                self.close_connection = True
+                return True
+        return False
+
+    def do_POST(self):
+        sql = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        with self.server.lock:
+            self.server.posts.append((sql, self.headers.get('X-Trino-Catalog'), self.headers.get('X-Trino-Schema')))
+            query_id = f"q{len(self.server.posts)}"
+        if self.drop('drop_posts'):
+            return
+        self.reply({'id': query_id, 'nextUri': f"{self.server.url}/v1/statement/executing/{query_id}/1"})
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.gets.append(self.path)
+        if self.drop('drop_gets'):
+            return
+        query_id = self.path.split('/')[-2]
+        self.reply({'id': query_id, 'data': [[1]], 'stats': {'elapsedTimeMillis': 1}})
+
+
+@pytest.fixture
+def trino():
+    server = StubTrino()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server: StubTrino) -> TrinoClient:
+    return TrinoClient(ConnectionPool(server.url, size=2), 'test', retries=2, backoff=0)
+
+
+def test_generated_files_have_no_preamble_group():
+    for text in ['\n'.join(prod_ddl()), (ROOT / 'sql' / 'trino_schemas_generated.sql').read_text()]:
+        groups = group_statements(text)
+        assert '' not in groups
+        for key, statements in groups.items():
+            assert statements[0].sql.upper().startswith('CREATE SCHEMA')
+            catalog, schema = key.split('.')
+            assert all(s.catalog == catalog for s in statements)
+            assert all(s.schema == schema for s in statements if not s.sql.upper().startswith('CREATE SCHEMA'))
+
+    groups = group_statements('\n'.join(prod_ddl()))
+    assert list(groups) == ['delta.prod_hotels', 'delta.prod_reviews', 'delta.prod_reservations']
+
+
+def test_use_sets_the_session_schema(trino, tmp_path):
+    sql = tmp_path / 'analyze.sql'
+    sql.write_text(
+        "-- ============\n-- TABLE STATISTICS\n-- ============\n\n"
+        "-- Schema: raw_hotels\nUSE hive.raw_hotels;\n\n"
+        "-- Table: hotels (3 rows profiled)\n"
+        "CALL system.drop_stats(schema_name => 'raw_hotels', table_name => 'hotels');\n"
+        "ANALYZE hotels;\n\n"
+        "-- Schema: raw_reviews\nUSE hive.raw_reviews;\n\nANALYZE reviews_by_city;\n"
+    )
+    assert run_sql_files([sql], trino.url, 'test', jobs=2)
+    assert not any(s.upper().startswith('USE') for s, _, _ in trino.posts)
+    sessions = {s.split()[0] + ' ' + s.split()[-1]: (c, sc) for s, c, sc in trino.posts}
+    assert sessions == {
+        "CALL 'hotels')": ('hive', 'raw_hotels'),
+        'ANALYZE hotels': ('hive', 'raw_hotels'),
+        'ANALYZE reviews_by_city': ('hive', 'raw_reviews'),
+    }
+
+
+def test_dropped_next_uri_is_fetched_again_without_resubmitting(trino):
+    trino.drop_gets = 1
+    result = client(trino).execute(Statement("INSERT INTO t SELECT 1", 'delta', 'rollup_raw', 1))
+    assert result['rows'] == 1
+    assert len(trino.posts) == 1
+    assert trino.gets == ['/v1/statement/executing/q1/1'] * 2
+
+
+def test_write_is_not_resubmitted_after_a_dropped_submission(trino):
+    trino.drop_posts = 1
+    with pytest.raises(TrinoError, match='not idempotent'):
+        client(trino).execute(Statement("DELETE FROM t WHERE source_file IN ('a')", 'delta', 'rollup_raw', 1))
+    assert len(trino.posts) == 1
+
+
+def test_ddl_is_resubmitted_after_a_dropped_submission(trino):
+    trino.drop_posts = 1
+    result = client(trino).execute(Statement("CREATE TABLE IF NOT EXISTS t (a VARCHAR)", 'hive', 'raw_x', 1))
+    assert result['attempts'] == 2
+    assert len(trino.posts) == 2
+
+
+def test_refused_connection_is_retried_for_any_statement(trino):
+    # Nothing listens on the port anymore: the statement never leaves the client
+    url = trino.url
+    trino.shutdown()
+    trino.server_close()
+    refused = TrinoClient(ConnectionPool(url, size=1), 'test', retries=1, backoff=0)
+    with pytest.raises(TrinoError) as e:
+        refused.execute(Statement("INSERT INTO t SELECT 1", None, None, 1))
+    assert e.value.attempts == 2
@@ -0,0 +1,103 @@
+import json
+import logging
+
+import setup_datasets
+from conftest import ROOT
+
+SPEC = str(ROOT / 'superset' / 'provisioning.yaml')
+
+
+def test_every_chart_of_the_spec_has_a_provisioned_dataset(caplog):
+    spec = setup_datasets.resolve_spec(setup_datasets.load_spec(SPEC), [])
+    with caplog.at_level(logging.ERROR):
+        desired = setup_datasets.desired_names(spec)
+    assert not caplog.records
+    assert desired['charts'] == {c['name'] for c in spec['charts']}
+
+
+def test_chart_without_dataset_is_reported_and_stays_desired(caplog):
+    spec = setup_datasets.resolve_spec({
+        'databases': [{'name': 'hive', 'uri': 'trino://x/hive', 'manifest': 'raw_'}],
+        'charts': [
+            {'name': 'Hotels', 'dataset': 'raw_hotels.hotels', 'viz_type': 'table'},
+            {'name': 'Stale', 'dataset': 'raw_hotels.hotels_makemytrip', 'viz_type': 'table'},
+        ],
+    }, ['raw_hotels.hotels'])
+    with caplog.at_level(logging.ERROR):
+        desired = setup_datasets.desired_names(spec)
+    assert [r.getMessage() for r in caplog.records] == [
+        "Chart 'Stale': dataset raw_hotels.hotels_makemytrip is not provisioned by any database"]
+    # reconcile cannot create it, so the run is incomplete and its hash is not stored
+    assert desired['charts'] == {'Hotels', 'Stale'}
+
+
+def test_waits_for_trino_without_readiness_module(monkeypatch):
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    requests = []
+
+    class Info(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            body = json.dumps({'starting': len(requests) < 3}).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Info)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(setup_datasets, 'readiness', None)
+    monkeypatch.setenv('TRINO_HOST', '127.0.0.1')
+    monkeypatch.setenv('TRINO_PORT', str(server.server_address[1]))
+    try:
+        assert setup_datasets.wait_for_trino(timeout=10)
+        assert requests == ['/v1/info'] * 3
+        # Nothing answers: the deadline still applies
+        monkeypatch.setenv('TRINO_PORT', '1')
+        assert not setup_datasets.wait_for_trino(timeout=1)
+    finally:
+        server.shutdown()
+
+
+def test_every_chart_of_the_spec_gets_a_query_context_per_viz_type():
+    spec = setup_datasets.resolve_spec(setup_datasets.load_spec(SPEC), [])
+    by_type = {}
+    for chart in spec['charts']:
+        context = setup_datasets.chart_query_context(chart['viz_type'], 7, chart['params'])
+        json.loads(json.dumps(context))
+        by_type.setdefault(chart['viz_type'], []).append(context)
+        assert context['datasource'] == {'id': 7, 'type': 'table'}
+        assert context['form_data']['viz_type'] == chart['viz_type']
+        assert context['form_data']['datasource'] == '7__table'
+        [query] = context['queries']
+        assert query['metrics']
+    assert set(by_type) == {'dist_bar', 'pie', 'big_number_total', 'scatter'}
+
+    pie = by_type['pie'][0]['queries'][0]
+    assert pie['columns'] == ['market_segment'] and pie['row_limit'] == 10
+    assert pie['orderby'] == [['count', False]]
+    total = by_type['big_number_total'][0]['queries'][0]
+    assert total['columns'] == [] and total['orderby'] == [] and 'row_limit' not in total
+    assert total['metrics'][0]['sqlExpression'] == 'SUM(row_count)'
+    scatter = by_type['scatter'][0]['queries'][0]
+    assert scatter['columns'] == ['service', 'cleanliness'] and scatter['row_limit'] == 500
+
+
+def test_query_context_carries_adhoc_filters():
+    context = setup_datasets.chart_query_context('pie', 1, {
+        'metrics': ['count'], 'groupby': ['city'], 'order_desc': False,
+        'adhoc_filters': [
+            {'expressionType': 'SIMPLE', 'subject': 'country', 'operator': '==', 'comparator': 'India'},
+            {'expressionType': 'SQL', 'clause': 'WHERE', 'sqlExpression': 'rating > 3'},
+        ],
+    })
+    [query] = context['queries']
+    assert query['filters'] == [{'col': 'country', 'op': '==', 'val': 'India'}]
+    assert query['extras']['where'] == '(rating > 3)'
+    assert query['orderby'] == [['count', True]]
@@ -0,0 +1,89 @@
+"""
+Content-addressed uploads of upload_raw_to_s3.py against a moto bucket: the
+computed multipart ETag, skipping identical objects and resuming an interrupted
+multipart upload.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+import upload_raw_to_s3 as upload
+
+BUCKET = 'raw'
+PART = upload.MIN_PART_SIZE
+KEY = 'reviews/detailed/reviews.csv'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    import boto3
+
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    """Two full parts and a short last one, each part with different bytes."""
+    path = tmp_path / 'reviews.csv'
+    path.write_bytes(os.urandom(2 * PART + 1024))
+    return path
+
+
+def sync(client, path):
+    local = upload.LocalFile(path, KEY, {}, threading.Lock())
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return upload.upload_file(client, pool, BUCKET, local, upload.list_remote_objects(client, BUCKET),
+                                  PART, dry_run=False, part_jobs=2)
+
+
+def test_identical_object_is_skipped(s3, raw_file):
+    first = sync(s3, raw_file)
+    assert (first['status'], first['parts'], first['reused'], first['error']) == ('new', 3, 0, None)
+    size, etag = upload.list_remote_objects(s3, BUCKET)[KEY]
+    assert etag == upload.expected_etag(upload.part_digests(raw_file, PART))
+    assert etag.endswith('-3') and size == raw_file.stat().st_size
+
+    second = sync(s3, raw_file)
+    assert (second['status'], second['parts']) == ('unchanged', 0)
+
+
+def test_changed_content_of_the_same_size_is_uploaded(s3, raw_file):
+    sync(s3, raw_file)
+    data = bytearray(raw_file.read_bytes())
+    data[PART + 10] ^= 0xff
+    raw_file.write_bytes(bytes(data))
+    result = sync(s3, raw_file)
+    assert (result['status'], result['parts']) == ('changed', 3)
+
+
+def test_interrupted_upload_is_resumed(s3, raw_file):
+    data = raw_file.read_bytes()
+    metadata = {upload.PART_SIZE_METADATA: str(PART)}
+    # An older attempt with nothing reusable, then one that sent part 1 and a stale part 2
+    stale = s3.create_multipart_upload(Bucket=BUCKET, Key=KEY, Metadata=metadata)['UploadId']
+    s3.upload_part(Bucket=BUCKET, Key=KEY, UploadId=stale, PartNumber=1, Body=os.urandom(PART))
+    interrupted = s3.create_multipart_upload(Bucket=BUCKET, Key=KEY, Metadata=metadata)['UploadId']
+    s3.upload_part(Bucket=BUCKET, Key=KEY, UploadId=interrupted, PartNumber=1, Body=data[:PART])
+    s3.upload_part(Bucket=BUCKET, Key=KEY, UploadId=interrupted, PartNumber=2, Body=os.urandom(PART))
+
+    digests = upload.part_digests(raw_file, PART)
+    upload_id, reusable = upload.find_resumable_upload(s3, BUCKET, KEY, PART, digests)
+    assert (upload_id, reusable) == (interrupted, {1: digests[0]})
+    assert [u['UploadId'] for u in s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads', [])] == [interrupted]
+
+    result = sync(s3, raw_file)
+    assert (result['status'], result['parts'], result['reused'], result['error']) == ('new', 2, 1, None)
+    assert s3.get_object(Bucket=BUCKET, Key=KEY)['Body'].read() == data
+    assert upload.list_remote_objects(s3, BUCKET)[KEY][1] == upload.expected_etag(digests)
+    assert not s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads')